@@ -0,0 +1,160 @@
+# analytics.py
+# -*- coding: utf-8 -*-
+"""
+Rollup statistik pemakaian chat, dihitung bertahap (incremental).
+
+Setiap giliran chat menambah counter ($inc) di koleksi `usage_daily`, satu dokumen per
+bucket hari:
+  - kind "day"  : total harian       (_id "d|2024-05-01")
+  - kind "user" : per user per hari  (_id "u|2024-05-01|<name>")
+  - kind "tool" : per tool per hari  (_id "t|2024-05-01|<tool>")
+Semua bucket satu giliran ditulis dalam satu bulk_write (upsert), jadi /api/analytics
+cukup membaca dokumen bucket di rentang tanggal: biayanya O(jumlah bucket), bukan
+O(riwayat chat), dan users_chats tidak pernah di-scan.
+
+Hari dihitung di zona ANALYTICS_UTC_OFFSET_HOURS (default 7 = WIB).
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+import clients
+
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "true").lower() == "true"
+ANALYTICS_TZ = timezone(timedelta(hours=float(os.getenv("ANALYTICS_UTC_OFFSET_HOURS", "7"))))
+ANALYTICS_MAX_DAYS = 366
+ANALYTICS_DEFAULT_DAYS = 30
+
+COUNTERS = ("turns", "sessions_started", "errors", "tool_calls", "tool_failures", "latency_ms")
+
+
+def usage_daily():
+    return clients.mongo().chatbot_db.usage_daily
+
+
+def today(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now(timezone.utc)).astimezone(ANALYTICS_TZ).strftime("%Y-%m-%d")
+
+
+def tool_failed(result: Any) -> bool:
+    """Konvensi tools_registry: kegagalan dikembalikan sebagai {"error": ...} atau {"success": False}."""
+    return isinstance(result, dict) and ("error" in result or result.get("success") is False)
+
+
+# ======================================================================
+# PENCATATAN (dipanggil dari /api/chat)
+# ======================================================================
+def record_turn(name: str, new_session: bool, tool_runs: List[Dict[str, Any]],
+                latency_ms: float, failed: bool = False) -> None:
+    """
+    Catat satu giliran chat. tool_runs: [{"name", "failed", "duration_ms"}].
+    Gagal mencatat tidak pernah menggagalkan request chat.
+    """
+    if not ANALYTICS_ENABLED:
+        return
+    day = today()
+    inc = {
+        "turns": 1,
+        "sessions_started": 1 if new_session else 0,
+        "errors": 1 if failed else 0,
+        "tool_calls": len(tool_runs),
+        "tool_failures": sum(1 for t in tool_runs if t.get("failed")),
+        "latency_ms": int(latency_ms),
+    }
+    ops = [
+        UpdateOne({"_id": f"d|{day}"}, {"$setOnInsert": {"kind": "day", "day": day}, "$inc": inc}, upsert=True),
+        UpdateOne({"_id": f"u|{day}|{name}"},
+                  {"$setOnInsert": {"kind": "user", "day": day, "name": name}, "$inc": inc}, upsert=True),
+    ]
+    per_tool: Dict[str, Dict[str, int]] = {}
+    for t in tool_runs:
+        c = per_tool.setdefault(t["name"], {"calls": 0, "failures": 0, "duration_ms": 0})
+        c["calls"] += 1
+        c["failures"] += 1 if t.get("failed") else 0
+        c["duration_ms"] += int(t.get("duration_ms") or 0)
+    for tool, c in per_tool.items():
+        ops.append(UpdateOne({"_id": f"t|{day}|{tool}"},
+                             {"$setOnInsert": {"kind": "tool", "day": day, "tool": tool}, "$inc": c}, upsert=True))
+    try:
+        usage_daily().bulk_write(ops, ordered=False)
+    except Exception as e:
+        print(f"[analytics] gagal mencatat rollup: {e}")
+
+
+# ======================================================================
+# PEMBACAAN (dipakai /api/analytics)
+# ======================================================================
+def _ratio(a: float, b: float, digits: int = 2) -> Optional[float]:
+    return round(a / b, digits) if b else None
+
+
+def _day_row(d: Dict[str, Any]) -> Dict[str, Any]:
+    row = {k: d.get(k, 0) for k in COUNTERS if k != "latency_ms"}
+    row["day"] = d["day"]
+    row["avg_latency_ms"] = _ratio(d.get("latency_ms", 0), d.get("turns", 0), 1)
+    # Aproksimasi tanpa menghitung sesi unik: giliran / sesi baru pada rentang yang sama.
+    row["avg_turns_per_session"] = _ratio(d.get("turns", 0), d.get("sessions_started", 0))
+    row["tool_failure_rate"] = _ratio(d.get("tool_failures", 0), d.get("tool_calls", 0), 4)
+    return row
+
+
+def summarize(day_from: str, day_to: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """Rangkum bucket [day_from, day_to] (YYYY-MM-DD, inklusif). `name` membatasi ke satu user."""
+    days_q: Dict[str, Any] = {"kind": "user" if name else "day", "day": {"$gte": day_from, "$lte": day_to}}
+    if name:
+        days_q["name"] = name
+    days: List[Dict[str, Any]] = []
+    totals: Dict[str, Any] = {k: 0 for k in COUNTERS}
+    for d in usage_daily().find(days_q, {"_id": 0}).sort("day", 1):
+        days.append(_day_row(d))
+        for k in COUNTERS:
+            totals[k] += d.get(k, 0)
+
+    users: List[Dict[str, Any]] = []
+    if not name:
+        per_user: Dict[str, Dict[str, int]] = {}
+        for d in usage_daily().find({"kind": "user", "day": {"$gte": day_from, "$lte": day_to}},
+                                    {"_id": 0, "name": 1, "turns": 1, "sessions_started": 1,
+                                     "tool_calls": 1, "errors": 1}):
+            u = per_user.setdefault(d["name"], {"turns": 0, "sessions_started": 0, "tool_calls": 0, "errors": 0})
+            for k in u:
+                u[k] += d.get(k, 0)
+        users = sorted(({"name": n, **c} for n, c in per_user.items()), key=lambda r: -r["turns"])
+
+    per_tool: Dict[str, Dict[str, int]] = {}
+    if not name:
+        for d in usage_daily().find({"kind": "tool", "day": {"$gte": day_from, "$lte": day_to}}, {"_id": 0}):
+            t = per_tool.setdefault(d["tool"], {"calls": 0, "failures": 0, "duration_ms": 0})
+            for k in t:
+                t[k] += d.get(k, 0)
+    tools = sorted((
+        {"tool": n, "calls": c["calls"], "failures": c["failures"],
+         "failure_rate": _ratio(c["failures"], c["calls"], 4),
+         "avg_duration_ms": _ratio(c["duration_ms"], c["calls"], 1)}
+        for n, c in per_tool.items()
+    ), key=lambda r: -r["calls"])
+
+    return {
+        "from": day_from, "to": day_to, "name": name,
+        "totals": {k: v for k, v in _day_row({**totals, "day": None}).items() if k != "day"},
+        "days": days,
+        "users": users,
+        "tools": tools,
+    }
+
+
+def parse_range(day_from: Optional[str], day_to: Optional[str]) -> Tuple[str, str]:
+    """Validasi rentang tanggal (YYYY-MM-DD). Default: ANALYTICS_DEFAULT_DAYS hari terakhir."""
+    try:
+        end = datetime.strptime(day_to, "%Y-%m-%d") if day_to else datetime.strptime(today(), "%Y-%m-%d")
+        start = (datetime.strptime(day_from, "%Y-%m-%d") if day_from
+                 else end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1))
+    except ValueError:
+        raise ValueError("Parameter 'from'/'to' harus berformat YYYY-MM-DD.")
+    if start > end:
+        raise ValueError("Parameter 'from' harus sebelum 'to'.")
+    if (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise ValueError(f"Rentang maksimal {ANALYTICS_MAX_DAYS} hari.")
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
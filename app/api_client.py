@@ -4,12 +4,21 @@
 import os
 import json
 import time
+import hashlib
 import pathlib
 import logging
-from typing import Any, Dict, List, Optional, Callable, Tuple
+import threading
+import contextvars
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Callable, Tuple
 
 import requests
 
+import clients
+import resilience
+import http_cache
+
 # ===================== ENV LOADER =====================
 try:
     from dotenv import load_dotenv
@@ -36,17 +45,48 @@ if os.getenv("DEBUG_HTTP", "false").lower() == "true":
     logging.getLogger("urllib3").setLevel(logging.DEBUG)
     logging.getLogger("urllib3.connectionpool").setLevel(logging.DEBUG)
 
+# Resource yang list endpoint-nya menerima filter `?ids=1,2,3` (bulk fetch), dipisah koma.
+# Resource lain diambil per id secara paralel (lihat get_many).
+API_BULK_RESOURCES = {r.strip() for r in os.getenv("API_BULK_RESOURCES", "").split(",") if r.strip()}
+GET_MANY_MAX_IDS = int(os.getenv("GET_MANY_MAX_IDS", "50"))
+# Batas per_page untuk iter_resource (job export / sinkronisasi).
+API_PAGE_SIZE_MAX = int(os.getenv("API_PAGE_SIZE_MAX", "500"))
+
 # Lokasi cache token (buat folder jika belum ada)
 TOKEN_CACHE = pathlib.Path("lisa_python/.token_cache.json")
 TOKEN_CACHE.parent.mkdir(parents=True, exist_ok=True)
 
-# ===================== SESSION =====================
-S = requests.Session()
-# Jika ingin memaksa bypass proxy environment:
-if os.getenv("FORCE_BYPASS_PROXY", "false").lower() == "true":
-    S.trust_env = False
+# Hasil validasi token di-cache (kunci = sha256 token, token mentah tidak disimpan):
+# di memori worker dulu, lalu di koleksi Mongo `token_validations` (dibagi antar worker,
+# dibersihkan TTL index). Token 401 juga di-cache, tapi lebih singkat.
+TOKEN_VALID_TTL_S = int(os.getenv("TOKEN_VALID_TTL_S", "300"))
+TOKEN_INVALID_TTL_S = int(os.getenv("TOKEN_INVALID_TTL_S", "30"))
+TOKEN_LOCAL_MAX_ENTRIES = 10000
 
+# ===================== SESSION =====================
+# Sesi HTTP (pool koneksi) dibuat per proses worker, lihat clients.http_session().
+# Ukuran pool: HTTP_POOL_CONNECTIONS / HTTP_POOL_MAXSIZE; bypass proxy: FORCE_BYPASS_PROXY.
+S = clients.SessionProxy()
+
+# Kredensial ada dua lapis:
+#   - token per request (ContextVar): token dari header Authorization caller. Nilainya lokal
+#     untuk thread / task yang sedang melayani request itu, jadi request user lain yang
+#     berjalan bersamaan di worker yang sama tidak pernah memakainya.
+#   - ACCESS_TOKEN: token "layanan" milik proses (file cache / login env LOGIN_EMAIL),
+#     dipakai jika request tidak membawa token sendiri.
 ACCESS_TOKEN: Optional[str] = None  # diisi setelah login/ensure_token
+_SAVED_TOKEN: Optional[str] = None  # token terakhir yang ditulis ke TOKEN_CACHE oleh proses ini
+_request_token: ContextVar[Optional[str]] = ContextVar("api_client_request_token", default=None)
+_service_lock = threading.RLock()
+
+# Single-flight: GET identik (URL + params + token) yang sedang berjalan dibagi bersama.
+_inflight: Dict[str, "_Flight"] = {}
+_inflight_lock = threading.Lock()
+_flight_stats = {"leaders": 0, "coalesced": 0}
+
+_token_checks: Dict[str, Tuple[bool, float]] = {}  # sha256 -> (valid, expires_at epoch)
+_token_lock = threading.Lock()
+_token_stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "pings": 0}
 
 # ===================== UTIL UMUM =====================
 def _safe_json(resp: requests.Response) -> Any:
@@ -55,46 +95,137 @@ def _safe_json(resp: requests.Response) -> Any:
     except Exception:
         return {"raw_text": resp.text}
 
+def current_token() -> Optional[str]:
+    """Token yang berlaku untuk request ini: token request jika ada, jika tidak token layanan."""
+    return _request_token.get() or ACCESS_TOKEN
+
+def request_token() -> Optional[str]:
+    """Token milik pemanggil yang terikat ke context ini (tanpa fallback ke token layanan)."""
+    return _request_token.get()
+
 def _auth_headers() -> Dict[str, str]:
     h = {"Accept": "application/json"}
-    if ACCESS_TOKEN:
-        h["Authorization"] = f"Bearer {ACCESS_TOKEN}"
+    token = current_token()
+    if token:
+        h["Authorization"] = f"Bearer {token}"
     return h
 
-def _get(url: str, **kw):
+def _endpoint_key(method: str, url: str) -> str:
+    """Kunci breaker: method + path dengan segmen numerik diganti {id}."""
+    path = url[len(BASE_URL):] if url.startswith(BASE_URL) else url
+    path = path.split("?", 1)[0]
+    return f"{method.upper()} " + "/".join("{id}" if seg.isdigit() else seg for seg in path.split("/"))
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+def _flight_key(url: str, kw: Dict[str, Any]) -> str:
+    auth = (kw.get("headers") or {}).get("Authorization") or ""
+    return http_cache._full_url(url, kw.get("params")) + "|" + hashlib.sha256(auth.encode("utf-8")).hexdigest()
+
+
+def _single_flight(key: str, fetch: Callable[[], requests.Response]) -> requests.Response:
+    """
+    Thread pertama untuk `key` (leader) menjalankan fetch(); thread lain yang datang selama
+    request itu berjalan menunggu dan menerima Response (atau exception) yang sama.
+    Body sudah terbaca penuh (tanpa stream), jadi Response aman dibaca bersama.
+    """
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+            _flight_stats["leaders"] += 1
+        else:
+            _flight_stats["coalesced"] += 1
+    if not leader:
+        # Leader selalu selesai dalam deadline resilience; batas tunggu hanya pengaman.
+        if not flight.done.wait(resilience.API_DEADLINE_S + 5):
+            return fetch()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = fetch()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    with _inflight_lock:
+        return {**_flight_stats, "in_flight": len(_inflight)}
+
+
+def _request(method: str, url: str, cache: bool = True, **kw):
+    # Timeout, retry (hanya method idempoten) & circuit breaker: lihat resilience.py.
+    # GET lewat cache kondisional di disk (ETag / Last-Modified): lihat http_cache.py.
+    method = method.upper()
     kw.setdefault("headers", _auth_headers())
-    kw.setdefault("timeout", 25)
     kw.setdefault("verify", VERIFY_SSL)
-    return S.get(url, **kw)
+    endpoint = _endpoint_key(method, url)
+
+    def _send(**send_kw):
+        return resilience.request(S, method, url, endpoint=endpoint, **send_kw)
+
+    if method == "GET":
+        # GET identik yang bersamaan (antar thread di worker ini) berbagi satu request.
+        fetch = (lambda: http_cache.cached_get(_send, url, kw)) if cache else (lambda: _send(**kw))
+        return _single_flight(_flight_key(url, kw), fetch)
+    r = _send(**kw)
+    if method != "GET" and r.status_code < 400:
+        http_cache.invalidate(url)
+    return r
+
+def _get(url: str, **kw):
+    return _request("GET", url, **kw)
 
 def _post(url: str, **kw):
-    kw.setdefault("headers", _auth_headers())
-    kw.setdefault("timeout", 25)
-    kw.setdefault("verify", VERIFY_SSL)
-    return S.post(url, **kw)
+    return _request("POST", url, **kw)
 
 def _put(url: str, **kw):
-    kw.setdefault("headers", _auth_headers())
-    kw.setdefault("timeout", 25)
-    kw.setdefault("verify", VERIFY_SSL)
-    return S.put(url, **kw)
+    return _request("PUT", url, **kw)
 
 def _delete(url: str, **kw):
-    kw.setdefault("headers", _auth_headers())
-    kw.setdefault("timeout", 25)
-    kw.setdefault("verify", VERIFY_SSL)
-    return S.delete(url, **kw)
+    return _request("DELETE", url, **kw)
 
-def _raise_on_error(r: requests.Response, op_desc: str):
+def _error_for_status(r, op_desc: str) -> Optional[Exception]:
+    """Petakan status respons ke exception (tanpa efek samping); None jika sukses."""
     if r.status_code == 401:
-        raise PermissionError(f"Unauthorized (401) saat {op_desc}. Token salah/kadaluarsa/DB berbeda.")
+        return PermissionError(f"Unauthorized (401) saat {op_desc}. Token salah/kadaluarsa/DB berbeda.")
     if r.status_code >= 400:
-        raise RuntimeError(f"Server {r.status_code} saat {op_desc} ({r.url})\n{r.text[:1200]}")
+        return RuntimeError(f"Server {r.status_code} saat {op_desc} ({r.url})\n{r.text[:1200]}")
+    return None
+
+def _raise_on_error(r: requests.Response, op_desc: str):
+    err = _error_for_status(r, op_desc)
+    if err is None:
+        return
+    if r.status_code == 401:
+        token = current_token()
+        if token:
+            forget_token(token)
+    raise err
 
 # ===================== TOKEN HANDLER =====================
 def _save_token(token: str):
+    global _SAVED_TOKEN
+    if token == _SAVED_TOKEN:
+        return  # file sudah berisi token ini; hindari tulis disk per request
     try:
         TOKEN_CACHE.write_text(json.dumps({"token": token}, ensure_ascii=False))
+        _SAVED_TOKEN = token
     except Exception:
         pass
 
@@ -107,16 +238,26 @@ def _load_token() -> Optional[str]:
     return None
 
 def set_token(token: str):
-    """Set token dari luar (mis. dari Flask) dan simpan ke cache."""
+    """Set token layanan proses ini dan simpan ke cache file."""
     global ACCESS_TOKEN
-    ACCESS_TOKEN = (token or "").strip()
-    if ACCESS_TOKEN:
-        _save_token(ACCESS_TOKEN)
+    with _service_lock:
+        ACCESS_TOKEN = (token or "").strip()
+        if ACCESS_TOKEN:
+            _save_token(ACCESS_TOKEN)
+
+def bind_request_token(token: Optional[str]) -> None:
+    """Pakai `token` untuk semua panggilan API di context (thread / task) ini."""
+    _request_token.set((token or "").strip() or None)
+
+def reset_request_token() -> None:
+    """Lepas token request; dipanggil di akhir setiap request Flask (thread gthread dipakai ulang)."""
+    _request_token.set(None)
 
 def clear_token():
     """Hapus token di memori & cache."""
-    global ACCESS_TOKEN
+    global ACCESS_TOKEN, _SAVED_TOKEN
     ACCESS_TOKEN = None
+    _SAVED_TOKEN = None
     try:
         if TOKEN_CACHE.exists():
             TOKEN_CACHE.unlink()
@@ -130,12 +271,14 @@ def _extract_token_from_resp(r: requests.Response) -> Optional[str]:
 def _ping_with_token(token: str) -> Tuple[bool, Optional[int]]:
     test_url = f"{BASE_URL}/api/{PANEL}/talent"
     try:
-        rr = S.get(
+        # Tanpa retry: ping gagal = token diloloskan (lihat except di bawah).
+        rr = _get(
             test_url,
             headers={"Accept": "application/json", "Authorization": f"Bearer {token}"},
             params={"page": 1, "per_page": 1},
             timeout=15,
-            verify=VERIFY_SSL,
+            retries=0,
+            cache=False,
         )
         if rr.status_code == 200:
             return True, 200
@@ -145,15 +288,97 @@ def _ping_with_token(token: str) -> Tuple[bool, Optional[int]]:
     except requests.RequestException:
         return True, None
 
+# ===================== CACHE VALIDASI TOKEN =====================
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _token_validations():
+    return clients.mongo().chatbot_db.token_validations
+
+def _epoch(dt: datetime) -> float:
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+def _remember_local(key: str, valid: bool, expires: float) -> None:
+    with _token_lock:
+        if len(_token_checks) >= TOKEN_LOCAL_MAX_ENTRIES:
+            now = time.time()
+            for k in [k for k, (_, exp) in _token_checks.items() if exp <= now]:
+                del _token_checks[k]
+            if len(_token_checks) >= TOKEN_LOCAL_MAX_ENTRIES:
+                _token_checks.clear()
+        _token_checks[key] = (valid, expires)
+
+def _cached_validity(token: str) -> Optional[bool]:
+    key, now = _token_key(token), time.time()
+    with _token_lock:
+        hit = _token_checks.get(key)
+        if hit and hit[1] > now:
+            _token_stats["local_hits"] += 1
+            return hit[0]
+    try:
+        doc = _token_validations().find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}, {"valid": 1, "expires_at": 1})
+    except Exception:
+        doc = None  # Mongo tidak tersedia -> validasi langsung ke Laravel
+    with _token_lock:
+        _token_stats["shared_hits" if doc else "misses"] += 1
+    if not doc:
+        return None
+    _remember_local(key, bool(doc["valid"]), _epoch(doc["expires_at"]))
+    return bool(doc["valid"])
+
+def _remember_validity(token: str, valid: bool) -> None:
+    key = _token_key(token)
+    expires = time.time() + (TOKEN_VALID_TTL_S if valid else TOKEN_INVALID_TTL_S)
+    _remember_local(key, valid, expires)
+    try:
+        _token_validations().update_one(
+            {"_id": key},
+            {"$set": {"valid": valid, "expires_at": datetime.fromtimestamp(expires, timezone.utc)}},
+            upsert=True,
+        )
+    except Exception:
+        pass
+
+def forget_token(token: str) -> None:
+    """Buang hasil validasi token (dipanggil saat API membalas 401)."""
+    key = _token_key(token)
+    with _token_lock:
+        _token_checks.pop(key, None)
+    try:
+        _token_validations().delete_one({"_id": key})
+    except Exception:
+        pass
+
+def validate_token(token: str) -> bool:
+    """
+    True jika token dianggap valid. Memakai cache validasi; ping ke Laravel hanya saat miss.
+    Hanya 200 (valid) dan 401 (invalid) yang di-cache; status lain / error jaringan tetap
+    diloloskan seperti sebelumnya, tapi diperiksa ulang pada request berikutnya.
+    """
+    cached = _cached_validity(token)
+    if cached is not None:
+        return cached
+    with _token_lock:
+        _token_stats["pings"] += 1
+    ok, status = _ping_with_token(token)
+    if status in (200, 401):
+        _remember_validity(token, status == 200)
+    return ok
+
+def token_cache_stats() -> Dict[str, Any]:
+    with _token_lock:
+        return {**_token_stats, "entries": len(_token_checks),
+                "valid_ttl_s": TOKEN_VALID_TTL_S, "invalid_ttl_s": TOKEN_INVALID_TTL_S}
+
 def login_and_get_token(email: str, password: str) -> str:
     url = f"{BASE_URL}/api/auth/login"
 
     # x-www-form-urlencoded
-    r = S.post(
+    r = _post(
         url,
         headers={"Accept": "application/json"},
         data={"email": email, "password": password},
-        verify=VERIFY_SSL,
         timeout=25,
     )
     if r.ok:
@@ -162,11 +387,10 @@ def login_and_get_token(email: str, password: str) -> str:
             return tok
 
     # JSON
-    r = S.post(
+    r = _post(
         url,
         headers={"Accept": "application/json", "Content-Type": "application/json"},
         json={"email": email, "password": password},
-        verify=VERIFY_SSL,
         timeout=25,
     )
     if r.ok:
@@ -175,11 +399,10 @@ def login_and_get_token(email: str, password: str) -> str:
             return tok
 
     # multipart/form-data
-    r = S.post(
+    r = _post(
         url,
         headers={"Accept": "application/json"},
         files={"email": (None, email), "password": (None, password)},
-        verify=VERIFY_SSL,
         timeout=25,
     )
     if r.ok:
@@ -191,50 +414,58 @@ def login_and_get_token(email: str, password: str) -> str:
 
 def ensure_token(preferred_token: Optional[str] = None):
     """
-    Server-mode: pastikan ACCESS_TOKEN siap.
-      - Jika preferred_token ada (mis. dari header Flask) -> validasi ringan -> pakai.
-      - Jika tidak ada, coba dari cache -> validasi -> pakai.
+    Server-mode: pastikan ada token untuk request ini.
+      - Jika preferred_token ada (mis. dari header Flask) -> validasi ringan -> dipakai
+        sebagai token request (context-local; tidak mengubah token layanan / file cache).
+      - Jika tidak ada, pakai token layanan: ACCESS_TOKEN yang sudah ada, lalu token dari
+        file cache.
+      Validasi memakai validate_token() (ter-cache), jadi ping ke Laravel hanya saat miss.
       - Jika tidak ada/invalid, coba login via env LOGIN_EMAIL/LOGIN_PASSWORD.
       - Jika semua gagal -> raise PermissionError.
     """
-    global ACCESS_TOKEN
+    global ACCESS_TOKEN, _SAVED_TOKEN
 
     # 0) Token dikirim dari caller (Flask header) -> prioritas
     if preferred_token:
-        ok, _ = _ping_with_token(preferred_token)
-        if ok:
-            ACCESS_TOKEN = preferred_token
-            _save_token(ACCESS_TOKEN)
+        if validate_token(preferred_token):
+            bind_request_token(preferred_token)
             return
         else:
             raise PermissionError("Token dari header tidak valid (401).")
 
-    # 1) Coba token dari cache
-    cached = _load_token()
-    if cached:
-        ok, _ = _ping_with_token(cached)
-        if ok:
-            ACCESS_TOKEN = cached
-            return
-        else:
-            clear_token()
-
-    # 2) Coba login otomatis dari env
-    email = os.getenv("LOGIN_EMAIL")
-    password = os.getenv("LOGIN_PASSWORD")
-    if email and password:
-        tok = login_and_get_token(email, password)
-        set_token(tok)
+    reset_request_token()
+    # 1) Token layanan proses ini, lalu token dari file cache
+    if ACCESS_TOKEN and validate_token(ACCESS_TOKEN):
         return
+    with _service_lock:
+        # Cek ulang: thread lain mungkin baru saja memulihkan token layanan.
+        if ACCESS_TOKEN and validate_token(ACCESS_TOKEN):
+            return
+        cached = _load_token()
+        if cached:
+            ok = validate_token(cached)
+            if ok:
+                ACCESS_TOKEN = _SAVED_TOKEN = cached
+                return
+            else:
+                clear_token()
+
+        # 2) Coba login otomatis dari env
+        email = os.getenv("LOGIN_EMAIL")
+        password = os.getenv("LOGIN_PASSWORD")
+        if email and password:
+            tok = login_and_get_token(email, password)
+            set_token(tok)
+            return
 
     # 3) Tidak ada cara lain di server-mode
     raise PermissionError("Tidak ada token atau kredensial login env. Set 'Authorization: Bearer <token>' atau LOGIN_EMAIL/PASSWORD.")
 
 def relogin_once_on_401(func: Callable, *args, **kwargs):
     """
-    Jalankan fungsi API. Jika 401 -> coba login via env sekali -> ulangi request.
+    Jalankan fungsi API. Jika 401 -> coba login via env sekali -> ulangi request
+    dengan token layanan yang baru (hanya untuk context ini).
     """
-    global ACCESS_TOKEN
     try:
         return func(*args, **kwargs)
     except PermissionError:
@@ -242,22 +473,80 @@ def relogin_once_on_401(func: Callable, *args, **kwargs):
         password = os.getenv("LOGIN_PASSWORD")
         if not (email and password):
             raise
-        # Re-login via env
-        ACCESS_TOKEN = login_and_get_token(email, password)
-        _save_token(ACCESS_TOKEN)
+        relogin_service_token(current_token())
+        reset_request_token()
         return func(*args, **kwargs)
 
+def relogin_service_token(stale: Optional[str]) -> None:
+    """
+    Login ulang via env setelah `stale` dibalas 401. Jika thread lain sudah mengganti token
+    layanan, token barunya dipakai tanpa login lagi. Dipakai juga oleh api_client_async.
+    """
+    with _service_lock:
+        if stale:
+            forget_token(stale)
+        if ACCESS_TOKEN == stale or not ACCESS_TOKEN:
+            set_token(login_and_get_token(os.getenv("LOGIN_EMAIL"), os.getenv("LOGIN_PASSWORD")))
+
 # ===================== GENERIC CRUD PER RESOURCE =====================
-def _list_resource(resource: str, page: int = 1, per_page: int = 10, search: Optional[str] = None) -> List[Dict[str, Any]]:
+def _fetch_page(resource: str, page: int, per_page: int, search: Optional[str] = None,
+                filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """Satu halaman list. Mengembalikan (items, ada_halaman_berikutnya)."""
     url = f"{BASE_URL}/api/{PANEL}/{resource}"
-    params = {"page": page, "per_page": per_page}
+    params = {**(filters or {}), "page": page, "per_page": per_page}
     if search:
         params["search"] = search
     r = _get(url, params=params)
     _raise_on_error(r, f"GET list {resource}")
-    data = _safe_json(r)
-    items = data["data"] if isinstance(data, dict) and "data" in data else data
-    return items or []
+    return _parse_page(_safe_json(r), page, per_page)
+
+def _parse_page(data: Any, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], bool]:
+    items = (data["data"] if isinstance(data, dict) and "data" in data else data) or []
+    # Paginator Laravel: {current_page, last_page, next_page_url} atau {meta: {...}, links: {next}}.
+    meta = (data.get("meta") or data) if isinstance(data, dict) else {}
+    if meta.get("last_page") is not None:
+        has_next = int(meta.get("current_page") or page) < int(meta["last_page"])
+    elif isinstance(data, dict) and ("next_page_url" in data or "links" in data):
+        has_next = bool(data.get("next_page_url") or (data.get("links") or {}).get("next"))
+    else:
+        has_next = len(items) >= per_page
+    return items, has_next
+
+def _list_resource(resource: str, page: int = 1, per_page: int = 10, search: Optional[str] = None) -> List[Dict[str, Any]]:
+    return _fetch_page(resource, page, per_page, search)[0]
+
+def iter_resource(resource: str, per_page: int = 100, search: Optional[str] = None,
+                  filters: Optional[Dict[str, Any]] = None, max_items: Optional[int] = None,
+                  start_page: int = 1) -> Iterator[Dict[str, Any]]:
+    """
+    Iterasi semua item list endpoint, halaman demi halaman. Halaman berikutnya sudah diminta
+    (di clients.executor) selagi halaman sekarang diproses, dan yang ditahan di memori hanya
+    dua halaman. Berhenti lebih awal dengan max_items atau cukup break/close generator;
+    prefetch yang belum jalan dibatalkan.
+    """
+    per_page = max(1, min(int(per_page), API_PAGE_SIZE_MAX))
+
+    def _submit(page: int):
+        return clients.executor().submit(contextvars.copy_context().run, relogin_once_on_401,
+                                         _fetch_page, resource, page, per_page, search, filters)
+
+    page, yielded = start_page, 0
+    pending = _submit(page)
+    try:
+        while pending is not None:
+            items, has_next = pending.result()
+            if max_items is not None and yielded + len(items) >= max_items:
+                has_next = False  # halaman ini sudah cukup; jangan prefetch
+            pending = _submit(page + 1) if has_next and items else None
+            page += 1
+            for item in items:
+                if max_items is not None and yielded >= max_items:
+                    return
+                yield item
+                yielded += 1
+    finally:
+        if pending is not None:
+            pending.cancel()
 
 def _get_detail(resource: str, rid: int) -> Dict[str, Any]:
     url = f"{BASE_URL}/api/{PANEL}/{resource}/{rid}"
@@ -286,7 +575,64 @@ def _delete_resource(resource: str, rid: int) -> Any:
     _raise_on_error(r, f"DELETE {resource} id {rid}")
     return {"deleted": True}
 
-# api_client.py
+# ===================== BATCH DETAIL =====================
+def _normalize_ids(ids: List[Any]) -> List[int]:
+    out, seen = [], set()
+    for rid in ids or []:
+        try:
+            rid = int(rid)
+        except (TypeError, ValueError):
+            raise ValueError(f"ID tidak valid: {rid!r}")
+        if rid not in seen:
+            seen.add(rid)
+            out.append(rid)
+    if len(out) > GET_MANY_MAX_IDS:
+        raise ValueError(f"Maksimal {GET_MANY_MAX_IDS} ID per permintaan.")
+    return out
+
+def _get_bulk(resource: str, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    url = f"{BASE_URL}/api/{PANEL}/{resource}"
+    r = _get(url, params={"ids": ",".join(map(str, ids)), "per_page": len(ids)})
+    _raise_on_error(r, f"GET bulk {resource}")
+    data = _safe_json(r)
+    items = data["data"] if isinstance(data, dict) and "data" in data else data
+    return {int(it["id"]): it for it in items or [] if isinstance(it, dict) and it.get("id") is not None}
+
+def get_many(resource: str, ids: List[Any]) -> Dict[str, Any]:
+    """
+    Ambil detail beberapa entitas sekaligus. ID diduplikasi & dinormalisasi, lalu:
+      - resource di API_BULK_RESOURCES: satu request list dengan filter ids;
+      - selain itu: request detail per id secara paralel di thread pool proses
+        (clients.executor, paralelisme dibatasi API_FANOUT_MAX_WORKERS).
+    Kegagalan satu id tidak menggagalkan yang lain.
+    Mengembalikan {"data": [detail sesuai urutan ids], "errors": {id: pesan}}.
+    """
+    ids = _normalize_ids(ids)
+    found: Dict[int, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    todo = ids
+    if resource in API_BULK_RESOURCES and ids:
+        try:
+            found = relogin_once_on_401(_get_bulk, resource, ids)
+            todo = [rid for rid in ids if rid not in found]
+        except PermissionError:
+            raise
+        except Exception:
+            todo = ids  # endpoint bulk tidak tersedia / gagal -> fallback per id
+    if todo:
+        pool = clients.executor()
+        # copy_context per tugas: token request (ContextVar) ikut terbawa ke thread pool.
+        futures = {rid: pool.submit(contextvars.copy_context().run, relogin_once_on_401, _get_detail, resource, rid)
+                   for rid in todo}
+        for rid, fut in futures.items():
+            try:
+                found[rid] = fut.result()
+            except Exception as e:
+                errors[str(rid)] = str(e).split("\n", 1)[0]
+    for rid in ids:
+        if rid not in found and str(rid) not in errors:
+            errors[str(rid)] = "Tidak ditemukan."
+    return {"data": [found[rid] for rid in ids if rid in found], "errors": errors}
 
 # ===================== RESOURCE: TALENT =====================
 def list_talent(page: int = 1, per_page: int = 10, search: Optional[str] = None):
@@ -295,6 +641,12 @@ def list_talent(page: int = 1, per_page: int = 10, search: Optional[str] = None)
 def get_talent_detail(talent_id: int):
     return relogin_once_on_401(_get_detail, "talent", talent_id)
 
+def get_talent_details(talent_ids: List[int]):
+    return get_many("talent", talent_ids)
+
+def iter_talent(per_page: int = 100, search: Optional[str] = None, max_items: Optional[int] = None):
+    return iter_resource("talent", per_page=per_page, search=search, max_items=max_items)
+
 def create_talent(name: str, position: str, birthdate: str, summary: str, **kwargs):
     # PATTERN BARU: Menggunakan **kwargs untuk fleksibilitas
     payload = {"name": name, "position": position, "birthdate": birthdate, "summary": summary, **kwargs}
@@ -319,6 +671,13 @@ def list_candidates(page: int = 1, per_page: int = 10, search: Optional[str] = N
 def get_candidate_detail(candidate_id: int):
     return relogin_once_on_401(_get_detail, "candidates", candidate_id)
 
+def get_candidate_details(candidate_ids: List[int]):
+    return get_many("candidates", candidate_ids)
+
+def iter_candidates(job_opening_id: Optional[int] = None, per_page: int = 100, max_items: Optional[int] = None):
+    filters = {"job_opening_id": job_opening_id} if job_opening_id is not None else None
+    return iter_resource("candidates", per_page=per_page, filters=filters, max_items=max_items)
+
 def create_candidate(talent_id: int, job_opening_id: int, **kwargs):
     payload = {"talent_id": talent_id, "job_opening_id": job_opening_id, **kwargs}
     return relogin_once_on_401(_create_resource, "candidates", payload)
@@ -340,6 +699,9 @@ def list_companies(page: int = 1, per_page: int = 10, search: Optional[str] = No
 def get_company_detail(company_id: int):
     return relogin_once_on_401(_get_detail, "companies", company_id)
 
+def get_company_details(company_ids: List[int]):
+    return get_many("companies", company_ids)
+
 def create_company(name: str, **kwargs):
     payload = {"name": name, **kwargs}
     return relogin_once_on_401(_create_resource, "companies", payload)
@@ -376,6 +738,10 @@ def delete_company_property(prop_id: int):
     return relogin_once_on_401(_delete_resource, "company-properties", prop_id)
 
 # ===================== RESOURCE: JOB OPENINGS =====================
+def list_job_openings_page(page: int = 1, per_page: int = 10, search: Optional[str] = None):
+    """Satu halaman list lowongan dari admin API (list_job_openings di bawah mencari lewat Chroma)."""
+    return relogin_once_on_401(_list_resource, "job-openings", page, per_page, search)
+
 def list_job_openings(search: Optional[str] = None):
     from vectordb import Chroma
     print("HELLO")
@@ -397,6 +763,9 @@ def list_job_openings(search: Optional[str] = None):
 def get_job_opening_detail(opening_id: int):
     return relogin_once_on_401(_get_detail, "job-openings", opening_id)
 
+def get_job_opening_details(opening_ids: List[int]):
+    return get_many("job-openings", opening_ids)
+
 def create_job_opening(company_id: int, title: str, body: Optional[str] = None, status: int = 1, **kwargs):
     payload = {"company_id": company_id, "title": title}
     payload["body"] = body if body is not None else ""
@@ -0,0 +1,334 @@
+# api_client_async.py
+# -*- coding: utf-8 -*-
+"""
+Varian asyncio dari api_client: nama & argumen fungsi resource sama (list_talent,
+get_company_detail, create_candidate, ...), hanya saja berupa coroutine:
+
+    import api_client_async as aapi
+    details = await asyncio.gather(*(aapi.get_talent_detail(i) for i in ids))
+
+Yang dibagi dengan versi sync (bukan disalin):
+  - token: current_token() / ContextVar token request, token layanan, cache validasi
+    dan login ulang sekali saat 401 (relogin_service_token);
+  - error: PermissionError untuk 401, RuntimeError untuk status >= 400, error jaringan
+    sebagai exception requests (lihat resilience.request_async), plus CircuitOpenError;
+  - breaker, retry & deadline per endpoint (resilience), jadi kegagalan dari jalur sync
+    maupun async membuka breaker yang sama.
+
+HTTP lewat httpx.AsyncClient per event loop (clients.async_http): pool koneksi dengan
+keep-alive, banyak request berjalan bersamaan dari satu thread. Paralelisme satu
+pemanggilan get_many / iterasi dibatasi ASYNC_API_MAX_CONCURRENCY.
+
+GET async tidak lewat http_cache (I/O disk akan memblokir event loop), tetapi write
+async tetap menghapus entri cache resource-nya (di thread terpisah) supaya jalur sync
+tidak membaca data basi.
+"""
+import os
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import clients
+import resilience
+import http_cache
+import api_client
+from api_client import BASE_URL, PANEL, current_token, bind_request_token, reset_request_token
+
+ASYNC_API_MAX_CONCURRENCY = int(os.getenv("ASYNC_API_MAX_CONCURRENCY", "16"))
+
+
+# ===================== TOKEN =====================
+async def ensure_token(preferred_token: Optional[str] = None) -> None:
+    """
+    Sama seperti api_client.ensure_token. Validasi / login (blocking) dijalankan di thread,
+    token request di-bind di context task pemanggil.
+    """
+    if preferred_token:
+        if await asyncio.to_thread(api_client.validate_token, preferred_token):
+            bind_request_token(preferred_token)
+            return
+        raise PermissionError("Token dari header tidak valid (401).")
+    reset_request_token()
+    await asyncio.to_thread(api_client.ensure_token, None)
+
+
+async def relogin_once_on_401(func, *args, **kwargs):
+    """Versi async api_client.relogin_once_on_401: login ulang via env sekali lalu ulangi."""
+    try:
+        return await func(*args, **kwargs)
+    except PermissionError:
+        if not (os.getenv("LOGIN_EMAIL") and os.getenv("LOGIN_PASSWORD")):
+            raise
+        await asyncio.to_thread(api_client.relogin_service_token, current_token())
+        reset_request_token()
+        return await func(*args, **kwargs)
+
+
+# ===================== HTTP =====================
+async def _request(method: str, url: str, **kw):
+    method = method.upper()
+    kw.setdefault("headers", api_client._auth_headers())
+    r = await resilience.request_async(clients.async_http(), method, url,
+                                       endpoint=api_client._endpoint_key(method, url), **kw)
+    if method != "GET" and r.status_code < 400:
+        # Invalidasi menyentuh disk (scandir + unlink): jalankan di thread, bukan di event loop.
+        await asyncio.to_thread(http_cache.invalidate, url)
+    return r
+
+
+async def _raise_on_error(r, op_desc: str) -> None:
+    """Seperti api_client._raise_on_error; forget_token (Mongo, blocking) dijalankan di thread."""
+    err = api_client._error_for_status(r, op_desc)
+    if err is None:
+        return
+    if r.status_code == 401:
+        token = current_token()
+        if token:
+            await asyncio.to_thread(api_client.forget_token, token)
+    raise err
+
+
+def _unwrap(data: Any) -> Any:
+    return data["data"] if isinstance(data, dict) and "data" in data else data
+
+
+# ===================== GENERIC CRUD PER RESOURCE =====================
+async def _fetch_page(resource: str, page: int, per_page: int, search: Optional[str] = None,
+                      filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    url = f"{BASE_URL}/api/{PANEL}/{resource}"
+    params = {**(filters or {}), "page": page, "per_page": per_page}
+    if search:
+        params["search"] = search
+    r = await _request("GET", url, params=params)
+    await _raise_on_error(r, f"GET list {resource}")
+    return api_client._parse_page(api_client._safe_json(r), page, per_page)
+
+
+async def _list_resource(resource: str, page: int = 1, per_page: int = 10,
+                         search: Optional[str] = None) -> List[Dict[str, Any]]:
+    return (await _fetch_page(resource, page, per_page, search))[0]
+
+
+async def iter_resource(resource: str, per_page: int = 100, search: Optional[str] = None,
+                        filters: Optional[Dict[str, Any]] = None, max_items: Optional[int] = None,
+                        start_page: int = 1) -> AsyncIterator[Dict[str, Any]]:
+    """Seperti api_client.iter_resource: halaman berikutnya diminta (task) selagi halaman ini diproses."""
+    per_page = max(1, min(int(per_page), api_client.API_PAGE_SIZE_MAX))
+
+    def _submit(page: int) -> asyncio.Task:
+        return asyncio.ensure_future(relogin_once_on_401(_fetch_page, resource, page, per_page, search, filters))
+
+    page, yielded = start_page, 0
+    pending: Optional[asyncio.Task] = _submit(page)
+    try:
+        while pending is not None:
+            items, has_next = await pending
+            if max_items is not None and yielded + len(items) >= max_items:
+                has_next = False
+            pending = _submit(page + 1) if has_next and items else None
+            page += 1
+            for item in items:
+                if max_items is not None and yielded >= max_items:
+                    return
+                yield item
+                yielded += 1
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def _get_detail(resource: str, rid: int) -> Dict[str, Any]:
+    url = f"{BASE_URL}/api/{PANEL}/{resource}/{rid}"
+    r = await _request("GET", url)
+    await _raise_on_error(r, f"GET detail {resource} id {rid}")
+    return _unwrap(api_client._safe_json(r))
+
+
+async def _create_resource(resource: str, payload: Dict[str, Any]) -> Any:
+    url = f"{BASE_URL}/api/{PANEL}/{resource}"
+    r = await _request("POST", url, json=payload)
+    await _raise_on_error(r, f"POST create {resource}")
+    return api_client._safe_json(r)
+
+
+async def _update_resource(resource: str, rid: int, payload: Dict[str, Any]) -> Any:
+    url = f"{BASE_URL}/api/{PANEL}/{resource}/{rid}"
+    r = await _request("PUT", url, json=payload)
+    await _raise_on_error(r, f"PUT update {resource} id {rid}")
+    return api_client._safe_json(r)
+
+
+async def _delete_resource(resource: str, rid: int) -> Any:
+    url = f"{BASE_URL}/api/{PANEL}/{resource}/{rid}"
+    r = await _request("DELETE", url)
+    if r.status_code in (200, 204):
+        return {"deleted": True}
+    await _raise_on_error(r, f"DELETE {resource} id {rid}")
+    return {"deleted": True}
+
+
+# ===================== BATCH DETAIL =====================
+async def _get_bulk(resource: str, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    url = f"{BASE_URL}/api/{PANEL}/{resource}"
+    r = await _request("GET", url, params={"ids": ",".join(map(str, ids)), "per_page": len(ids)})
+    await _raise_on_error(r, f"GET bulk {resource}")
+    items = _unwrap(api_client._safe_json(r))
+    return {int(it["id"]): it for it in items or [] if isinstance(it, dict) and it.get("id") is not None}
+
+
+async def get_many(resource: str, ids: List[Any]) -> Dict[str, Any]:
+    """Seperti api_client.get_many; fan-out per id berupa task, dibatasi ASYNC_API_MAX_CONCURRENCY."""
+    ids = api_client._normalize_ids(ids)
+    found: Dict[int, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    todo = ids
+    if resource in api_client.API_BULK_RESOURCES and ids:
+        try:
+            found = await relogin_once_on_401(_get_bulk, resource, ids)
+            todo = [rid for rid in ids if rid not in found]
+        except PermissionError:
+            raise
+        except Exception:
+            todo = ids
+    if todo:
+        sem = asyncio.Semaphore(ASYNC_API_MAX_CONCURRENCY)
+
+        async def _one(rid: int):
+            async with sem:
+                return await relogin_once_on_401(_get_detail, resource, rid)
+
+        results = await asyncio.gather(*(_one(rid) for rid in todo), return_exceptions=True)
+        for rid, res in zip(todo, results):
+            if isinstance(res, BaseException):
+                errors[str(rid)] = str(res).split("\n", 1)[0]
+            else:
+                found[rid] = res
+    for rid in ids:
+        if rid not in found and str(rid) not in errors:
+            errors[str(rid)] = "Tidak ditemukan."
+    return {"data": [found[rid] for rid in ids if rid in found], "errors": errors}
+
+
+# ===================== RESOURCE: TALENT =====================
+async def list_talent(page: int = 1, per_page: int = 10, search: Optional[str] = None):
+    return await relogin_once_on_401(_list_resource, "talent", page, per_page, search)
+
+async def get_talent_detail(talent_id: int):
+    return await relogin_once_on_401(_get_detail, "talent", talent_id)
+
+async def get_talent_details(talent_ids: List[int]):
+    return await get_many("talent", talent_ids)
+
+def iter_talent(per_page: int = 100, search: Optional[str] = None, max_items: Optional[int] = None):
+    return iter_resource("talent", per_page=per_page, search=search, max_items=max_items)
+
+async def create_talent(name: str, position: str, birthdate: str, summary: str, **kwargs):
+    payload = {"name": name, "position": position, "birthdate": birthdate, "summary": summary, **kwargs}
+    return await relogin_once_on_401(_create_resource, "talent", payload)
+
+async def update_talent(talent_id: int, name: Optional[str] = None, position: Optional[str] = None,
+                        birthdate: Optional[str] = None, summary: Optional[str] = None):
+    payload = {k: v for k, v in {"name": name, "position": position, "birthdate": birthdate,
+                                 "summary": summary}.items() if v is not None}
+    return await relogin_once_on_401(_update_resource, "talent", talent_id, payload)
+
+async def delete_talent(talent_id: int):
+    return await relogin_once_on_401(_delete_resource, "talent", talent_id)
+
+# ===================== RESOURCE: CANDIDATES =====================
+async def list_candidates(page: int = 1, per_page: int = 10, search: Optional[str] = None):
+    return await relogin_once_on_401(_list_resource, "candidates", page, per_page, search)
+
+async def get_candidate_detail(candidate_id: int):
+    return await relogin_once_on_401(_get_detail, "candidates", candidate_id)
+
+async def get_candidate_details(candidate_ids: List[int]):
+    return await get_many("candidates", candidate_ids)
+
+def iter_candidates(job_opening_id: Optional[int] = None, per_page: int = 100, max_items: Optional[int] = None):
+    filters = {"job_opening_id": job_opening_id} if job_opening_id is not None else None
+    return iter_resource("candidates", per_page=per_page, filters=filters, max_items=max_items)
+
+async def create_candidate(talent_id: int, job_opening_id: int, **kwargs):
+    payload = {"talent_id": talent_id, "job_opening_id": job_opening_id, **kwargs}
+    return await relogin_once_on_401(_create_resource, "candidates", payload)
+
+async def update_candidate(candidate_id: int, **kwargs):
+    payload = {k: v for k, v in kwargs.items() if v is not None}
+    if not payload:
+        return {"message": "Tidak ada data untuk diupdate."}
+    return await relogin_once_on_401(_update_resource, "candidates", candidate_id, payload)
+
+async def delete_candidate(candidate_id: int):
+    return await relogin_once_on_401(_delete_resource, "candidates", candidate_id)
+
+# ===================== RESOURCE: COMPANIES =====================
+async def list_companies(page: int = 1, per_page: int = 10, search: Optional[str] = None):
+    return await relogin_once_on_401(_list_resource, "companies", page, per_page, search)
+
+async def get_company_detail(company_id: int):
+    return await relogin_once_on_401(_get_detail, "companies", company_id)
+
+async def get_company_details(company_ids: List[int]):
+    return await get_many("companies", company_ids)
+
+async def create_company(name: str, **kwargs):
+    payload = {"name": name, **kwargs}
+    return await relogin_once_on_401(_create_resource, "companies", payload)
+
+async def update_company(company_id: int, **kwargs):
+    payload = {k: v for k, v in kwargs.items() if v is not None}
+    if not payload:
+        return {"message": "Tidak ada data untuk diupdate."}
+    return await relogin_once_on_401(_update_resource, "companies", company_id, payload)
+
+async def delete_company(company_id: int):
+    return await relogin_once_on_401(_delete_resource, "companies", company_id)
+
+# ===================== RESOURCE: COMPANY PROPERTIES =====================
+async def list_company_properties(page: int = 1, per_page: int = 10, search: Optional[str] = None):
+    return await relogin_once_on_401(_list_resource, "company-properties", page, per_page, search)
+
+async def get_company_property_detail(prop_id: int):
+    return await relogin_once_on_401(_get_detail, "company-properties", prop_id)
+
+async def create_company_property(company_id: int, key: str, value: str):
+    payload = {"company_id": company_id, "key": key, "value": value}
+    return await relogin_once_on_401(_create_resource, "company-properties", payload)
+
+async def update_company_property(prop_id: int, **kwargs):
+    payload = {k: v for k, v in kwargs.items() if v is not None}
+    if not payload:
+        return {"message": "Tidak ada data untuk diupdate."}
+    return await relogin_once_on_401(_update_resource, "company-properties", prop_id, payload)
+
+async def delete_company_property(prop_id: int):
+    return await relogin_once_on_401(_delete_resource, "company-properties", prop_id)
+
+# ===================== RESOURCE: JOB OPENINGS =====================
+async def list_job_openings(search: Optional[str] = None):
+    # Pencarian lowongan lewat Chroma (klien sync): dijalankan di thread.
+    return await asyncio.to_thread(api_client.list_job_openings, search)
+
+async def get_job_opening_detail(opening_id: int):
+    return await relogin_once_on_401(_get_detail, "job-openings", opening_id)
+
+async def get_job_opening_details(opening_ids: List[int]):
+    return await get_many("job-openings", opening_ids)
+
+async def create_job_opening(company_id: int, title: str, body: Optional[str] = None, status: int = 1, **kwargs):
+    payload = {"company_id": company_id, "title": title, "body": body if body is not None else "",
+               "status": status, **kwargs}
+    return await relogin_once_on_401(_create_resource, "job-openings", payload)
+
+async def update_job_opening(opening_id: int, **kwargs):
+    payload = {k: v for k, v in kwargs.items() if v is not None}
+    if not payload:
+        return {"message": "Tidak ada data untuk diupdate."}
+    return await relogin_once_on_401(_update_resource, "job-openings", opening_id, payload)
+
+async def delete_job_opening(opening_id: int):
+    return await relogin_once_on_401(_delete_resource, "job-openings", opening_id)
+
+# ===================== RESOURCE: OFFERS =====================
+async def get_offer_details(candidate_id: int):
+    return await relogin_once_on_401(_get_detail, "offers", candidate_id)
@@ -3,18 +3,43 @@
 import os
 import json
 import time
+import hashlib
 import traceback
 from uuid import uuid4
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, make_response, Response, stream_with_context
 from flask_cors import CORS
-from openai import OpenAI, RateLimitError
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
-from api_client import ensure_token, get_talent_detail, get_company_detail
+from openai import RateLimitError
+import clients
+from api_client import (
+    ensure_token, get_talent_detail, get_company_detail, token_cache_stats, reset_request_token,
+    single_flight_stats,
+)
+from chat_store import (
+    mongo_available, users_chats, get_or_create_chat_doc, find_session,
+    upsert_session_messages, append_session, list_session_summaries,
+    needs_summary_backfill, backfill_session_summaries, serialize_summary,
+    slice_bounds, load_session_range, session_version,
+    load_session_cached, commit_session_messages,
+    DEFAULT_SESSION_TITLE, SESSIONS_PAGE_DEFAULT,
+)
+from blob_store import hydrate_messages
+from prompt_registry import system_message, hydrate_prompts
+import write_behind
+import session_cache
+import search_index
+import transfer
+import analytics
+import resilience
+import http_cache
+import warmup
+import company_index
+import bulk_import
+import talent_index
+from retention import restore_session
 
 # ======================================================================
 # KONFIGURASI UMUM
@@ -29,29 +54,12 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY belum diisi.")
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-MONGO_URI = os.getenv("MONGO_URI")
-if not MONGO_URI:
-    raise RuntimeError("MONGO_URI belum diisi.")
+# Klien dibuat per worker (clients.openai) supaya pool koneksinya tidak dibagi lewat fork.
+client = clients.OpenAIProxy()
 
 API_LOG_DIR = os.getenv("API_LOG_DIR", "./logs")
 os.makedirs(API_LOG_DIR, exist_ok=True)
 
-# ======================================================================
-# KONEKSI MONGODB
-# ======================================================================
-mongo_client = None
-users_chats = None
-try:
-    mongo_client = MongoClient(MONGO_URI, server_api=ServerApi('1'))
-    db = mongo_client.chatbot_db
-    users_chats = db.users_chats
-    print("Berhasil terhubung ke MongoDB.")
-except Exception as e:
-    print(f"Gagal terhubung ke MongoDB: {e}")
-    mongo_client = None
-
 # ======================================================================
 # SYSTEM PROMPT (Tetap kompleks untuk alur kerja AI)
 # ======================================================================
@@ -167,44 +175,32 @@ def parse_user(user_field: str) -> Tuple[str, str]:
         raise ValueError("userid atau nama tidak boleh kosong.")
     return userid, name
 
-def get_or_create_chat_doc(name: str) -> dict:
-    # --- PERBAIKAN DI SINI ---
-    # Fungsi ini sekarang HANYA menerima 'name'
-    doc = users_chats.find_one({"name": name})
-    if doc:
-        return doc
-    new_doc = {"name": name, "sessions": []}
-    users_chats.insert_one(new_doc)
-    return users_chats.find_one({"name": name})
-
-def find_session(doc: dict, session_id: str) -> Optional[dict]:
-    for s in (doc.get("sessions") or []):
-        if s.get("session_id") == session_id:
-            return s
-    return None
+def _opt_int(v: Optional[str]) -> Optional[int]:
+    v = (v or "").strip()
+    return int(v) if v else None
 
-def upsert_session_messages(name: str, session_id: str, messages: List[dict]) -> None:
-    users_chats.update_one(
-        {"name": name, "sessions.session_id": session_id},
-        {"$set": {"sessions.$.messages": messages}}
-    )
-
-def append_session(name: str, session_id: str, created_at: datetime, messages: List[dict], title: str) -> None:
-    if created_at.tzinfo is None:
-        created_at = created_at.replace(tzinfo=timezone.utc)
-    users_chats.update_one(
-        {"name": name},
-        {"$push": {"sessions": {
-            "session_id": session_id, "created_at": created_at,
-            "title": title, "messages": messages
-        }}}
-    )
+def _messages_etag(session_id: str, version: int) -> str:
+    return hashlib.sha1(f"{session_id}:{version}:{request.query_string.decode()}".encode()).hexdigest()
 
 def _extract_bearer_token(req) -> str:
     auth = (req.headers.get("Authorization") or "").strip()
     if auth.lower().startswith("bearer "):
         return auth.split(" ", 1)[1].strip()
     return ""
+
+def _require_bearer_token(req):
+    """
+    Untuk endpoint admin: token Bearer wajib ada dan valid. Tidak pernah jatuh ke token
+    layanan. Mengembalikan respons 401, atau None jika token valid (terikat ke request ini).
+    """
+    incoming_token = _extract_bearer_token(req)
+    if not incoming_token:
+        return jsonify({"error": "Header Authorization: Bearer <token> wajib diisi."}), 401
+    try:
+        ensure_token(preferred_token=incoming_token)
+    except Exception as e:
+        return jsonify({"error": f"Auth Admin API gagal: {str(e)}"}), 401
+    return None
    
 # ======================================================================
 # IMPORT TOOLS + INJEKSI HELPER
@@ -215,10 +211,59 @@ set_helpers(get_or_create_chat_doc, append_session, DEFAULT_SYSTEM_PROMPT)
 # ======================================================================
 # ROUTES (VALIDASI DIHAPUS)
 # ======================================================================
+@app.teardown_request
+def _release_api_token(_exc):
+    # Token Authorization hanya berlaku untuk request ini (lihat api_client.current_token).
+    reset_request_token()
+
 @app.route("/")
 def index():
     return render_template("index.html")
 
+@app.get("/api/metrics")
+def metrics():
+    denied = _require_bearer_token(request)
+    if denied:
+        return denied
+    return jsonify({
+        "pid": os.getpid(),
+        "session_cache": session_cache.stats(),
+        "token_cache": token_cache_stats(),
+        "api_breakers": resilience.breaker_stats(),
+        "http_cache": http_cache.stats(),
+        "api_single_flight": single_flight_stats(),
+        "upstream_connects": clients.connect_stats(),
+        "upstream_warmup": warmup.stats(),
+        "company_index": company_index.stats(),
+        "talent_index": talent_index.stats(),
+    })
+
+@app.get("/api/analytics")
+def get_analytics():
+    try:
+        incoming_token = _extract_bearer_token(request)
+        ensure_token(preferred_token=incoming_token if incoming_token else None)
+    except Exception as e:
+        return jsonify({"error": f"Auth Admin API gagal: {str(e)}"}), 401
+    name = None
+    user_field = (request.args.get("user") or "").strip()
+    try:
+        if user_field:
+            _, name = parse_user(user_field)
+        day_from, day_to = analytics.parse_range(request.args.get("from"), request.args.get("to"))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    if not mongo_available():
+        return jsonify({"error": "MongoDB tidak tersedia"}), 500
+    # Dibaca dari bucket usage_daily yang sudah dihitung saat chat, bukan dari riwayat.
+    return jsonify(analytics.summarize(day_from, day_to, name=name))
+
+@app.get("/healthz")
+def healthz():
+    check_chroma = (request.args.get("chroma") or "").lower() in ("1", "true")
+    status = clients.health(check_chroma=check_chroma)
+    return jsonify(status), (200 if status["ok"] else 503)
+
 @app.route("/api/sessions", methods=["GET"])
 def list_sessions():
     try:
@@ -233,22 +278,146 @@ def list_sessions():
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
 
-    if not mongo_client:
+    if not mongo_available():
         return jsonify({"error": "MongoDB tidak tersedia"}), 500
 
-    doc = get_or_create_chat_doc(userid=userid, name=name)
-    sessions = []
-    for s in doc.get("sessions", []):
-        created = s.get("created_at")
-        created_str = created.isoformat() if hasattr(created, "isoformat") else created
-        sessions.append({
-            "session_id": s.get("session_id"),
-            "title": s.get("title", "Percakapan Baru"),
-            "created_at": created_str,
-            "messages_count": len(s.get("messages") or [])
-        })
-    sessions.sort(key=lambda x: x.get("created_at") or "", reverse=True)
-    return jsonify({"name": name, "sessions": sessions})
+    try:
+        limit = int(request.args.get("limit") or SESSIONS_PAGE_DEFAULT)
+    except ValueError:
+        return jsonify({"error": "Parameter 'limit' harus berupa angka."}), 400
+    cursor = (request.args.get("cursor") or "").strip() or None
+
+    # Sesi lama (sebelum ada chat_sessions) diringkas sekali saja per user.
+    if not cursor and needs_summary_backfill(name):
+        backfill_session_summaries(name)
+
+    try:
+        rows, next_cursor = list_session_summaries(name, limit=limit, cursor=cursor)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify({
+        "name": name,
+        "sessions": [serialize_summary(s) for s in rows],
+        "next_cursor": next_cursor,
+    })
+
+@app.get("/api/sessions/search")
+def search_sessions():
+    try:
+        incoming_token = _extract_bearer_token(request)
+        if incoming_token: ensure_token(preferred_token=incoming_token)
+    except Exception as e:
+        return jsonify({"error": f"Auth Admin API gagal: {str(e)}"}), 401
+
+    user_field = (request.args.get("user") or "").strip()
+    try:
+        userid, name = parse_user(user_field)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    if not mongo_available():
+        return jsonify({"error": "MongoDB tidak tersedia"}), 500
+
+    q = (request.args.get("q") or "").strip()
+    cursor = (request.args.get("cursor") or "").strip() or None
+    try:
+        limit = int(request.args.get("limit") or search_index.SEARCH_PAGE_DEFAULT)
+    except ValueError:
+        return jsonify({"error": "Parameter 'limit' harus berupa angka."}), 400
+    started = time.perf_counter()
+    try:
+        results, next_cursor = search_index.search(name, q, limit=limit, cursor=cursor)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify({
+        "name": name,
+        "q": q,
+        "results": results,
+        "next_cursor": next_cursor,
+        "took_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+@app.get("/api/sessions/export")
+def export_sessions():
+    try:
+        incoming_token = _extract_bearer_token(request)
+        ensure_token(preferred_token=incoming_token if incoming_token else None)
+    except Exception as e:
+        return jsonify({"error": f"Auth Admin API gagal: {str(e)}"}), 401
+
+    user_field = (request.args.get("user") or "").strip()
+    try:
+        userid, name = parse_user(user_field)
+        since = transfer.parse_date(request.args.get("since"))
+        until = transfer.parse_date(request.args.get("until"))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    if not mongo_available():
+        return jsonify({"error": "MongoDB tidak tersedia"}), 500
+
+    raw = (request.args.get("raw") or "").lower() in ("1", "true")
+    # Di-stream baris per baris; export lintas user hanya lewat `python manage.py export`.
+    body = transfer.export_ndjson(name=name, since=since, until=until, hydrate=not raw)
+    return Response(stream_with_context(body), mimetype="application/x-ndjson", headers={
+        "Content-Disposition": f'attachment; filename="sessions-{name}.ndjson"',
+    })
+
+@app.post("/api/sessions/import")
+def import_sessions():
+    try:
+        incoming_token = _extract_bearer_token(request)
+        ensure_token(preferred_token=incoming_token if incoming_token else None)
+    except Exception as e:
+        return jsonify({"error": f"Auth Admin API gagal: {str(e)}"}), 401
+    if not mongo_available():
+        return jsonify({"error": "MongoDB tidak tersedia"}), 500
+    try:
+        skip = _opt_int(request.args.get("skip")) or 0
+    except ValueError:
+        return jsonify({"error": "Parameter 'skip' harus berupa angka."}), 400
+
+    # Body NDJSON dibaca per baris dari stream, tidak pernah dimuat utuh ke memori.
+    progress = {"checkpoint": skip}
+    def _on_batch(checkpoint: int) -> None:
+        progress["checkpoint"] = checkpoint
+    try:
+        stats = transfer.import_ndjson(request.stream, skip=skip, on_batch=_on_batch)
+    except ValueError as ve:
+        # checkpoint = jumlah sesi yang sudah tersimpan; kirim ulang dengan ?skip=<checkpoint>.
+        return jsonify({"error": str(ve), "checkpoint": progress["checkpoint"]}), 400
+    return jsonify({"status": "success", **stats})
+
+@app.post("/api/import/<resource>")
+def start_bulk_import(resource):
+    """
+    Impor massal talent / companies. Body: multipart field `file`, atau isi file mentah
+    dengan ?format=csv|jsonl. Diproses di background; pantau lewat /api/import/jobs/<job_id>.
+    """
+    denied = _require_bearer_token(request)
+    if denied:
+        return denied
+    if not mongo_available():
+        return jsonify({"error": "MongoDB tidak tersedia"}), 500
+    upload = request.files.get("file")
+    try:
+        fmt = bulk_import.detect_format(upload.filename if upload else None, request.args.get("format"))
+        job_id = bulk_import.start_job(resource, fmt, upload.stream if upload else request.stream,
+                                       filename=upload.filename if upload else None)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify({"status": "accepted", "job_id": job_id}), 202
+
+@app.get("/api/import/jobs/<job_id>")
+def get_bulk_import(job_id):
+    denied = _require_bearer_token(request)
+    if denied:
+        return denied
+    if not mongo_available():
+        return jsonify({"error": "MongoDB tidak tersedia"}), 500
+    job = bulk_import.job_status(job_id)
+    if job is None:
+        return jsonify({"error": "Job impor tidak ditemukan"}), 404
+    return jsonify(job)
 
 @app.route("/api/sessions", methods=["POST"])
 def create_session():
@@ -269,19 +438,19 @@ def create_session():
     # Sapaan disederhanakan karena tidak ada user_type
     personalized_greeting = f"Hai {name}, adakah yang bisa saya bantu?"
     
-    if not mongo_client:
+    if not mongo_available():
         return jsonify({"error": "MongoDB tidak tersedia"}), 500
 
-    _ = get_or_create_chat_doc(userid=userid, name=name)
+    _ = get_or_create_chat_doc(name=name)
     new_sid = str(uuid4())
     created_at = datetime.now(timezone.utc)
-    default_title = "Percakapan Baru"
+    default_title = DEFAULT_SESSION_TITLE
     messages = [
-        {"role": "system", "content": system_prompt},
+        system_message(system_prompt, key="default" if system_prompt == DEFAULT_SYSTEM_PROMPT else "custom"),
         {"role": "assistant", "content": personalized_greeting},
     ]
     append_session(
-        userid=userid,
+        name=name,
         session_id=new_sid,
         created_at=created_at,
         messages=messages,
@@ -309,10 +478,18 @@ def chat():
 
     if not user_name or not user_msg:
         return jsonify({"error": "Input tidak lengkap (membutuhkan user dan message)."}), 400
-
-    if not mongo_client:
+    # Samakan kunci dokumen dengan /api/sessions & /api/session/messages (bagian 'nama' dari 'userid@nama').
+    # Dokumen lama yang tersimpan dengan kunci 'userid@nama' dipindah oleh migrasi 0006.
+    if "@" in user_name:
+        try:
+            _, user_name = parse_user(user_name)
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+
+    if not mongo_available():
         return jsonify({"error": "MongoDB tidak tersedia"}), 500
 
+    turn_started = time.perf_counter()
     is_new_session = not session_id
     messages_full: List[dict] = []
     
@@ -322,25 +499,31 @@ def chat():
         # Panggilan ini sekarang cocok dengan definisinya
         get_or_create_chat_doc(name=user_name)
         messages_full = [
-            {"role": "system", "content": DEFAULT_SYSTEM_PROMPT},
+            system_message(DEFAULT_SYSTEM_PROMPT),
             {"role": "user", "content": user_msg}
         ]
     else:
-        doc = users_chats.find_one({"name": user_name})
-        if not doc:
-            return jsonify({"error": f"User '{user_name}' belum memulai percakapan."}), 404
-        sess = find_session(doc, session_id)
+        # Read-your-writes: giliran yang masih di WAL write-behind lebih baru dari Mongo.
+        # Setelah itu cache sesi worker ini; Mongo hanya dibaca saat cache miss.
+        sess = write_behind.pending_session(user_name, session_id)
+        if not sess:
+            sess = load_session_cached(user_name, session_id)
         if not sess:
-            return jsonify({"error": f"session_id '{session_id}' tidak ditemukan."}), 404
-        messages_full = sess.get("messages", [])
+            return jsonify({"error": f"session_id '{session_id}' tidak ditemukan untuk user '{user_name}'."}), 404
+        sess = restore_session(user_name, sess)
+        messages_full = list(sess.get("messages", []))
+        base_rev, base_len = sess.get("rev"), len(messages_full)
         messages_full.append({"role": "user", "content": user_msg})
 
     def _ctx_slice(msgs: List[dict]) -> List[dict]:
+        # Output tool besar & teks system prompt hanya dipulihkan untuk jendela konteks
+        # yang benar-benar dikirim ke LLM.
         if len(msgs) > MAX_HISTORY_MESSAGES:
-            return [msgs[0]] + msgs[-MAX_HISTORY_MESSAGES:]
-        return msgs
+            msgs = [msgs[0]] + msgs[-MAX_HISTORY_MESSAGES:]
+        return hydrate_prompts(hydrate_messages(msgs))
 
     tool_runs = []
+    tool_stats = []  # untuk rollup analytics: nama, gagal/tidak, durasi
     final_text = ""
     try:
         ctx_messages = _ctx_slice(messages_full)
@@ -357,7 +540,15 @@ def chat():
             for tc in tool_calls:
                 fname = tc.function.name
                 fargs = json.loads(tc.function.arguments or "{}")
-                out = AVAILABLE_FUNCS[fname](**fargs)
+                tool_started = time.perf_counter()
+                try:
+                    out = AVAILABLE_FUNCS[fname](**fargs)
+                except Exception:
+                    tool_stats.append({"name": fname, "failed": True,
+                                       "duration_ms": (time.perf_counter() - tool_started) * 1000})
+                    raise
+                tool_stats.append({"name": fname, "failed": analytics.tool_failed(out),
+                                   "duration_ms": (time.perf_counter() - tool_started) * 1000})
                 result_json = json.dumps(out, ensure_ascii=False)
                 tool_runs.append({"name": fname, "args": fargs, "result": json.loads(result_json)})
                 messages_full.append({"role": "tool", "tool_call_id": tc.id, "name": fname, "content": result_json})
@@ -368,19 +559,37 @@ def chat():
             final_text = resp_msg.content or ""
     except Exception as e:
         traceback.print_exc()
+        analytics.record_turn(user_name, is_new_session, tool_stats,
+                              (time.perf_counter() - turn_started) * 1000, failed=True)
         return jsonify({"error": f"Gagal memproses: {type(e).__name__}", "detail": str(e)}), 500
 
     messages_full.append({"role": "assistant", "content": final_text})
 
+    persist_warning = None
     if is_new_session:
         title = (client.chat.completions.create(
             model="gpt-4o", messages=[{"role": "user", "content": f"Buat judul singkat (maksimal 5 kata) untuk percakapan yang diawali dengan: '{user_msg}'"}],
             temperature=0.2, max_tokens=20
-        ).choices[0].message.content or "Percakapan Baru").strip().replace('"', '')
-        append_session(name=user_name, session_id=session_id, created_at=datetime.now(timezone.utc), messages=messages_full, title=title)
+        ).choices[0].message.content or DEFAULT_SESSION_TITLE).strip().replace('"', '')
+        created_at = datetime.now(timezone.utc)
+        if write_behind.WRITE_BEHIND_ENABLED:
+            session_cache.invalidate(user_name, session_id)
+            write_behind.enqueue("append", user_name, session_id, messages_full, created_at=created_at, title=title)
+        else:
+            append_session(name=user_name, session_id=session_id, created_at=created_at, messages=messages_full, title=title)
+    elif write_behind.WRITE_BEHIND_ENABLED:
+        session_cache.invalidate(user_name, session_id)
+        write_behind.enqueue("upsert", user_name, session_id, messages_full, base_rev=base_rev, base_len=base_len)
     else:
-        upsert_session_messages(name=user_name, session_id=session_id, messages=messages_full)
-    
+        try:
+            commit_session_messages(user_name, session_id, messages_full, expected_rev=base_rev, base_len=base_len)
+        except (RuntimeError, LookupError) as e:
+            # Jawaban sudah dihitung (dan tool mungkin sudah menulis ke API): jangan dibuang
+            # dengan 500 hanya karena riwayatnya gagal disimpan; beri tahu klien lewat warning.
+            traceback.print_exc()
+            persist_warning = f"Jawaban tidak tersimpan ke riwayat sesi: {e}"
+    analytics.record_turn(user_name, is_new_session, tool_stats, (time.perf_counter() - turn_started) * 1000)
+
     response_data = {
         "user": user_name,
         "session_id": session_id,
@@ -389,6 +598,8 @@ def chat():
     }
     if is_new_session:
         response_data["new_session_id"] = session_id
+    if persist_warning:
+        response_data["warning"] = persist_warning
 
     return jsonify(response_data)
 
@@ -407,26 +618,75 @@ def get_session_messages():
         userid, name = parse_user(user_field)
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 400
-    if not mongo_client:
+    if not mongo_available():
         return jsonify({"error": "MongoDB tidak tersedia"}), 500
-    doc = users_chats.find_one({"name": name})
-    if not doc:
-        return jsonify({"error": f"Nama '{name}' belum terdaftar."}), 404
-    sess = find_session(doc, session_id)
-    if not sess:
-        return jsonify({"error": f"session_id '{session_id}' tidak ditemukan untuk nama '{name}'."}), 404
-    msgs = sess.get("messages", []) or []
-    return jsonify({
-        "name": doc.get("name", name),
+    try:
+        rng = {k: _opt_int(request.args.get(k)) for k in ("after", "before", "last", "limit")}
+    except ValueError:
+        return jsonify({"error": "Parameter after/before/last/limit harus berupa angka."}), 400
+    exclude = {r.strip() for r in (request.args.get("exclude") or "").split(",") if r.strip()}
+    hydrate = (request.args.get("hydrate") or "").lower() in ("1", "true")
+
+    # Versi sesi (= jumlah pesan; pesan hanya pernah ditambah) diambil dari WAL write-behind
+    # atau ringkasan chat_sessions, supaya 304 bisa dijawab tanpa menyentuh body pesan.
+    pending = write_behind.pending_session(name, session_id)
+    version = len(pending.get("messages") or []) if pending else session_version(name, session_id)
+    if version is not None:
+        etag = _messages_etag(session_id, version)
+        if request.if_none_match.contains(etag):
+            not_modified = make_response("", 304)
+            not_modified.set_etag(etag)
+            return not_modified
+
+    cached = None if pending else session_cache.get(name, session_id)
+    if cached and len(cached["messages"]) != version:
+        cached = None  # ditulis worker lain sejak di-cache
+    if pending or cached:
+        all_msgs = (pending or cached).get("messages") or []
+        start, end = slice_bounds(len(all_msgs), **rng)
+        total, msgs = len(all_msgs), all_msgs[start:end]
+    else:
+        start, end = slice_bounds(version or 0, **rng)
+        row = load_session_range(name, session_id, start, end)
+        if not row:
+            return jsonify({"error": f"session_id '{session_id}' tidak ditemukan untuk nama '{name}'."}), 404
+        total, msgs = row["total"], row.get("messages") or []
+        if row["session"].get("archived"):
+            all_msgs = restore_session(name, row["session"]).get("messages") or []
+            total = len(all_msgs)
+            start, end = slice_bounds(total, **rng)
+            msgs = all_msgs[start:end]
+        elif total != version:
+            # Ringkasan belum ada / tertinggal: hitung ulang rentang dengan total sebenarnya.
+            start, end = slice_bounds(total, **rng)
+            row = load_session_range(name, session_id, start, end) or row
+            total, msgs = row["total"], row.get("messages") or []
+
+    if hydrate:
+        msgs = hydrate_prompts(hydrate_messages(msgs))
+    out = []
+    for i, m in enumerate(msgs):
+        if m.get("role") in exclude:
+            continue
+        out.append({**m, "seq": start + i})
+    resp = jsonify({
+        "name": name,
         "session_id": session_id,
-        "messages": msgs
+        "messages": out,
+        "total": total,
+        "first_seq": start,
+        "last_seq": start + len(msgs) - 1 if msgs else None,
+        "has_more_before": start > 0,
     })
+    resp.set_etag(_messages_etag(session_id, total))
+    return resp
 
 
 from feeder import Feeder
 @app.post("/api/feeder/talents")
 def feed_talent():
     payload = request.json
+    talent_index.upsert_talents_safe(payload["data"])
     Feeder().pushTalentInfo(payload['data'])
 
     return jsonify({
@@ -436,6 +696,7 @@ def feed_talent():
 @app.post("/api/feeder/companies")
 def feed_job_company():
     payload = request.json
+    company_index.upsert_companies_safe(payload["data"], source="feeder")
     Feeder().pushCompanyInfo(payload['data'])
 
     return jsonify({
@@ -0,0 +1,125 @@
+# blob_store.py
+# -*- coding: utf-8 -*-
+"""
+Penyimpanan terpisah untuk output tool berukuran besar.
+
+Pesan `role: tool` (hasil list_talent, list_job_openings_enriched, dst) bisa berukuran
+puluhan KB dan mendominasi dokumen sesi. Di atas ambang TOOL_PAYLOAD_OFFLOAD_BYTES, isinya
+dikompresi (zlib) dan disimpan di koleksi `tool_payloads` dengan _id = sha256 isi
+(content-addressed, otomatis dedup). Pesan di sesi hanya menyimpan `payload_ref` dan
+ringkasan pendek; isi asli dipulihkan (hydrate) hanya saat membangun konteks LLM atau
+saat klien memintanya secara eksplisit.
+"""
+import os
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from bson.binary import Binary
+
+import clients
+
+TOOL_PAYLOAD_OFFLOAD_BYTES = int(os.getenv("TOOL_PAYLOAD_OFFLOAD_BYTES", "2048"))
+TOOL_PAYLOAD_DIGEST_CHARS = int(os.getenv("TOOL_PAYLOAD_DIGEST_CHARS", "160"))
+COMPRESS_LEVEL = 6
+# Payload bersifat immutable (content-addressed), jadi aman di-cache per worker.
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def _cache_put(sha: str, text: str) -> None:
+    global _cache_bytes
+    with _cache_lock:
+        if sha in _cache or len(text) > BLOB_CACHE_MAX_BYTES:
+            return
+        _cache[sha] = text
+        _cache_bytes += len(text)
+        while _cache_bytes > BLOB_CACHE_MAX_BYTES:
+            _, old = _cache.popitem(last=False)
+            _cache_bytes -= len(old)
+
+
+def _cache_get(sha: str):
+    with _cache_lock:
+        text = _cache.get(sha)
+        if text is not None:
+            _cache.move_to_end(sha)
+        return text
+
+
+def tool_payloads():
+    return clients.mongo().chatbot_db.tool_payloads
+
+
+def _digest(text: str, size: int) -> str:
+    head = text[:TOOL_PAYLOAD_DIGEST_CHARS].replace("\n", " ")
+    more = "…" if len(text) > TOOL_PAYLOAD_DIGEST_CHARS else ""
+    return f"[output tool {size / 1024:.1f} KB disimpan terpisah] {head}{more}"
+
+
+def offload_messages(messages: List[dict]) -> List[dict]:
+    """
+    Kembalikan salinan `messages` dengan output tool besar dipindah ke tool_payloads.
+    Pesan yang sudah punya `payload_ref` dibiarkan apa adanya.
+    """
+    out = []
+    for m in messages or []:
+        content = m.get("content")
+        if m.get("role") != "tool" or m.get("payload_ref") or not isinstance(content, str):
+            out.append(m)
+            continue
+        raw = content.encode("utf-8")
+        if len(raw) < TOOL_PAYLOAD_OFFLOAD_BYTES:
+            out.append(m)
+            continue
+        sha = hashlib.sha256(raw).hexdigest()
+        tool_payloads().update_one(
+            {"_id": sha},
+            {"$setOnInsert": {
+                "data": Binary(zlib.compress(raw, COMPRESS_LEVEL)),
+                "encoding": "zlib",
+                "size": len(raw),
+                "created_at": datetime.now(timezone.utc),
+            }},
+            upsert=True,
+        )
+        _cache_put(sha, content)
+        slim = dict(m)
+        slim["content"] = _digest(content, len(raw))
+        slim["payload_ref"] = {"id": sha, "size": len(raw), "encoding": "zlib"}
+        out.append(slim)
+    return out
+
+
+def hydrate_messages(messages: List[dict]) -> List[dict]:
+    """Kembalikan salinan `messages` dengan `payload_ref` diganti isi aslinya (satu query $in)."""
+    ids = list({m["payload_ref"]["id"] for m in messages or [] if m.get("payload_ref")})
+    if not ids:
+        return list(messages or [])
+    blobs: Dict[str, str] = {}
+    for sha in ids:
+        text = _cache_get(sha)
+        if text is not None:
+            blobs[sha] = text
+    missing = [sha for sha in ids if sha not in blobs]
+    if missing:
+        for doc in tool_payloads().find({"_id": {"$in": missing}}):
+            blobs[doc["_id"]] = zlib.decompress(bytes(doc["data"])).decode("utf-8")
+            _cache_put(doc["_id"], blobs[doc["_id"]])
+    out = []
+    for m in messages:
+        ref = m.get("payload_ref")
+        if not ref:
+            out.append(m)
+            continue
+        # Blob hilang -> tetap pakai ringkasan, tapi field `payload_ref` tidak ikut ke LLM.
+        full = {k: v for k, v in m.items() if k != "payload_ref"}
+        full["content"] = blobs.get(ref["id"], m.get("content"))
+        out.append(full)
+    return out
@@ -0,0 +1,344 @@
+# bulk_import.py
+# -*- coding: utf-8 -*-
+"""
+Impor massal talent / perusahaan dari file CSV atau JSONL ke admin API.
+
+Satu impor = satu job di koleksi `import_jobs` (progress dibaca dari worker mana pun):
+  1. File upload disalin ke IMPORT_TMP_DIR (streaming, dibatasi IMPORT_MAX_BYTES), lalu
+     job berjalan di thread background; endpoint langsung membalas job_id (202).
+  2. Baris dibaca satu per satu (csv.DictReader / per baris JSON) dan divalidasi.
+  3. Baris valid dikirim ke POST /api/{PANEL}/{resource} secara paralel
+     (IMPORT_CONCURRENCY request sekaligus, jendela terbatas sehingga memori konstan).
+     POST tidak diulang oleh resilience (bukan idempoten); di sini hanya diulang jika
+     server jelas belum memprosesnya: 429/503, connect timeout, atau breaker terbuka.
+  4. Record yang berhasil dibuat dikirim ke vector store (Feeder) per IMPORT_FEED_BATCH;
+     talent juga masuk talent_index, perusahaan masuk company_index.
+Progress (processed / created / failed) dan error per baris (maks IMPORT_MAX_ERRORS
+terakhir) ditulis ke dokumen job setiap IMPORT_PROGRESS_EVERY baris; selama job hidup,
+`updated_at` juga diperbarui tiap IMPORT_HEARTBEAT_S. Job queued/running yang heartbeat-nya
+berhenti lebih dari IMPORT_STALE_S (worker mati) ditandai failed oleh fail_stale_jobs(),
+sehingga ikut TTL finished_at dan tidak tertinggal selamanya.
+"""
+import io
+import os
+import csv
+import json
+import time
+import uuid
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+import clients
+import resilience
+import company_index
+import talent_index
+
+IMPORT_TMP_DIR = os.getenv("IMPORT_TMP_DIR", "./data/imports")
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY", "8"))
+IMPORT_MAX_ATTEMPTS = int(os.getenv("IMPORT_MAX_ATTEMPTS", "4"))
+IMPORT_FEED_BATCH = int(os.getenv("IMPORT_FEED_BATCH", "100"))
+IMPORT_PROGRESS_EVERY = 50
+IMPORT_MAX_ERRORS = 500
+IMPORT_HEARTBEAT_S = 30
+IMPORT_STALE_S = 300
+
+RESOURCES = {
+    # resource admin API -> (field wajib, field tanggal YYYY-MM-DD)
+    "talent": (("name", "position", "birthdate", "summary"), ("birthdate",)),
+    "companies": (("name",), ()),
+}
+FORMATS = ("csv", "jsonl")
+
+
+def import_jobs():
+    return clients.mongo().chatbot_db.import_jobs
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ======================================================================
+# PARSING & VALIDASI
+# ======================================================================
+def detect_format(filename: Optional[str], declared: Optional[str]) -> str:
+    fmt = (declared or "").strip().lower() or os.path.splitext(filename or "")[1].lstrip(".").lower()
+    fmt = {"ndjson": "jsonl", "json": "jsonl"}.get(fmt, fmt)
+    if fmt not in FORMATS:
+        raise ValueError("Format file harus csv atau jsonl (parameter 'format' atau ekstensi file).")
+    return fmt
+
+
+def iter_rows(stream, fmt: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """(nomor_baris, row, error). Stream biner dibaca bertahap; file tidak pernah dimuat utuh."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "Jumlah kolom melebihi header."
+                continue
+            yield reader.line_num, row, None
+        return
+    for lineno, raw in enumerate(text, 1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            yield lineno, None, "JSON tidak valid."
+            continue
+        if not isinstance(row, dict):
+            yield lineno, None, "Setiap baris harus berupa objek JSON."
+            continue
+        yield lineno, row, None
+
+
+def validate_row(resource: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Bersihkan row menjadi payload create; ValueError jika tidak valid."""
+    required, date_fields = RESOURCES[resource]
+    payload = {}
+    for k, v in row.items():
+        k = (k or "").strip()
+        if isinstance(v, str):
+            v = v.strip()
+        if k and k != "id" and v not in ("", None):
+            payload[k] = v
+    missing = [f for f in required if f not in payload]
+    if missing:
+        raise ValueError(f"Field wajib kosong: {', '.join(missing)}.")
+    for f in date_fields:
+        try:
+            datetime.strptime(str(payload[f]), "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"Field '{f}' harus berformat YYYY-MM-DD.")
+    return payload
+
+
+# ======================================================================
+# PUSH KE ADMIN API
+# ======================================================================
+class _Unprocessed(Exception):
+    """Server belum memproses request (aman diulang)."""
+
+
+def _create(resource: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    import api_client
+    r = api_client._post(f"{api_client.BASE_URL}/api/{api_client.PANEL}/{resource}", json=payload)
+    if r.status_code in (429, 503):
+        raise _Unprocessed(f"Server {r.status_code}")
+    api_client._raise_on_error(r, f"POST create {resource}")
+    data = api_client._safe_json(r)
+    created = data.get("data") if isinstance(data, dict) and isinstance(data.get("data"), dict) else data
+    return created if isinstance(created, dict) else {}
+
+
+def _create_with_retry(resource: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    import api_client
+    for attempt in range(IMPORT_MAX_ATTEMPTS):
+        try:
+            if api_client.request_token():
+                # Impor atas nama token pemanggil: 401 menggagalkan baris, tidak pernah
+                # diulang dengan token layanan.
+                return _create(resource, payload)
+            return api_client.relogin_once_on_401(_create, resource, payload)
+        except (_Unprocessed, requests.exceptions.ConnectTimeout, resilience.CircuitOpenError) as e:
+            if attempt + 1 >= IMPORT_MAX_ATTEMPTS:
+                raise RuntimeError(f"Gagal setelah {IMPORT_MAX_ATTEMPTS} percobaan: {e}")
+            time.sleep(resilience._backoff(attempt, None) + (resilience.BREAKER_OPEN_S / 2
+                       if isinstance(e, resilience.CircuitOpenError) else 0))
+    raise RuntimeError("unreachable")
+
+
+def _flat(record: Dict[str, Any]) -> Dict[str, Any]:
+    # Metadata Chroma hanya menerima nilai skalar non-null.
+    out = {}
+    for k, v in record.items():
+        if v is None:
+            continue
+        out[k] = v if isinstance(v, (str, int, float, bool)) else json.dumps(v, ensure_ascii=False)
+    return out
+
+
+def _feed(resource: str, records: List[Dict[str, Any]]) -> None:
+    from feeder import Feeder
+    records = [_flat(r) for r in records if r.get("id") is not None]
+    if not records:
+        return
+    if resource == "talent":
+        talent_index.upsert_talents_safe(records)
+        Feeder().pushTalentInfo([{"skills": "", "educations": "", **r} for r in records])
+    else:
+        company_index.upsert_companies_safe(records, source="import")
+        Feeder().pushCompanyInfo([{"description": "", **r} for r in records])
+
+
+# ======================================================================
+# JOB
+# ======================================================================
+def start_job(resource: str, fmt: str, stream, filename: Optional[str] = None,
+              created_by: Optional[str] = None) -> str:
+    """Simpan upload ke file sementara lalu jalankan job di background. Mengembalikan job_id."""
+    if resource not in RESOURCES:
+        raise ValueError(f"Resource harus salah satu dari: {', '.join(RESOURCES)}.")
+    if fmt not in FORMATS:
+        raise ValueError("Format file harus csv atau jsonl.")
+    try:
+        fail_stale_jobs()  # job yatim yang tidak pernah di-poll lagi juga ikut dibereskan
+    except Exception as e:
+        print(f"[bulk-import] gagal menandai job basi: {e}")
+    os.makedirs(IMPORT_TMP_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    path = os.path.join(IMPORT_TMP_DIR, f"{job_id}.{fmt}")
+    written = 0
+    with open(path, "wb") as out:
+        while True:
+            chunk = stream.read(64 * 1024)
+            if not chunk:
+                break
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            written += len(chunk)
+            if written > IMPORT_MAX_BYTES:
+                out.close()
+                os.remove(path)
+                raise ValueError(f"File melebihi batas {IMPORT_MAX_BYTES} byte.")
+            out.write(chunk)
+    import_jobs().insert_one({
+        "_id": job_id, "resource": resource, "format": fmt, "filename": filename, "bytes": written,
+        "created_by": created_by, "status": "queued", "processed": 0, "created": 0, "failed": 0,
+        "feed_failed": 0, "errors": [], "created_at": _now(), "updated_at": _now(),
+    })
+    # Token request ikut ke thread job lewat copy_context (lihat api_client.current_token).
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(_run_job, job_id, resource, fmt, path),
+                     name=f"import-{job_id[:8]}", daemon=True).start()
+    return job_id
+
+
+def _run_job(job_id: str, resource: str, fmt: str, path: str) -> None:
+    counters = {"processed": 0, "created": 0, "failed": 0, "feed_failed": 0}
+    errors: List[Dict[str, Any]] = []
+    feed_buf: List[Dict[str, Any]] = []
+
+    def _flush_progress(final_status: Optional[str] = None) -> None:
+        update: Dict[str, Any] = {"$set": {**counters, "updated_at": _now(),
+                                           "status": final_status or "running"}}
+        if errors:
+            update["$push"] = {"errors": {"$each": list(errors), "$slice": -IMPORT_MAX_ERRORS}}
+            errors.clear()
+        if final_status:
+            update["$set"]["finished_at"] = _now()
+        else:
+            # Sempat dianggap mati (heartbeat gagal, mis. Mongo putus) tapi ternyata masih jalan.
+            update["$unset"] = {"finished_at": ""}
+        import_jobs().update_one({"_id": job_id}, update)
+
+    heartbeat_stop = threading.Event()
+
+    def _heartbeat() -> None:
+        while not heartbeat_stop.wait(IMPORT_HEARTBEAT_S):
+            try:
+                import_jobs().update_one({"_id": job_id}, {"$set": {"updated_at": _now()}})
+            except Exception as e:
+                print(f"[bulk-import] heartbeat job {job_id} gagal: {e}")
+
+    def _flush_feed() -> None:
+        if not feed_buf:
+            return
+        try:
+            _feed(resource, feed_buf)
+        except Exception as e:
+            counters["feed_failed"] += len(feed_buf)
+            errors.append({"row": None, "error": f"Gagal mengirim {len(feed_buf)} record ke vector store: {e}"})
+        feed_buf.clear()
+
+    def _collect(fut, lineno: int, payload: Dict[str, Any]) -> None:
+        try:
+            created = fut.result()
+            counters["created"] += 1
+            feed_buf.append({**payload, **created})
+            if len(feed_buf) >= IMPORT_FEED_BATCH:
+                _flush_feed()
+        except Exception as e:
+            counters["failed"] += 1
+            errors.append({"row": lineno, "error": str(e).split("\n", 1)[0][:300]})
+        counters["processed"] += 1
+        if counters["processed"] % IMPORT_PROGRESS_EVERY == 0:
+            _flush_progress()
+
+    pool = ThreadPoolExecutor(max_workers=IMPORT_CONCURRENCY, thread_name_prefix=f"import-{job_id[:8]}")
+    inflight: Dict[Any, Tuple[int, Dict[str, Any]]] = {}
+    threading.Thread(target=_heartbeat, name=f"import-hb-{job_id[:8]}", daemon=True).start()
+    try:
+        _flush_progress()
+        with open(path, "rb") as f:
+            for lineno, row, err in iter_rows(f, fmt):
+                if err is None:
+                    try:
+                        payload = validate_row(resource, row)
+                    except ValueError as ve:
+                        err = str(ve)
+                if err is not None:
+                    counters["failed"] += 1
+                    counters["processed"] += 1
+                    errors.append({"row": lineno, "error": err})
+                    continue
+                # Jendela terbatas: paling banyak 2x concurrency request menunggu di memori.
+                while len(inflight) >= IMPORT_CONCURRENCY * 2:
+                    done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        _collect(fut, *inflight.pop(fut))
+                fut = pool.submit(contextvars.copy_context().run, _create_with_retry, resource, payload)
+                inflight[fut] = (lineno, payload)
+        for fut in list(inflight):
+            _collect(fut, *inflight.pop(fut))
+        _flush_feed()
+        _flush_progress("done")
+    except Exception as e:
+        errors.append({"row": None, "error": f"Job berhenti: {e}"})
+        _flush_progress("failed")
+    finally:
+        heartbeat_stop.set()
+        pool.shutdown(wait=False)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def fail_stale_jobs() -> int:
+    """
+    Tandai failed job queued/running yang heartbeat-nya berhenti lebih dari IMPORT_STALE_S
+    (worker yang menjalankannya mati: restart / timeout). Mengembalikan jumlah job.
+    """
+    now = _now()
+    res = import_jobs().update_many(
+        {"status": {"$in": ["queued", "running"]}, "updated_at": {"$lt": now - timedelta(seconds=IMPORT_STALE_S)}},
+        {"$set": {"status": "failed", "finished_at": now},
+         "$push": {"errors": {"$each": [{"row": None, "error": "Job berhenti: worker yang menjalankannya mati."}],
+                              "$slice": -IMPORT_MAX_ERRORS}}},
+    )
+    return res.modified_count
+
+
+def job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        fail_stale_jobs()
+    except Exception as e:
+        print(f"[bulk-import] gagal menandai job basi: {e}")
+    job = import_jobs().find_one({"_id": job_id})
+    if not job:
+        return None
+    job["job_id"] = job.pop("_id")
+    for k in ("created_at", "updated_at", "finished_at"):
+        if isinstance(job.get(k), datetime):
+            job[k] = job[k].isoformat()
+    return job
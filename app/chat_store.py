@@ -0,0 +1,502 @@
+# chat_store.py
+# -*- coding: utf-8 -*-
+"""
+Akses data chat di MongoDB.
+
+Struktur penyimpanan:
+  - users_chats   : satu dokumen per user, berisi array `sessions` lengkap dengan `messages`.
+  - chat_sessions : satu dokumen ringkasan per sesi (tanpa isi pesan). Dipakai untuk
+                    sidebar / daftar sesi supaya tidak perlu membaca body pesan sama sekali.
+  - tool_payloads : output tool besar yang dipindah keluar dari sesi (lihat blob_store.py).
+  - prompts       : teks system prompt berversi; sesi hanya menyimpan `prompt_ref` (lihat prompt_registry.py).
+  - message_search: salinan teks pesan user/assistant untuk pencarian (lihat search_index.py).
+  - usage_daily   : counter statistik per hari / user / tool (lihat analytics.py).
+"""
+import os
+import json
+import base64
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo import DESCENDING, ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import clients
+import session_cache
+import search_index
+from blob_store import offload_messages
+from prompt_registry import dehydrate_prompts
+
+load_dotenv()
+
+if not clients.MONGO_URI:
+    raise RuntimeError("MONGO_URI belum diisi.")
+
+DEFAULT_SESSION_TITLE = "Percakapan Baru"
+PREVIEW_MAX_CHARS = 120
+SESSIONS_PAGE_DEFAULT = 20
+SESSIONS_PAGE_MAX = 100
+# Field di users_chats: sesi lama user ini sudah diringkas ke chat_sessions.
+SUMMARIES_BACKFILLED = "summaries_backfilled"
+
+# ======================================================================
+# KONEKSI MONGODB
+# ======================================================================
+# Klien dibuat lazy per proses (lihat clients.py), jadi modul ini aman di-import
+# oleh master gunicorn sebelum fork.
+def get_db():
+    return clients.mongo().chatbot_db
+
+def users_chats():
+    return get_db().users_chats
+
+def chat_sessions():
+    return get_db().chat_sessions
+
+def mongo_available() -> bool:
+    try:
+        clients.mongo()
+        return True
+    except Exception as e:
+        print(f"Gagal terhubung ke MongoDB: {e}")
+        return False
+
+# ======================================================================
+# DEKLARASI INDEX & QUERY PANAS
+# ======================================================================
+# Dibuat lewat `python manage.py indexes` (atau `migrate`), bukan saat import.
+# Format: nama_koleksi -> list of (keys, opsi create_index)
+INDEXES: Dict[str, List[Tuple[List[Tuple[str, Any]], Dict[str, Any]]]] = {
+    "users_chats": [
+        ([("name", ASCENDING)], {"name": "name_unique", "unique": True}),
+        ([("sessions.session_id", ASCENDING)], {"name": "sessions_session_id"}),
+    ],
+    "chat_sessions": [
+        ([("name", ASCENDING), ("session_id", ASCENDING)], {"name": "name_session_unique", "unique": True}),
+        ([("name", ASCENDING), ("last_activity_at", DESCENDING), ("session_id", DESCENDING)], {"name": "name_recency"}),
+        ([("session_id", ASCENDING)], {"name": "session_id"}),
+        ([("last_activity_at", ASCENDING)], {"name": "last_activity"}),
+    ],
+    "message_search": [
+        ([("name", ASCENDING), ("session_id", ASCENDING), ("seq", ASCENDING)],
+         {"name": "name_session_seq_unique", "unique": True}),
+        # Prefix `name` membuat $text hanya memindai entri milik satu user.
+        # default_language "none": tanpa stemming (belum ada stemmer Bahasa Indonesia).
+        ([("name", ASCENDING), ("text", "text")],
+         {"name": "name_text", "default_language": "none", "language_override": "_lang"}),
+    ],
+    # Cache validasi bearer token (api_client.validate_token); dokumen kedaluwarsa dihapus TTL.
+    "token_validations": [
+        ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ],
+    "usage_daily": [
+        ([("kind", ASCENDING), ("day", ASCENDING)], {"name": "kind_day"}),
+        ([("kind", ASCENDING), ("name", ASCENDING), ("day", ASCENDING)], {"name": "kind_name_day"}),
+    ],
+    # Index nama perusahaan (company_index.py): worker menarik entri yang berubah sejak watermark.
+    "company_index": [
+        ([("updated_at", ASCENDING)], {"name": "updated_at"}),
+    ],
+    # Sumber bersama index BM25 talent (talent_index.py): worker menarik perubahan sejak watermark.
+    "talent_search": [
+        ([("updated_at", ASCENDING)], {"name": "updated_at"}),
+    ],
+    # Job impor massal (bulk_import.py): dihapus otomatis 30 hari setelah selesai; job yang
+    # worker-nya mati dicari lewat status + updated_at (heartbeat) lalu ditandai failed.
+    "import_jobs": [
+        ([("finished_at", ASCENDING)], {"name": "finished_at_ttl", "expireAfterSeconds": 30 * 24 * 3600}),
+        ([("status", ASCENDING), ("updated_at", ASCENDING)], {"name": "status_updated_at"}),
+    ],
+}
+
+# Query yang dipakai di jalur request (app.py). Diverifikasi dengan explain() oleh
+# `python manage.py verify`. Format: (label, koleksi, filter, sort, projection)
+HOT_QUERIES: List[Tuple[str, str, Dict[str, Any], Optional[List[Tuple[str, int]]], Optional[Dict[str, Any]]]] = [
+    ("user doc by name", "users_chats", {"name": "__probe__"}, None, None),
+    ("session by name + session_id", "users_chats",
+     {"name": "__probe__", "sessions.session_id": "__probe__"}, None, None),
+    ("session list page", "chat_sessions", {"name": "__probe__"},
+     [("last_activity_at", DESCENDING), ("session_id", DESCENDING)], {"_id": 0}),
+    ("summary by name + session_id", "chat_sessions",
+     {"name": "__probe__", "session_id": "__probe__"}, None, None),
+    ("analytics buckets by day", "usage_daily",
+     {"kind": "day", "day": {"$gte": "__probe__", "$lte": "__probe__"}}, [("day", ASCENDING)], {"_id": 0}),
+    ("analytics buckets by user", "usage_daily",
+     {"kind": "user", "name": "__probe__", "day": {"$gte": "__probe__", "$lte": "__probe__"}},
+     [("day", ASCENDING)], {"_id": 0}),
+    ("company index changes since watermark", "company_index",
+     {"updated_at": {"$gt": "__probe__"}}, None, {"name": 1, "summary": 1, "updated_at": 1}),
+    ("talent index changes since watermark", "talent_search",
+     {"updated_at": {"$gt": "__probe__"}}, [("updated_at", ASCENDING)], None),
+]
+
+def ensure_indexes() -> List[str]:
+    """Buat semua index yang dideklarasikan di INDEXES (idempoten). Mengembalikan nama index."""
+    created = []
+    for coll_name, specs in INDEXES.items():
+        coll = get_db()[coll_name]
+        for keys, opts in specs:
+            created.append(f"{coll_name}.{coll.create_index(keys, **opts)}")
+    return created
+
+# ======================================================================
+# RINGKASAN SESI (denormalisasi)
+# ======================================================================
+def _as_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+def _preview_of(messages: List[dict]) -> Optional[Dict[str, str]]:
+    """Ambil pesan user/assistant terakhir yang punya teks, dipotong untuk preview."""
+    for m in reversed(messages or []):
+        if m.get("role") in ("user", "assistant") and m.get("content"):
+            text = str(m["content"]).strip().replace("\n", " ")
+            if len(text) > PREVIEW_MAX_CHARS:
+                text = text[:PREVIEW_MAX_CHARS - 1] + "…"
+            return {"role": m["role"], "content": text}
+    return None
+
+def _summary_fields(messages: List[dict], now: datetime) -> Dict[str, Any]:
+    return {
+        "messages_count": len(messages or []),
+        "last_activity_at": now,
+        "last_message": _preview_of(messages),
+    }
+
+def serialize_summary(s: dict) -> dict:
+    def _iso(v):
+        return v.isoformat() if hasattr(v, "isoformat") else v
+    return {
+        "session_id": s.get("session_id"),
+        "title": s.get("title", DEFAULT_SESSION_TITLE),
+        "created_at": _iso(s.get("created_at")),
+        "last_activity_at": _iso(s.get("last_activity_at")),
+        "messages_count": s.get("messages_count", 0),
+        "last_message": s.get("last_message"),
+    }
+
+def backfill_session_summaries(name: str) -> int:
+    """
+    Bangun ringkasan untuk sesi lama milik `name` yang belum punya dokumen di chat_sessions.
+    Ukuran & ekor pesan dihitung di server Mongo ($size / $slice), jadi body pesan lengkap
+    tidak pernah ditransfer ke aplikasi. Setelah selesai, dokumen user ditandai
+    SUMMARIES_BACKFILLED sehingga backfill tidak diulang.
+    """
+    pipeline = [
+        {"$match": {"name": name}},
+        {"$unwind": "$sessions"},
+        {"$project": {
+            "_id": 0,
+            "session_id": "$sessions.session_id",
+            "title": "$sessions.title",
+            "created_at": "$sessions.created_at",
+            "messages_count": {"$size": {"$ifNull": ["$sessions.messages", []]}},
+            "tail": {"$slice": [{"$ifNull": ["$sessions.messages", []]}, -4]},
+        }},
+    ]
+    written = 0
+    for row in users_chats().aggregate(pipeline):
+        created = row.get("created_at")
+        if isinstance(created, str):
+            try:
+                created = datetime.fromisoformat(created)
+            except ValueError:
+                created = None
+        created = _as_utc(created) if isinstance(created, datetime) else datetime.now(timezone.utc)
+        res = chat_sessions().update_one(
+            {"name": name, "session_id": row.get("session_id")},
+            {"$setOnInsert": {
+                "name": name,
+                "session_id": row.get("session_id"),
+                "title": row.get("title") or DEFAULT_SESSION_TITLE,
+                "created_at": created,
+                "last_activity_at": created,
+                "messages_count": row.get("messages_count", 0),
+                "last_message": _preview_of(row.get("tail") or []),
+            }},
+            upsert=True,
+        )
+        if res.upserted_id is not None:
+            written += 1
+    users_chats().update_one({"name": name}, {"$set": {SUMMARIES_BACKFILLED: True}})
+    return written
+
+# ======================================================================
+# PAGINASI CURSOR
+# ======================================================================
+def _encode_cursor(s: dict) -> str:
+    raw = json.dumps({"t": _as_utc(s["last_activity_at"]).isoformat(), "id": s["session_id"]})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        return datetime.fromisoformat(raw["t"]), str(raw["id"])
+    except Exception:
+        raise ValueError("Parameter 'cursor' tidak valid.")
+
+def list_session_summaries(name: str, limit: int = SESSIONS_PAGE_DEFAULT,
+                           cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Satu halaman ringkasan sesi, urut aktivitas terbaru. Memakai index `name_recency`
+    dan tidak pernah menyentuh users_chats (body pesan).
+    Mengembalikan (items, next_cursor).
+    """
+    limit = max(1, min(int(limit or SESSIONS_PAGE_DEFAULT), SESSIONS_PAGE_MAX))
+    query: Dict[str, Any] = {"name": name}
+    if cursor:
+        t, sid = _decode_cursor(cursor)
+        query["$or"] = [
+            {"last_activity_at": {"$lt": t}},
+            {"last_activity_at": t, "session_id": {"$lt": sid}},
+        ]
+    rows = list(
+        chat_sessions().find(query, {"_id": 0})
+        .sort([("last_activity_at", DESCENDING), ("session_id", DESCENDING)])
+        .limit(limit + 1)
+    )
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def needs_summary_backfill(name: str) -> bool:
+    """
+    True jika dokumen user belum pernah di-backfill. Ditandai per user (bukan "sudah ada
+    ringkasan"), karena user dengan satu sesi baru bisa saja masih punya banyak sesi lama.
+    Hanya header dokumen yang dibaca (projection satu field).
+    """
+    doc = users_chats().find_one({"name": name}, {"_id": 0, SUMMARIES_BACKFILLED: 1})
+    return doc is not None and not doc.get(SUMMARIES_BACKFILLED)
+
+# ======================================================================
+# OPERASI SESI
+# ======================================================================
+def get_or_create_chat_doc(name: str) -> dict:
+    """
+    Pastikan dokumen user ada, dalam satu round trip (upsert atomik).
+    Yang dikembalikan hanya header dokumen (tanpa `sessions`), karena pemanggil
+    hanya butuh kepastian dokumennya ada. Balapan pesan pertama yang bersamaan
+    ditahan oleh index unik `name_unique`.
+    """
+    try:
+        return users_chats().find_one_and_update(
+            {"name": name},
+            # Dokumen baru tidak punya sesi lama: tidak perlu backfill ringkasan.
+            {"$setOnInsert": {"name": name, "sessions": [], SUMMARIES_BACKFILLED: True}},
+            projection={"sessions": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        return users_chats().find_one({"name": name}, {"sessions": 0})
+
+def ensure_chat_docs(names: List[str]) -> None:
+    """Seperti get_or_create_chat_doc untuk banyak user sekaligus (satu bulk_write upsert)."""
+    ops = [UpdateOne({"name": n}, {"$setOnInsert": {"name": n, "sessions": [], SUMMARIES_BACKFILLED: True}},
+                     upsert=True)
+           for n in dict.fromkeys(names)]
+    if not ops:
+        return
+    try:
+        users_chats().bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Upsert bersamaan untuk nama yang sama: dokumennya sudah ada, itu yang kita mau.
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+def find_session(doc: dict, session_id: str) -> Optional[dict]:
+    for s in (doc.get("sessions") or []):
+        if s.get("session_id") == session_id:
+            return s
+    return None
+
+# ======================================================================
+# RENTANG PESAN (paginasi / delta)
+# ======================================================================
+# Pesan dalam sesi hanya pernah ditambah di ujung, jadi indeks array dipakai sebagai
+# nomor urut (`seq`) yang stabil.
+def slice_bounds(total: int, after: Optional[int] = None, before: Optional[int] = None,
+                 last: Optional[int] = None, limit: Optional[int] = None) -> Tuple[int, int]:
+    """Hitung [start, end) dari parameter rentang. Prioritas: after > before > last."""
+    if after is not None:
+        start = max(0, after + 1)
+        end = total if limit is None else min(total, start + limit)
+    elif before is not None:
+        end = max(0, min(before, total))
+        n = last if last is not None else limit
+        start = 0 if n is None else max(0, end - n)
+    elif last is not None:
+        start, end = max(0, total - last), total
+    else:
+        start, end = 0, total if limit is None else min(total, limit)
+    return start, max(start, end)
+
+def load_session_range(name: str, session_id: str, start: int, end: int) -> Optional[Dict[str, Any]]:
+    """
+    Ambil pesan [start, end) satu sesi. Pemotongan dilakukan di server Mongo ($slice),
+    jadi hanya rentang yang diminta yang ditransfer.
+    Mengembalikan {"total", "messages", "session"} atau None jika sesi tidak ada.
+    `session` berisi metadata sesi tanpa `messages` (termasuk `archived` bila tombstone).
+    """
+    msgs = {"$ifNull": ["$s.messages", []]}
+    sliced = {"$slice": [msgs, start, end - start]} if end > start else {"$literal": []}
+    rows = list(users_chats().aggregate([
+        {"$match": {"name": name, "sessions.session_id": session_id}},
+        {"$project": {"_id": 0, "s": {"$arrayElemAt": [{"$filter": {
+            "input": "$sessions", "cond": {"$eq": ["$$this.session_id", session_id]}}}, 0]}}},
+        {"$project": {
+            "total": {"$size": msgs},
+            "messages": sliced,
+            "session": {"session_id": "$s.session_id", "title": "$s.title",
+                        "created_at": "$s.created_at", "archived": "$s.archived"},
+        }},
+    ]))
+    return rows[0] if rows else None
+
+def session_version(name: str, session_id: str) -> Optional[int]:
+    """Versi pesan sesi (= messages_count) dari ringkasan, tanpa membaca body pesan."""
+    s = chat_sessions().find_one({"name": name, "session_id": session_id}, {"_id": 0, "messages_count": 1, "archived": 1})
+    if not s or s.get("archived"):
+        return None
+    return s.get("messages_count")
+
+def _session_write_ops(w: Dict[str, Any]) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+    """
+    Terjemahkan satu write sesi menjadi operasi untuk users_chats & chat_sessions.
+    w = {"op": "append"|"upsert", "name", "session_id", "messages", "at"?, "created_at"?, "title"?}
+    """
+    name, session_id = w["name"], w["session_id"]
+    messages = offload_messages(dehydrate_prompts(w["messages"]))
+    if w["op"] == "append":
+        created_at = _as_utc(w["created_at"])
+        at = _as_utc(w.get("at") or created_at)
+        # Filter $ne membuat append idempoten (aman diulang oleh write-behind / retry).
+        uc = UpdateOne(
+            {"name": name, "sessions.session_id": {"$ne": session_id}},
+            {"$push": {"sessions": {
+                "session_id": session_id, "created_at": created_at,
+                "title": w["title"], "messages": messages, "rev": 1
+            }}}
+        )
+        cs = UpdateOne(
+            {"name": name, "session_id": session_id},
+            {"$set": {
+                "name": name, "session_id": session_id, "created_at": created_at,
+                "title": w["title"], "rev": 1, **_summary_fields(messages, at),
+            }},
+            upsert=True,
+        )
+    else:
+        at = _as_utc(w.get("at") or datetime.now(timezone.utc))
+        uc = UpdateOne(
+            {"name": name, "sessions.session_id": session_id},
+            {"$set": {"sessions.$.messages": messages}, "$inc": {"sessions.$.rev": 1}}
+        )
+        cs = UpdateOne(
+            {"name": name, "session_id": session_id},
+            {"$set": _summary_fields(messages, at), "$inc": {"rev": 1}},
+        )
+    return [uc], [cs]
+
+def apply_session_writes(writes: List[Dict[str, Any]]) -> None:
+    """Terapkan beberapa write sesi sekaligus (2 bulk_write berurutan, urutan write dipertahankan)."""
+    uc_ops: List[UpdateOne] = []
+    cs_ops: List[UpdateOne] = []
+    for w in writes:
+        uc, cs = _session_write_ops(w)
+        uc_ops.extend(uc)
+        cs_ops.extend(cs)
+    if uc_ops:
+        users_chats().bulk_write(uc_ops, ordered=True)
+    if cs_ops:
+        chat_sessions().bulk_write(cs_ops, ordered=True)
+    latest: Dict[Tuple[str, str], Tuple[List[dict], Optional[int]]] = {}
+    for w in writes:
+        key = (w["name"], w["session_id"])
+        # Sesi baru belum punya pesan terindeks: penanda search_indexed tidak perlu dibaca.
+        known = 0 if w["op"] == "append" and key not in latest else latest.get(key, (None, None))[1]
+        latest[key] = (w["messages"], known)
+    for (name, session_id), (messages, start) in latest.items():
+        search_index.index_session_safe(name, session_id, messages, start)
+
+def upsert_session_messages(name: str, session_id: str, messages: List[dict]) -> None:
+    apply_session_writes([{"op": "upsert", "name": name, "session_id": session_id, "messages": messages}])
+    session_cache.invalidate(name, session_id)
+
+def append_session(name: str, session_id: str, created_at: datetime, messages: List[dict], title: str) -> None:
+    apply_session_writes([{
+        "op": "append", "name": name, "session_id": session_id,
+        "created_at": created_at, "messages": messages, "title": title,
+    }])
+    session_cache.put(name, session_id, offload_messages(dehydrate_prompts(messages)), 1)
+
+def append_sessions(sessions: List[Dict[str, Any]]) -> None:
+    """
+    Buat banyak sesi baru sekaligus (mis. outreach massal): 2 bulk_write untuk semua sesi.
+    sessions = [{"name", "session_id", "created_at", "messages", "title"}]
+    """
+    apply_session_writes([{"op": "append", **s} for s in sessions])
+    for s in sessions:
+        session_cache.put(s["name"], s["session_id"], offload_messages(dehydrate_prompts(s["messages"])), 1)
+
+def load_session(name: str, session_id: str) -> Optional[dict]:
+    """Ambil satu sesi saja (projection posisional), bukan seluruh dokumen user."""
+    doc = users_chats().find_one(
+        {"name": name, "sessions.session_id": session_id},
+        {"_id": 0, "sessions.$": 1},
+    )
+    return (doc.get("sessions") or [None])[0] if doc else None
+
+def load_session_cached(name: str, session_id: str) -> Optional[dict]:
+    """Sesi dari cache worker jika ada; jika tidak, dari Mongo lalu disimpan ke cache."""
+    hit = session_cache.get(name, session_id)
+    if hit is not None:
+        return {"session_id": session_id, "messages": hit["messages"], "rev": hit["rev"]}
+    sess = load_session(name, session_id)
+    if sess and not sess.get("archived"):
+        session_cache.put(name, session_id, sess.get("messages") or [], sess.get("rev") or 0)
+    return sess
+
+COMMIT_MAX_ATTEMPTS = 3
+
+def commit_session_messages(name: str, session_id: str, messages: List[dict],
+                            expected_rev: Optional[int], base_len: int) -> int:
+    """
+    Tulis pesan sesi dengan compare-and-set pada `rev`, lalu perbarui cache (write-through).
+    `base_len` = jumlah pesan saat sesi dibaca; messages[base_len:] adalah giliran baru.
+    Jika worker lain sudah menulis lebih dulu (rev berubah), sesi terbaru dimuat dari Mongo
+    dan giliran baru ditambahkan di atasnya. Mengembalikan rev baru.
+    """
+    expected = expected_rev or 0
+    for _ in range(COMMIT_MAX_ATTEMPTS):
+        slim = offload_messages(dehydrate_prompts(messages))
+        rev_filter: Any = expected if expected else {"$in": [0, None]}
+        res = users_chats().update_one(
+            {"name": name, "sessions": {"$elemMatch": {"session_id": session_id, "rev": rev_filter}}},
+            {"$set": {"sessions.$.messages": slim, "sessions.$.rev": expected + 1}},
+        )
+        if res.matched_count:
+            # find_one_and_update (dokumen sebelum update) sekaligus memberi penanda
+            # search_indexed, jadi pengindeksan tidak butuh read tambahan per giliran.
+            before = chat_sessions().find_one_and_update(
+                {"name": name, "session_id": session_id},
+                {"$set": {**_summary_fields(slim, datetime.now(timezone.utc)), "rev": expected + 1}},
+                projection={"_id": 0, "search_indexed": 1},
+            )
+            session_cache.put(name, session_id, slim, expected + 1)
+            search_index.index_session_safe(name, session_id, messages, (before or {}).get("search_indexed") or 0)
+            return expected + 1
+        session_cache.record_conflict()
+        session_cache.invalidate(name, session_id)
+        fresh = load_session(name, session_id)
+        if not fresh:
+            raise LookupError(f"session_id '{session_id}' tidak ditemukan.")
+        if fresh.get("archived"):
+            from retention import restore_session  # import lokal: retention bergantung pada modul ini
+            fresh = restore_session(name, fresh)
+        fresh_msgs = fresh.get("messages") or []
+        messages = fresh_msgs + messages[base_len:]
+        base_len = len(fresh_msgs)
+        expected = fresh.get("rev") or 0
+    raise RuntimeError(f"Gagal menyimpan sesi '{session_id}': konflik penulisan berulang.")
@@ -0,0 +1,400 @@
+# clients.py
+# -*- coding: utf-8 -*-
+"""
+Siklus hidup klien eksternal (MongoDB, HTTP ke Laravel, Chroma) per proses worker.
+
+Tidak ada koneksi yang dibuat saat import. Setiap klien dibuat lazy di proses yang
+memakainya dan dicatat bersama PID-nya; jika PID berubah (proses hasil fork dari master
+gunicorn), handle warisan parent dibuang dan klien dibuat ulang. Dengan begitu
+`preload_app = True` aman: master tidak pernah membagi socket ke worker.
+
+Hook gunicorn ada di gunicorn.conf.py:
+  - post_fork  -> init_worker()   (buka pool di worker), lalu warmup (lihat warmup.py)
+  - worker_exit -> shutdown()     (tutup pool dengan rapi)
+
+Setiap koneksi baru ke upstream (DNS + TCP + TLS) diukur terpisah dari waktu request:
+connect_stats() / /api/metrics -> "upstream_connects".
+"""
+import os
+import time
+import atexit
+import asyncio
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+# ===================== KONFIG POOL (per worker) =====================
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+# Driver menjaga minimal sekian koneksi siap pakai di background (koneksi hangat per worker).
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+# Default mengikuti jumlah thread gunicorn (gthread) supaya setiap thread dapat koneksi sendiri.
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", str(max(16, 4 * int(os.getenv("GUNICORN_THREADS", "1"))))))
+# Blok (tunggu koneksi bebas) alih-alih membuka koneksi sekali pakai saat pool penuh.
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "true").lower() == "true"
+# Thread pool untuk fan-out panggilan API paralel (api_client.get_many); dibagi semua request.
+API_FANOUT_MAX_WORKERS = int(os.getenv("API_FANOUT_MAX_WORKERS", "8"))
+FORCE_BYPASS_PROXY = os.getenv("FORCE_BYPASS_PROXY", "false").lower() == "true"
+VERIFY_SSL = os.getenv("VERIFY_SSL", "true").lower() != "false"
+# Klien httpx async (api_client_async): batas koneksi & lama koneksi keep-alive menganggur.
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", "50"))
+ASYNC_HTTP_MAX_KEEPALIVE = int(os.getenv("ASYNC_HTTP_MAX_KEEPALIVE", "20"))
+ASYNC_HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("ASYNC_HTTP_KEEPALIVE_EXPIRY_S", "30"))
+# Koneksi idle ke OpenAI dipertahankan selama ini (httpx default 5 s terlalu pendek untuk
+# trafik chat yang jarang); warmup.py mengirim keep-alive sebelum batas ini lewat.
+OPENAI_KEEPALIVE_EXPIRY_S = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_S", "120"))
+
+CHROMA_TENANT = os.getenv("CHROMA_TENANT", "39d106f4-0829-4e38-beed-1e8627fe7afb")
+CHROMA_DATABASE = os.getenv("CHROMA_DATABASE", "lisa-chat")
+
+_lock = threading.RLock()
+_state: Dict[str, Any] = {"pid": None, "mongo": None, "http": None, "chroma": None, "executor": None,
+                          "async_http": None, "openai": None}
+
+
+def _current() -> Dict[str, Any]:
+    """Kembalikan state milik proses ini; reset jika kita berada di proses hasil fork."""
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        with _lock:
+            if _state["pid"] != pid:
+                # Jangan close(): socket-nya milik parent. Cukup lupakan handle-nya.
+                _state.update(pid=pid, mongo=None, http=None, chroma=None, executor=None, async_http=None,
+                              openai=None)
+                with _conn_lock:
+                    _conn_stats.clear()
+                    _last_used.clear()
+    return _state
+
+
+# ===================== METRIK KONEKSI UPSTREAM =====================
+_conn_lock = threading.Lock()
+_conn_stats: Dict[str, Dict[str, float]] = {}
+_last_used: Dict[str, float] = {}
+
+
+def record_connect(upstream: str, ms: float) -> None:
+    """Catat satu koneksi baru (handshake) ke upstream."""
+    with _conn_lock:
+        c = _conn_stats.setdefault(upstream, {"connects": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+        c["connects"] += 1
+        c["total_ms"] += ms
+        c["max_ms"] = max(c["max_ms"], ms)
+        c["last_ms"] = ms
+
+
+def mark_used(upstream: str) -> None:
+    with _conn_lock:
+        _last_used[upstream] = time.monotonic()
+
+
+def idle_seconds(upstream: str) -> Optional[float]:
+    """Detik sejak request terakhir ke upstream di proses ini (None = belum pernah)."""
+    with _conn_lock:
+        last = _last_used.get(upstream)
+    return None if last is None else time.monotonic() - last
+
+
+def connect_stats() -> Dict[str, Any]:
+    with _conn_lock:
+        return {
+            name: {"connects": int(c["connects"]), "avg_ms": round(c["total_ms"] / c["connects"], 1),
+                   "max_ms": round(c["max_ms"], 1), "last_ms": round(c["last_ms"], 1)}
+            for name, c in _conn_stats.items()
+        }
+
+
+def _timed(conn_cls, upstream: str):
+    class _Timed(conn_cls):
+        def connect(self):
+            t0 = time.perf_counter()
+            super().connect()
+            record_connect(upstream, (time.perf_counter() - t0) * 1000)
+    return _Timed
+
+
+class _LaravelHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _timed(HTTPConnection, "laravel")
+
+
+class _LaravelHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _timed(HTTPSConnection, "laravel")
+
+
+class _LaravelAdapter(HTTPAdapter):
+    """HTTPAdapter yang mengukur koneksi baru (connect + TLS) dan mencatat waktu pemakaian."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _LaravelHTTPConnectionPool,
+                                                   "https": _LaravelHTTPSConnectionPool}
+
+    def send(self, request, **kwargs):
+        mark_used("laravel")
+        return super().send(request, **kwargs)
+
+
+class _TracedTransport(httpx.BaseTransport):
+    """Transport httpx yang mengukur connect TCP + TLS lewat trace httpcore."""
+
+    def __init__(self, inner: httpx.BaseTransport, upstream: str):
+        self.inner = inner
+        self.upstream = upstream
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        mark_used(self.upstream)
+        started: Dict[str, float] = {}
+        tls = request.url.scheme == "https"
+
+        def trace(event: str, info: Dict[str, Any]) -> None:
+            if event == "connection.connect_tcp.started":
+                started["t"] = time.perf_counter()
+            elif "t" in started and event == ("connection.start_tls.complete" if tls
+                                              else "connection.connect_tcp.complete"):
+                record_connect(self.upstream, (time.perf_counter() - started.pop("t")) * 1000)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        return self.inner.handle_request(request)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+def _mongo_pool_listener():
+    from pymongo import monitoring
+
+    class _PoolTimer(monitoring.ConnectionPoolListener):
+        """Waktu dari connection_created sampai connection_ready (TCP + TLS + handshake/auth)."""
+
+        def __init__(self):
+            self._started: Dict[Any, float] = {}
+
+        def connection_created(self, event):
+            self._started[(event.address, event.connection_id)] = time.perf_counter()
+
+        def connection_ready(self, event):
+            t0 = self._started.pop((event.address, event.connection_id), None)
+            if t0 is not None:
+                record_connect("mongo", (time.perf_counter() - t0) * 1000)
+
+        def connection_closed(self, event):
+            self._started.pop((event.address, event.connection_id), None)
+
+        def pool_created(self, event): pass
+        def pool_ready(self, event): pass
+        def pool_cleared(self, event): pass
+        def pool_closed(self, event): pass
+        def connection_check_out_started(self, event): pass
+        def connection_check_out_failed(self, event): pass
+        def connection_checked_out(self, event): pass
+        def connection_checked_in(self, event): pass
+
+    return _PoolTimer()
+
+
+# ===================== FACTORY =====================
+def mongo():
+    st = _current()
+    if st["mongo"] is None:
+        with _lock:
+            if st["mongo"] is None:
+                from pymongo import MongoClient
+                from pymongo.server_api import ServerApi
+                if not MONGO_URI:
+                    raise RuntimeError("MONGO_URI belum diisi.")
+                st["mongo"] = MongoClient(
+                    MONGO_URI,
+                    server_api=ServerApi('1'),
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    connect=False,
+                    event_listeners=[_mongo_pool_listener()],
+                )
+    return st["mongo"]
+
+
+def http_session() -> requests.Session:
+    st = _current()
+    if st["http"] is None:
+        with _lock:
+            if st["http"] is None:
+                s = requests.Session()
+                adapter = _LaravelAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                                      pool_block=HTTP_POOL_BLOCK)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                # Session dipakai bersama semua thread & user di worker ini: jangan simpan cookie
+                # dari respons (mis. cookie sesi Laravel) supaya tidak terbawa ke request user lain.
+                # Kredensial dikirim per request lewat header (lihat api_client._auth_headers).
+                s.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                # Jika ingin memaksa bypass proxy environment:
+                if FORCE_BYPASS_PROXY:
+                    s.trust_env = False
+                st["http"] = s
+    return st["http"]
+
+
+def openai():
+    """Klien OpenAI milik proses ini (pool httpx sendiri, koneksi baru ikut diukur)."""
+    st = _current()
+    if st["openai"] is None:
+        with _lock:
+            if st["openai"] is None:
+                from openai import OpenAI, DefaultHttpxClient
+                transport = httpx.HTTPTransport(limits=httpx.Limits(
+                    max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_S))
+                st["openai"] = OpenAI(api_key=os.getenv("OPENAI_API_KEY"),
+                                      http_client=DefaultHttpxClient(transport=_TracedTransport(transport, "openai")))
+    return st["openai"]
+
+
+def chroma():
+    st = _current()
+    if st["chroma"] is None:
+        with _lock:
+            if st["chroma"] is None:
+                import chromadb
+                st["chroma"] = chromadb.CloudClient(
+                    api_key=os.getenv("CHROMADB_API_KEY"),
+                    tenant=CHROMA_TENANT,
+                    database=CHROMA_DATABASE,
+                )
+    return st["chroma"]
+
+
+def executor() -> ThreadPoolExecutor:
+    st = _current()
+    if st["executor"] is None:
+        with _lock:
+            if st["executor"] is None:
+                st["executor"] = ThreadPoolExecutor(max_workers=API_FANOUT_MAX_WORKERS,
+                                                    thread_name_prefix="api-fanout")
+    return st["executor"]
+
+
+def async_http():
+    """
+    httpx.AsyncClient untuk event loop yang sedang berjalan. Pool koneksi httpx terikat
+    ke satu loop, jadi setiap loop (di proses ini) mendapat klien sendiri; klien ikut
+    dibuang saat loop-nya di-garbage-collect. Tutup dengan aclose_async_http() sebelum
+    loop berhenti (mis. di akhir asyncio.run).
+    """
+    import httpx
+    from http.cookiejar import CookieJar
+    loop = asyncio.get_running_loop()
+    st = _current()
+    with _lock:
+        if st["async_http"] is None:
+            st["async_http"] = weakref.WeakKeyDictionary()
+        client = st["async_http"].get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+                                    max_keepalive_connections=ASYNC_HTTP_MAX_KEEPALIVE,
+                                    keepalive_expiry=ASYNC_HTTP_KEEPALIVE_EXPIRY_S),
+                verify=VERIFY_SSL,
+                trust_env=not FORCE_BYPASS_PROXY,
+                # Sama seperti http_session(): cookie respons tidak disimpan (klien dibagi semua user).
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            )
+            st["async_http"][loop] = client
+    return client
+
+
+async def aclose_async_http() -> None:
+    """Tutup klien async milik event loop yang sedang berjalan (jika ada)."""
+    st = _current()
+    with _lock:
+        client = (st["async_http"] or {}).get(asyncio.get_running_loop())
+    if client is not None:
+        await client.aclose()
+
+
+class SessionProxy:
+    """Objek pengganti `requests.Session` global: setiap atribut diteruskan ke sesi milik proses ini."""
+
+    def __getattr__(self, item):
+        return getattr(http_session(), item)
+
+
+class OpenAIProxy:
+    """Pengganti klien OpenAI global (app.client): diteruskan ke klien milik proses ini."""
+
+    def __getattr__(self, item):
+        return getattr(openai(), item)
+
+
+# ===================== LIFECYCLE =====================
+def init_worker() -> None:
+    """Dipanggil di post_fork: siapkan klien di worker (koneksi Mongo tetap dibuka lazy oleh driver)."""
+    _current()
+    mongo()
+    http_session()
+
+
+def shutdown() -> None:
+    """Tutup semua klien milik proses ini. Aman dipanggil berulang kali."""
+    st = _state
+    if st["pid"] != os.getpid():
+        return
+    with _lock:
+        if st["mongo"] is not None:
+            try:
+                st["mongo"].close()
+            except Exception:
+                pass
+        if st["http"] is not None:
+            try:
+                st["http"].close()
+            except Exception:
+                pass
+        if st["openai"] is not None:
+            try:
+                st["openai"].close()
+            except Exception:
+                pass
+        if st["executor"] is not None:
+            st["executor"].shutdown(wait=False)
+        # Klien async hanya bisa ditutup dari loop-nya sendiri (aclose_async_http); di sini cukup dilupakan.
+        st.update(mongo=None, http=None, chroma=None, executor=None, async_http=None, openai=None)
+
+
+def health(check_chroma: bool = False) -> Dict[str, Any]:
+    """Cek kesehatan klien. Mengembalikan {"ok": bool, "<nama>": {...}}."""
+    out: Dict[str, Any] = {"pid": os.getpid()}
+    try:
+        mongo().admin.command("ping")
+        out["mongo"] = {"ok": True, "max_pool_size": MONGO_MAX_POOL_SIZE}
+    except Exception as e:
+        out["mongo"] = {"ok": False, "error": str(e)}
+    out["http"] = {"ok": True, "pool_maxsize": HTTP_POOL_MAXSIZE, "initialized": _state["http"] is not None}
+    if check_chroma:
+        try:
+            chroma().heartbeat()
+            out["chroma"] = {"ok": True}
+        except Exception as e:
+            out["chroma"] = {"ok": False, "error": str(e)}
+    out["ok"] = all(v.get("ok") for k, v in out.items() if isinstance(v, dict))
+    return out
+
+
+atexit.register(shutdown)
@@ -0,0 +1,276 @@
+# company_index.py
+# -*- coding: utf-8 -*-
+"""
+Index lokal company_id -> {name, summary} untuk memperkaya data lowongan tanpa request
+ke admin API.
+
+Sumber data (koleksi Mongo `company_index`, dibagi semua worker):
+  - push dari Laravel lewat POST /api/feeder/companies (upsert_companies);
+  - refresh inkremental dari admin API (refresh_from_api): otomatis di background setiap
+    COMPANY_INDEX_REFRESH_S oleh satu worker saja (lease di dokumen "_meta"), atau manual
+    lewat `python manage.py companies`. Jika COMPANY_INDEX_SINCE_PARAM diisi, hanya
+    perusahaan yang berubah sejak refresh terakhir yang diminta;
+  - id yang belum ada diambil sekali lewat get_company_details lalu disimpan.
+
+Perusahaan yang dihapus (tool delete_company, atau tidak lagi muncul saat refresh penuh)
+ditandai `deleted` (tombstone, seperti talent_index) supaya ikut tersebar ke worker lain
+lewat watermark yang sama; lookup() tidak lagi mengembalikan maupun mengambil ulang id itu.
+
+Setiap worker menyimpan salinan di memori dan hanya menarik dokumen yang berubah
+(`updated_at` > watermark - 5 detik) paling sering sekali per COMPANY_INDEX_LOCAL_SYNC_S, jadi
+lookup() pada kondisi normal adalah join dict lokal tanpa panggilan jaringan. Pengecekan
+lease refresh dijalankan di executor (bukan di jalur request), paling sering sekali per
+min(COMPANY_INDEX_REFRESH_S, COMPANY_INDEX_LEASE_S) per worker.
+"""
+import os
+import threading
+import contextvars
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+import clients
+
+COMPANY_INDEX_LOCAL_SYNC_S = float(os.getenv("COMPANY_INDEX_LOCAL_SYNC_S", "30"))
+COMPANY_INDEX_REFRESH_S = float(os.getenv("COMPANY_INDEX_REFRESH_S", "3600"))
+# Nama query param list /companies untuk "berubah sejak" (mis. "updated_since"); kosong = scan penuh.
+COMPANY_INDEX_SINCE_PARAM = os.getenv("COMPANY_INDEX_SINCE_PARAM", "").strip()
+COMPANY_INDEX_LEASE_S = 600
+SUMMARY_MAX_CHARS = 300
+META_ID = "_meta"
+UNKNOWN_COMPANY = "Perusahaan tidak diketahui"
+
+_lock = threading.Lock()
+_local: Dict[int, Dict[str, Any]] = {}
+_deleted: set = set()
+_watermark: Optional[datetime] = None
+_next_sync = 0.0
+_next_lease_check = 0.0
+_stats = {"hits": 0, "misses": 0, "local_syncs": 0, "api_refreshes": 0, "removals": 0}
+
+
+def company_index():
+    return clients.mongo().chatbot_db.company_index
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _entry(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not isinstance(item, dict) or item.get("id") is None or not item.get("name"):
+        return None
+    summary = (item.get("summary") or item.get("description") or "").strip()
+    return {"name": item["name"], "summary": summary[:SUMMARY_MAX_CHARS]}
+
+
+# ======================================================================
+# PENULISAN
+# ======================================================================
+def upsert_companies(items: Iterable[Dict[str, Any]], source: str) -> int:
+    """Simpan/perbarui entri dari data perusahaan (feeder / admin API). Mengembalikan jumlah entri."""
+    now = _now()
+    ops = []
+    for item in items or []:
+        e = _entry(item)
+        if e is None:
+            continue
+        rid = int(item["id"])
+        ops.append(UpdateOne({"_id": rid}, {"$set": {**e, "source": source, "updated_at": now},
+                                            "$unset": {"deleted": ""}}, upsert=True))
+        with _lock:
+            _local[rid] = e
+            _deleted.discard(rid)
+    if ops:
+        company_index().bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def upsert_companies_safe(items: Iterable[Dict[str, Any]], source: str) -> None:
+    try:
+        upsert_companies(items, source)
+    except Exception as e:
+        print(f"[company-index] gagal menyimpan: {e}")
+
+
+def remove_companies(ids: Iterable[Any]) -> int:
+    """Tandai perusahaan terhapus (tombstone, tersebar ke semua worker). Mengembalikan jumlah id."""
+    rids = []
+    for rid in ids or []:
+        try:
+            rids.append(int(rid))
+        except (TypeError, ValueError):
+            continue
+    if not rids:
+        return 0
+    now = _now()
+    company_index().bulk_write([UpdateOne({"_id": rid}, {"$set": {"deleted": True, "updated_at": now},
+                                                         "$unset": {"name": "", "summary": ""}})
+                                for rid in rids], ordered=False)
+    with _lock:
+        for rid in rids:
+            _local.pop(rid, None)
+            _deleted.add(rid)
+        _stats["removals"] += len(rids)
+    return len(rids)
+
+
+def remove_companies_safe(ids: Iterable[Any]) -> None:
+    try:
+        remove_companies(ids)
+    except Exception as e:
+        print(f"[company-index] gagal menghapus perusahaan dari index: {e}")
+
+
+def refresh_from_api(full: bool = False) -> int:
+    """
+    Tarik daftar perusahaan dari admin API ke index (butuh token; lihat api_client.ensure_token).
+    Inkremental jika COMPANY_INDEX_SINCE_PARAM diisi dan sudah pernah refresh, kecuali full=True.
+    Scan penuh juga menandai terhapus perusahaan yang tidak lagi dikembalikan admin API.
+    """
+    import api_client
+    started = _now()
+    meta = company_index().find_one({"_id": META_ID}) or {}
+    filters = None
+    if not full and COMPANY_INDEX_SINCE_PARAM and meta.get("api_synced_at"):
+        filters = {COMPANY_INDEX_SINCE_PARAM: meta["api_synced_at"].isoformat()}
+    total, batch, seen = 0, [], set()
+    for item in api_client.iter_resource("companies", per_page=api_client.API_PAGE_SIZE_MAX, filters=filters):
+        batch.append(item)
+        if item.get("id") is not None:
+            seen.add(int(item["id"]))
+        if len(batch) >= 500:
+            total += upsert_companies(batch, source="api")
+            batch = []
+    total += upsert_companies(batch, source="api")
+    if filters is None:
+        # Hanya entri yang tidak disentuh selama scan: yang baru masuk lewat feeder /
+        # lookup sementara scan berjalan tidak ikut terhapus.
+        stale = [d["_id"] for d in company_index().find(
+                     {"_id": {"$ne": META_ID}, "deleted": {"$ne": True}, "updated_at": {"$lt": started}},
+                     {"_id": 1})
+                 if int(d["_id"]) not in seen]
+        for i in range(0, len(stale), 500):
+            remove_companies(stale[i:i + 500])
+    company_index().update_one({"_id": META_ID}, {"$set": {"api_synced_at": started, "lease_until": None}},
+                               upsert=True)
+    with _lock:
+        _stats["api_refreshes"] += 1
+    return total
+
+
+def _take_refresh_lease() -> bool:
+    """True jika worker ini yang harus refresh (index basi & tidak ada worker lain yang sedang refresh)."""
+    now = _now()
+    try:
+        company_index().find_one_and_update(
+            {"_id": META_ID, "$and": [
+                {"$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+                {"$or": [{"api_synced_at": None},
+                         {"api_synced_at": {"$lt": now - timedelta(seconds=COMPANY_INDEX_REFRESH_S)}}]},
+            ]},
+            {"$set": {"lease_until": now + timedelta(seconds=COMPANY_INDEX_LEASE_S)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False  # _meta ada tapi tidak cocok filter: masih segar atau sedang di-refresh
+
+
+def _refresh_background() -> None:
+    try:
+        if _take_refresh_lease():
+            refresh_from_api()
+    except Exception as e:
+        print(f"[company-index] refresh dari admin API gagal: {e}")
+
+
+# ======================================================================
+# PEMBACAAN
+# ======================================================================
+def _sync_local() -> None:
+    """Tarik entri yang berubah sejak watermark ke salinan lokal (maksimal sekali per interval)."""
+    global _watermark, _next_sync, _next_lease_check
+    now = _now()
+    with _lock:
+        if now.timestamp() < _next_sync:
+            return
+        _next_sync = now.timestamp() + COMPANY_INDEX_LOCAL_SYNC_S
+        since = _watermark
+        check_lease = now.timestamp() >= _next_lease_check
+        if check_lease:
+            # Index yang segar baru basi lagi setelah REFRESH_S; lease worker lain habis
+            # setelah LEASE_S. Lebih sering dari itu hanya find_one_and_update yang sia-sia.
+            _next_lease_check = now.timestamp() + min(COMPANY_INDEX_REFRESH_S, COMPANY_INDEX_LEASE_S)
+    # Tumpang tindih 5 detik (sama dengan talent_index): write worker lain yang commit sedikit
+    # terlambat dengan updated_at lebih awal tidak terlewat (menerapkan ulang entri yang sama aman).
+    q: Dict[str, Any] = ({"updated_at": {"$gt": since - timedelta(seconds=5)}} if since
+                         else {"updated_at": {"$exists": True}})
+    newest = since
+    rows = {}
+    for d in company_index().find(q, {"name": 1, "summary": 1, "deleted": 1, "updated_at": 1}):
+        rows[int(d["_id"])] = (None if d.get("deleted")
+                               else {"name": d.get("name"), "summary": d.get("summary") or ""})
+        at = d["updated_at"] if d["updated_at"].tzinfo else d["updated_at"].replace(tzinfo=timezone.utc)
+        newest = at if newest is None or at > newest else newest
+    with _lock:
+        for rid, e in rows.items():
+            if e is None:
+                _local.pop(rid, None)
+                _deleted.add(rid)
+            else:
+                _local[rid] = e
+                _deleted.discard(rid)
+        _watermark = newest
+        _stats["local_syncs"] += 1
+    if check_lease:
+        clients.executor().submit(contextvars.copy_context().run, _refresh_background)
+
+
+def lookup(ids: Iterable[Any], fetch_missing: bool = True) -> Dict[int, Dict[str, Any]]:
+    """
+    {company_id: {"name", "summary"}} untuk ids. Id yang tidak ada di index diambil dari
+    admin API (satu batch get_company_details) dan disimpan jika fetch_missing=True.
+    """
+    wanted = []
+    for rid in ids or []:
+        try:
+            wanted.append(int(rid))
+        except (TypeError, ValueError):
+            continue
+    try:
+        _sync_local()
+    except Exception as e:
+        print(f"[company-index] sinkronisasi lokal gagal: {e}")
+    with _lock:
+        found = {rid: _local[rid] for rid in wanted if rid in _local}
+        missing = list(dict.fromkeys(rid for rid in wanted if rid not in found and rid not in _deleted))
+        _stats["hits"] += len(wanted) - len(missing)
+        _stats["misses"] += len(missing)
+    if missing and fetch_missing:
+        from api_client import get_company_details
+        try:
+            fetched = get_company_details(missing).get("data", [])
+        except Exception:
+            fetched = []
+        upsert_companies_safe(fetched, source="api")
+        for item in fetched:
+            e = _entry(item)
+            if e is not None:
+                found[int(item["id"])] = e
+    return found
+
+
+def company_name(index: Dict[int, Dict[str, Any]], company_id: Any) -> str:
+    try:
+        return (index.get(int(company_id)) or {}).get("name") or UNKNOWN_COMPANY
+    except (TypeError, ValueError):
+        return UNKNOWN_COMPANY
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, "entries": len(_local),
+                "watermark": _watermark.isoformat() if _watermark else None}
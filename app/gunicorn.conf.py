@@ -0,0 +1,51 @@
+# gunicorn.conf.py
+# -*- coding: utf-8 -*-
+"""
+Konfigurasi gunicorn. Jalankan: gunicorn -c gunicorn.conf.py wsgi:app
+
+preload_app aman karena tidak ada klien (Mongo/HTTP/Chroma) yang dibuat saat import;
+semuanya dibuat per worker lewat clients.py setelah fork. Ukuran pool per worker diatur
+lewat MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE.
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+# Aman dijalankan multi-thread: token Admin API bersifat per request (api_client) dan
+# Session HTTP/Mongo thread-safe dengan pool seukuran thread (clients.py).
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def when_ready(server):
+    # Master selesai preload: pastikan tidak ada klien yang terlanjur dibuat di master.
+    import clients
+    clients.shutdown()
+
+
+def post_fork(server, worker):
+    import clients
+    import warmup
+    import write_behind
+    clients.init_worker()
+    write_behind.start()
+    # Buka koneksi ke upstream sebelum request pertama, lalu jaga tetap hangat.
+    warm = warmup.warm_all()
+    warmup.start()
+    # Index BM25 talent dimuat dari snapshot di background; search pertama menunggu jika belum siap.
+    import threading
+    import talent_index
+    threading.Thread(target=talent_index.load, name="talent-index-load", daemon=True).start()
+    server.log.info("worker %s: klien Mongo/HTTP diinisialisasi, warmup %s", worker.pid, warm)
+
+
+def worker_exit(server, worker):
+    import clients
+    import warmup
+    import write_behind
+    warmup.stop()
+    write_behind.stop(drain=True)
+    clients.shutdown()
@@ -0,0 +1,306 @@
+# http_cache.py
+# -*- coding: utf-8 -*-
+"""
+Cache HTTP kondisional (ETag / Last-Modified) di disk untuk GET ke Laravel admin API.
+
+Alur satu GET (dipanggil dari api_client._request):
+  1. Entri masih segar menurut Cache-Control: max-age / Expires -> langsung dari disk,
+     tanpa request sama sekali.
+  2. Entri ada tapi basi -> request dikirim dengan If-None-Match / If-Modified-Since.
+     Balasan 304 -> body dari disk (validator & header cache diperbarui).
+  3. Selain itu -> request biasa; balasan 200 yang punya validator / max-age disimpan.
+Tanpa Cache-Control dari backend, entri dianggap langsung basi: selalu direvalidasi,
+jadi data tidak pernah lebih lama dari yang dikonfirmasi server. `no-store` tidak disimpan,
+`no-cache` selalu direvalidasi.
+
+Kunci = sha256(URL lengkap) + sha256(token Authorization): respons satu token tidak pernah
+dipakai untuk token lain. Write (PUT/POST/DELETE) ke /resource atau /resource/{id} menghapus
+semua entri resource itu: detail, dan semua halaman list (?page=..&search=..).
+
+Penyimpanan: satu subdirektori per resource (sha256 path tanpa query & tanpa id di ujung),
+satu file per entri di dalamnya (baris pertama JSON metadata, sisanya body mentah), ditulis
+atomik (tmp + os.replace) sehingga aman dipakai semua worker. Invalidasi cukup membaca
+satu subdirektori kecil, bukan seluruh cache.
+Total ukuran dibatasi HTTP_CACHE_MAX_BYTES; kelebihan dibuang dari yang paling lama tidak
+dipakai (mtime diperbarui setiap hit).
+"""
+import os
+import json
+import time
+import fcntl
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "./data/http_cache")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+HTTP_CACHE_MAX_ENTRY_BYTES = int(os.getenv("HTTP_CACHE_MAX_ENTRY_BYTES", str(4 * 1024 * 1024)))
+
+_KEEP_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires", "Date")
+
+_lock = threading.Lock()
+_approx_bytes: Optional[int] = None
+_stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+
+def _bump(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _full_url(url: str, params: Any) -> str:
+    return requests.Request("GET", url, params=params).prepare().url
+
+
+def _resource_dir(url: str) -> str:
+    """Subdirektori resource: URL tanpa query, segmen id numerik di ujung dibuang."""
+    path = url.split("?", 1)[0].rstrip("/")
+    head, _, last = path.rpartition("/")
+    if last.isdigit():
+        path = head
+    return os.path.join(HTTP_CACHE_DIR, _sha(path)[:24])
+
+
+def _path(full_url: str, token_key: str) -> str:
+    return os.path.join(_resource_dir(full_url), f"{_sha(full_url)[:32]}-{token_key[:16]}.entry")
+
+
+def _adjust_bytes(delta: int) -> None:
+    global _approx_bytes
+    with _lock:
+        if _approx_bytes is not None:
+            _approx_bytes = max(0, _approx_bytes + delta)
+
+
+def _directives(value: Optional[str]) -> Dict[str, Optional[str]]:
+    out: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        k, _, v = part.partition("=")
+        out[k.strip()] = v.strip().strip('"') or None
+    return out
+
+
+def _fresh_until(headers) -> float:
+    cc = _directives(headers.get("Cache-Control"))
+    if "no-cache" in cc:
+        return 0.0
+    if cc.get("max-age") and cc["max-age"].isdigit():
+        return time.time() + int(cc["max-age"])
+    if headers.get("Expires"):
+        try:
+            return parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            return 0.0
+    return 0.0
+
+
+def _vary_ok(headers) -> bool:
+    # Kunci cache hanya membedakan URL & token; Vary lain (mis. Accept-Language) tidak disimpan.
+    vary = {v.strip().lower() for v in (headers.get("Vary") or "").split(",") if v.strip()}
+    return vary <= {"accept", "accept-encoding", "authorization", "origin"}
+
+
+def _read(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as f:
+            meta = json.loads(f.readline().decode("utf-8"))
+            meta["body"] = f.read()
+        return meta
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write(path: str, meta: Dict[str, Any], body: bytes) -> None:
+    global _approx_bytes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        f.write(json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n")
+        f.write(body)
+        size = f.tell()
+    try:
+        old_size = os.path.getsize(path)  # entri yang ditimpa (mis. setelah 304) tidak dihitung dua kali
+    except OSError:
+        old_size = 0
+    os.replace(tmp, path)
+    _bump("stores")
+    with _lock:
+        if _approx_bytes is None:
+            _approx_bytes = _dir_size()
+        else:
+            _approx_bytes += size - old_size
+        over = _approx_bytes > HTTP_CACHE_MAX_BYTES
+    if over:
+        _evict()
+
+
+def _iter_entries():
+    """os.DirEntry semua file entri di semua subdirektori resource."""
+    try:
+        dirs = [e.path for e in os.scandir(HTTP_CACHE_DIR) if e.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return
+    for d in dirs:
+        try:
+            yield from (x for x in os.scandir(d) if x.name.endswith(".entry"))
+        except FileNotFoundError:
+            continue
+
+
+def _dir_size() -> int:
+    total = 0
+    for e in _iter_entries():
+        try:
+            total += e.stat().st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+
+def _evict() -> None:
+    """Buang entri paling lama tidak dipakai sampai total <= 90% batas. Satu worker saja."""
+    global _approx_bytes
+    fd = os.open(os.path.join(HTTP_CACHE_DIR, ".evict.lock"), os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # worker lain sedang membersihkan
+        entries = []
+        for e in _iter_entries():
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        target = int(HTTP_CACHE_MAX_BYTES * 0.9)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                _bump("evictions")
+            except FileNotFoundError:
+                pass
+        with _lock:
+            _approx_bytes = total
+    finally:
+        os.close(fd)
+
+
+def _as_response(meta: Dict[str, Any], url: str) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = meta["body"]
+    resp.headers = CaseInsensitiveDict(meta.get("headers") or {})
+    resp.url = url
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers) or "utf-8"
+    resp.from_cache = True  # type: ignore[attr-defined]
+    return resp
+
+
+# ======================================================================
+# API PUBLIK
+# ======================================================================
+def cached_get(send: Callable[..., requests.Response], url: str, kw: Dict[str, Any]) -> requests.Response:
+    """
+    GET lewat cache. `send(**kw)` mengirim request sebenarnya (sudah termasuk retry/breaker);
+    `kw` berisi params/headers yang sama dengan yang akan dikirim.
+    """
+    if not HTTP_CACHE_ENABLED:
+        return send(**kw)
+    headers = dict(kw.get("headers") or {})
+    full_url = _full_url(url, kw.get("params"))
+    path = _path(full_url, _sha(headers.get("Authorization") or ""))
+    entry = _read(path)
+    if entry is not None:
+        if entry.get("fresh_until", 0) > time.time():
+            _bump("fresh_hits")
+            try:
+                os.utime(path)  # tanda "baru dipakai" untuk eviction LRU
+            except FileNotFoundError:
+                pass
+            return _as_response(entry, full_url)
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    resp = send(**{**kw, "headers": headers})
+
+    if resp.status_code == 304 and entry is not None:
+        _bump("revalidated")
+        merged = {**(entry.get("headers") or {}),
+                  **{h: resp.headers[h] for h in _KEEP_HEADERS if h in resp.headers}}
+        entry.update(headers=merged, fresh_until=_fresh_until(resp.headers),
+                     etag=resp.headers.get("ETag") or entry.get("etag"),
+                     last_modified=resp.headers.get("Last-Modified") or entry.get("last_modified"))
+        body = entry.pop("body")
+        try:
+            _write(path, entry, body)
+        except OSError as e:
+            print(f"[http-cache] gagal memperbarui {full_url}: {e}")
+        entry["body"] = body
+        return _as_response(entry, full_url)
+
+    _bump("misses")
+    cc = _directives(resp.headers.get("Cache-Control"))
+    cacheable = (
+        resp.status_code == 200
+        and "no-store" not in cc
+        and (resp.headers.get("ETag") or resp.headers.get("Last-Modified") or _fresh_until(resp.headers))
+        and len(resp.content) <= HTTP_CACHE_MAX_ENTRY_BYTES
+        and _vary_ok(resp.headers)
+    )
+    if cacheable:
+        meta = {
+            "url": full_url,
+            "headers": {h: resp.headers[h] for h in _KEEP_HEADERS if h in resp.headers},
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fresh_until": _fresh_until(resp.headers),
+        }
+        try:
+            _write(path, meta, resp.content)
+        except OSError as e:
+            print(f"[http-cache] gagal menyimpan {full_url}: {e}")
+    return resp
+
+
+def invalidate(url: str) -> None:
+    """Hapus semua entri (semua token, semua query) milik resource URL ini."""
+    removed = 0
+    try:
+        entries = list(os.scandir(_resource_dir(_full_url(url, None))))
+    except FileNotFoundError:
+        return
+    for e in entries:
+        if not e.name.endswith(".entry"):
+            continue
+        try:
+            size = e.stat().st_size
+            os.remove(e.path)
+            removed += size
+            _bump("invalidations")
+        except FileNotFoundError:
+            pass
+    _adjust_bytes(-removed)
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, "enabled": HTTP_CACHE_ENABLED, "approx_bytes": _approx_bytes,
+                "max_bytes": HTTP_CACHE_MAX_BYTES}
@@ -0,0 +1,179 @@
+# manage.py
+# -*- coding: utf-8 -*-
+"""
+Perintah manajemen chat store.
+
+  python manage.py indexes   -> buat semua index yang dideklarasikan di chat_store.INDEXES
+  python manage.py migrate   -> jalankan migrasi data yang tertunda, lalu buat index
+  python manage.py status    -> tampilkan status migrasi
+  python manage.py verify    -> explain() query panas & pastikan semuanya memakai index
+  python manage.py archive   -> arsipkan sesi tidak aktif ke file terkompresi (retention.py)
+  python manage.py export    -> tulis sesi sebagai NDJSON (transfer.py)
+  python manage.py import    -> impor NDJSON hasil export (bisa dilanjutkan dengan --state-file)
+  python manage.py companies -> refresh index nama perusahaan dari admin API (company_index.py)
+  python manage.py talents   -> isi ulang index BM25 talent dari admin API + tulis snapshot (talent_index.py)
+"""
+import os
+import sys
+import argparse
+from typing import Any, Dict, List
+
+import chat_store
+import company_index
+import migrations
+import retention
+import talent_index
+import transfer
+
+
+def _walk_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    stages = [plan]
+    for key in ("inputStage", "outerStage", "innerStage"):
+        if key in plan:
+            stages.extend(_walk_stages(plan[key]))
+    for sub in plan.get("inputStages", []) or []:
+        stages.extend(_walk_stages(sub))
+    return stages
+
+
+def cmd_indexes(_args) -> int:
+    for name in chat_store.ensure_indexes():
+        print(f"index OK: {name}")
+    return 0
+
+
+def cmd_migrate(args) -> int:
+    applied = migrations.run_pending()
+    print(f"{len(applied)} migrasi dijalankan." if applied else "Tidak ada migrasi tertunda.")
+    if not args.skip_indexes:
+        cmd_indexes(args)
+    return 0
+
+
+def cmd_status(_args) -> int:
+    todo = set(migrations.pending())
+    for version, _ in migrations.MIGRATIONS:
+        print(f"[{'pending' if version in todo else 'done   '}] {version}")
+    return 0
+
+
+def cmd_verify(_args) -> int:
+    failed = 0
+    for label, coll_name, flt, sort, projection in chat_store.HOT_QUERIES:
+        cursor = chat_store.get_db()[coll_name].find(flt, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = _walk_stages(plan.get("queryPlan", plan))
+        names = [s.get("stage") for s in stages]
+        index_names = sorted({s["indexName"] for s in stages if s.get("indexName")})
+        ok = "COLLSCAN" not in names and "SORT" not in names and bool(index_names)
+        covered = ok and "FETCH" not in names
+        status = "OK" if ok else "FAIL"
+        print(f"[{status}] {label}: {' <- '.join(names)} index={','.join(index_names) or '-'}"
+              + (" (covered)" if covered else ""))
+        if not ok:
+            failed += 1
+    return 1 if failed else 0
+
+
+def cmd_archive(args) -> int:
+    n = retention.archive_inactive(days=args.days, empty_days=args.empty_days, limit=args.limit)
+    print(f"{n} sesi diarsip ke {retention.ARCHIVE_DIR}.")
+    return 0
+
+
+def cmd_export(args) -> int:
+    out = open(args.out, "w", encoding="utf-8") if args.out != "-" else sys.stdout
+    lines = 0
+    try:
+        for line in transfer.export_ndjson(name=args.user, since=transfer.parse_date(args.since),
+                                           until=transfer.parse_date(args.until), hydrate=not args.raw):
+            out.write(line)
+            lines += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{lines} baris diekspor.", file=sys.stderr)
+    return 0
+
+
+def cmd_import(args) -> int:
+    skip = args.skip
+    if skip is None and args.state_file and os.path.exists(args.state_file):
+        with open(args.state_file, "r", encoding="utf-8") as f:
+            skip = int(f.read().strip() or 0)
+
+    def _save(checkpoint: int) -> None:
+        print(f"checkpoint: {checkpoint} sesi", file=sys.stderr)
+        if args.state_file:
+            with open(args.state_file, "w", encoding="utf-8") as f:
+                f.write(str(checkpoint))
+
+    src = open(args.file, "r", encoding="utf-8") if args.file != "-" else sys.stdin
+    try:
+        stats = transfer.import_ndjson(src, skip=skip or 0, on_batch=_save)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    _save(stats["checkpoint"])
+    print(f"{stats['sessions']} sesi / {stats['messages']} pesan diimpor, {stats['skipped']} dilewati.",
+          file=sys.stderr)
+    return 0
+
+
+def cmd_companies(args) -> int:
+    import api_client
+    api_client.ensure_token()
+    n = company_index.refresh_from_api(full=args.full)
+    print(f"{n} perusahaan disimpan ke index.")
+    return 0
+
+
+def cmd_talents(_args) -> int:
+    import api_client
+    api_client.ensure_token()
+    n = talent_index.rebuild_from_api()
+    print(f"{n} talent diindeks; snapshot: {talent_index.TALENT_INDEX_PATH}.")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="manage.py", description="Manajemen chat store (MongoDB).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("indexes", help="Buat index yang dideklarasikan.").set_defaults(func=cmd_indexes)
+    p_migrate = sub.add_parser("migrate", help="Jalankan migrasi tertunda lalu buat index.")
+    p_migrate.add_argument("--skip-indexes", action="store_true")
+    p_migrate.set_defaults(func=cmd_migrate)
+    sub.add_parser("status", help="Status migrasi.").set_defaults(func=cmd_status)
+    sub.add_parser("verify", help="Verifikasi query panas memakai index (explain).").set_defaults(func=cmd_verify)
+    p_archive = sub.add_parser("archive", help="Arsipkan sesi tidak aktif.")
+    p_archive.add_argument("--days", type=int, default=retention.RETENTION_DAYS)
+    p_archive.add_argument("--empty-days", type=int, default=retention.RETENTION_EMPTY_DAYS)
+    p_archive.add_argument("--limit", type=int, default=None)
+    p_archive.set_defaults(func=cmd_archive)
+    p_export = sub.add_parser("export", help="Export sesi ke NDJSON.")
+    p_export.add_argument("--user", default=None, help="Hanya sesi milik nama ini.")
+    p_export.add_argument("--since", default=None, help="last_activity_at >= tanggal ini (YYYY-MM-DD).")
+    p_export.add_argument("--until", default=None, help="last_activity_at < tanggal ini (YYYY-MM-DD).")
+    p_export.add_argument("--raw", action="store_true", help="Jangan sertakan isi payload_ref / prompt_ref.")
+    p_export.add_argument("--out", default="-", help="File tujuan (default stdout).")
+    p_export.set_defaults(func=cmd_export)
+    p_import = sub.add_parser("import", help="Impor sesi dari NDJSON.")
+    p_import.add_argument("file", help="File NDJSON ('-' untuk stdin).")
+    p_import.add_argument("--skip", type=int, default=None, help="Lewati N sesi pertama.")
+    p_import.add_argument("--state-file", default=None, help="Simpan/baca checkpoint untuk resume.")
+    p_import.set_defaults(func=cmd_import)
+    p_companies = sub.add_parser("companies", help="Refresh index nama perusahaan dari admin API.")
+    p_companies.add_argument("--full", action="store_true", help="Scan semua perusahaan, bukan hanya yang berubah.")
+    p_companies.set_defaults(func=cmd_companies)
+    sub.add_parser("talents", help="Isi ulang index BM25 talent dari admin API.").set_defaults(func=cmd_talents)
+    args = parser.parse_args(argv)
+    if not chat_store.mongo_available():
+        print("MongoDB tidak tersedia.")
+        return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
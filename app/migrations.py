@@ -0,0 +1,231 @@
+# migrations.py
+# -*- coding: utf-8 -*-
+"""
+Migrasi data berversi untuk chatbot_db.
+
+Setiap migrasi adalah fungsi `fn(state) -> None` yang memproses data per batch dan
+menyimpan checkpoint lewat `state.checkpoint(value)`. Status tercatat di koleksi
+`schema_migrations`, jadi migrasi yang terputus akan dilanjutkan dari checkpoint
+terakhir saat `python manage.py migrate` dijalankan lagi.
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from chat_store import get_db, users_chats, chat_sessions, backfill_session_summaries, SUMMARIES_BACKFILLED
+from blob_store import offload_messages
+from prompt_registry import dehydrate_prompts
+from search_index import index_session, message_search
+
+BATCH_SIZE = 200
+
+
+def schema_migrations():
+    return get_db().schema_migrations
+
+
+class MigrationState:
+    def __init__(self, version: str):
+        self.version = version
+        doc = schema_migrations().find_one({"_id": version}) or {}
+        self.value: Optional[Any] = doc.get("checkpoint")
+
+    def checkpoint(self, value: Any) -> None:
+        self.value = value
+        schema_migrations().update_one(
+            {"_id": self.version},
+            {"$set": {"checkpoint": value, "updated_at": datetime.now(timezone.utc)}},
+        )
+
+
+# ======================================================================
+# DAFTAR MIGRASI
+# ======================================================================
+def m0001_dedupe_users_chats(state: MigrationState) -> None:
+    """
+    Gabungkan dokumen users_chats ganda (hasil race get_or_create lama) ke dokumen tertua,
+    supaya index unik `name_unique` bisa dibuat.
+    """
+    dupes = users_chats().aggregate([
+        {"$group": {"_id": "$name", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$sort": {"_id": 1}},
+    ], allowDiskUse=True)
+    for group in dupes:
+        name = group["_id"]
+        if not isinstance(name, str):
+            continue
+        if state.value is not None and name <= state.value:
+            continue
+        keep, *others = sorted(group["ids"])
+        for oid in others:
+            extra = users_chats().find_one({"_id": oid}, {"sessions": 1}) or {}
+            if extra.get("sessions"):
+                users_chats().update_one({"_id": keep}, {"$push": {"sessions": {"$each": extra["sessions"]}}})
+            users_chats().delete_one({"_id": oid})
+        state.checkpoint(name)
+
+
+def m0002_backfill_session_summaries(state: MigrationState) -> None:
+    """Isi koleksi chat_sessions untuk semua sesi yang dibuat sebelum ringkasan ada."""
+    while True:
+        query = {"_id": {"$gt": state.value}} if state.value is not None else {}
+        batch = list(users_chats().find(query, {"_id": 1, "name": 1}).sort("_id", 1).limit(BATCH_SIZE))
+        if not batch:
+            return
+        for doc in batch:
+            if doc.get("name"):
+                backfill_session_summaries(doc["name"])
+        state.checkpoint(batch[-1]["_id"])
+
+
+def m0003_offload_tool_payloads(state: MigrationState) -> None:
+    """Pindahkan output tool besar di sesi lama ke tool_payloads (lihat blob_store.py)."""
+    while True:
+        query = {"_id": {"$gt": state.value}} if state.value is not None else {}
+        batch = list(users_chats().find(query, {"_id": 1}).sort("_id", 1).limit(BATCH_SIZE))
+        if not batch:
+            return
+        for ref in batch:
+            doc = users_chats().find_one({"_id": ref["_id"]}, {"sessions": 1}) or {}
+            changes = {}
+            for i, sess in enumerate(doc.get("sessions") or []):
+                msgs = sess.get("messages") or []
+                slim = offload_messages(msgs)
+                if any(a is not b for a, b in zip(msgs, slim)):
+                    changes[f"sessions.{i}.messages"] = slim
+            if changes:
+                users_chats().update_one({"_id": ref["_id"]}, {"$set": changes})
+        state.checkpoint(batch[-1]["_id"])
+
+
+def m0004_system_prompt_refs(state: MigrationState) -> None:
+    """Ganti salinan penuh system prompt di messages[0] tiap sesi dengan referensi versi."""
+    while True:
+        query = {"_id": {"$gt": state.value}} if state.value is not None else {}
+        batch = list(users_chats().find(query, {"_id": 1}).sort("_id", 1).limit(BATCH_SIZE))
+        if not batch:
+            return
+        for ref in batch:
+            # Cukup ambil pesan pertama tiap sesi (dipotong di server).
+            rows = list(users_chats().aggregate([
+                {"$match": {"_id": ref["_id"]}},
+                {"$project": {"heads": {"$map": {
+                    "input": {"$ifNull": ["$sessions", []]},
+                    "in": {"$slice": [{"$ifNull": ["$$this.messages", []]}, 1]},
+                }}}},
+            ]))
+            changes = {}
+            for i, head in enumerate(rows[0]["heads"] if rows else []):
+                slim = dehydrate_prompts(head)
+                if head and slim[0] is not head[0]:
+                    changes[f"sessions.{i}.messages.0"] = slim[0]
+            if changes:
+                users_chats().update_one({"_id": ref["_id"]}, {"$set": changes})
+        state.checkpoint(batch[-1]["_id"])
+
+
+def m0005_build_search_index(state: MigrationState) -> None:
+    """Isi message_search untuk sesi lama (lihat search_index.py). Sesi arsip diindeks saat dipulihkan."""
+    while True:
+        query = {"_id": {"$gt": state.value}} if state.value is not None else {}
+        batch = list(users_chats().find(query, {"_id": 1, "name": 1}).sort("_id", 1).limit(BATCH_SIZE))
+        if not batch:
+            return
+        for ref in batch:
+            if not ref.get("name"):
+                continue
+            # Hanya role & content yang dibutuhkan; posisi pesan (seq) tetap terjaga oleh $map.
+            rows = users_chats().aggregate([
+                {"$match": {"_id": ref["_id"]}},
+                {"$unwind": "$sessions"},
+                {"$project": {"_id": 0, "session_id": "$sessions.session_id", "messages": {"$map": {
+                    "input": {"$ifNull": ["$sessions.messages", []]},
+                    "in": {"role": "$$this.role", "content": "$$this.content"},
+                }}}},
+            ])
+            for row in rows:
+                index_session(ref["name"], row["session_id"], row["messages"])
+        state.checkpoint(batch[-1]["_id"])
+
+
+def m0006_rekey_userid_names(state: MigrationState) -> None:
+    """
+    /api/chat dulu menyimpan percakapan dengan kunci `user` mentah ('userid@nama'), sedangkan
+    /api/sessions & /api/session/messages membaca dengan kunci 'nama'. Pindahkan dokumen
+    berkunci 'userid@nama' ke kunci 'nama' (digabung jika dokumen 'nama' sudah ada), termasuk
+    ringkasan sesi & index pencarian. Rollup analytics lama tidak diubah.
+    """
+    while True:
+        query: dict = {"name": {"$regex": "@"}}
+        if state.value is not None:
+            query["_id"] = {"$gt": state.value}
+        batch = list(users_chats().find(query, {"_id": 1, "name": 1}).sort("_id", 1).limit(BATCH_SIZE))
+        if not batch:
+            return
+        for ref in batch:
+            old = ref["name"]
+            new = old.split("@", 1)[1].strip()
+            if not new:
+                continue
+            # Koleksi turunan dulu: jika terputus, dokumen sumber masih ada dan diproses ulang.
+            chat_sessions().update_many({"name": old}, {"$set": {"name": new}})
+            message_search().update_many({"name": old}, {"$set": {"name": new}})
+            try:
+                if users_chats().find_one({"name": new}, {"_id": 1}) is None:
+                    users_chats().update_one({"_id": ref["_id"]}, {"$set": {"name": new}})
+                    continue
+            except DuplicateKeyError:
+                pass  # dokumen 'nama' baru saja dibuat oleh /api/chat: gabungkan
+            src = users_chats().find_one({"_id": ref["_id"]}, {"sessions": 1}) or {}
+            have = {s.get("session_id") for s in (users_chats().find_one(
+                {"name": new}, {"_id": 0, "sessions.session_id": 1}) or {}).get("sessions") or []}
+            extra = [s for s in src.get("sessions") or [] if s.get("session_id") not in have]
+            if extra:
+                # Sesi pindahan mungkin belum punya ringkasan: backfill ulang saat daftar sesi dibuka.
+                users_chats().update_one({"name": new}, {"$push": {"sessions": {"$each": extra}},
+                                                         "$unset": {SUMMARIES_BACKFILLED: ""}})
+            users_chats().delete_one({"_id": ref["_id"]})
+        state.checkpoint(batch[-1]["_id"])
+
+
+MIGRATIONS: List[Tuple[str, Callable[[MigrationState], None]]] = [
+    ("0001_dedupe_users_chats", m0001_dedupe_users_chats),
+    ("0002_backfill_session_summaries", m0002_backfill_session_summaries),
+    ("0003_offload_tool_payloads", m0003_offload_tool_payloads),
+    ("0004_system_prompt_refs", m0004_system_prompt_refs),
+    ("0005_build_search_index", m0005_build_search_index),
+    ("0006_rekey_userid_names", m0006_rekey_userid_names),
+]
+
+
+# ======================================================================
+# RUNNER
+# ======================================================================
+def pending() -> List[str]:
+    done = {d["_id"] for d in schema_migrations().find({"status": "done"}, {"_id": 1})}
+    return [v for v, _ in MIGRATIONS if v not in done]
+
+
+def run_pending(log: Callable[[str], None] = print) -> List[str]:
+    applied = []
+    todo = set(pending())
+    for version, fn in MIGRATIONS:
+        if version not in todo:
+            continue
+        now = datetime.now(timezone.utc)
+        schema_migrations().update_one(
+            {"_id": version},
+            {"$set": {"status": "running", "updated_at": now}, "$setOnInsert": {"started_at": now}},
+            upsert=True,
+        )
+        state = MigrationState(version)
+        log(f"-> {version}" + (f" (lanjut dari checkpoint {state.value})" if state.value is not None else ""))
+        fn(state)
+        schema_migrations().update_one(
+            {"_id": version},
+            {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc)}},
+        )
+        applied.append(version)
+    return applied
@@ -0,0 +1,89 @@
+# prompt_registry.py
+# -*- coding: utf-8 -*-
+"""
+Registry system prompt berversi.
+
+Sesi tidak lagi menyimpan salinan penuh system prompt di messages[0]. Yang disimpan
+hanya referensi versi:
+    {"role": "system", "prompt_ref": "default@3f2a9c1b7e44"}
+Teks aslinya ada di koleksi `prompts` (satu dokumen per versi) dan di-cache di memori
+proses. Id versi = "<key>@<12 hex sha256 teks>", jadi mengubah prompt otomatis membuat
+versi baru tanpa perlu menulis ulang riwayat sesi lama.
+"""
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+import clients
+
+_cache: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def prompts():
+    return clients.mongo().chatbot_db.prompts
+
+
+def version_id(text: str, key: str = "default") -> str:
+    return f"{key}@{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}"
+
+
+def register(text: str, key: str = "default") -> str:
+    """Daftarkan teks prompt (idempoten) dan kembalikan id versinya."""
+    vid = version_id(text, key)
+    if vid in _cache:
+        return vid
+    prompts().update_one(
+        {"_id": vid},
+        {"$setOnInsert": {"key": key, "text": text, "created_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    with _lock:
+        _cache[vid] = text
+    return vid
+
+
+def system_message(text: str, key: str = "default") -> dict:
+    """Pesan system untuk disimpan di sesi (hanya referensi versi)."""
+    return {"role": "system", "prompt_ref": register(text, key)}
+
+
+def get_texts(ids: Iterable[str]) -> Dict[str, str]:
+    ids = set(ids)
+    missing = [i for i in ids if i not in _cache]
+    if missing:
+        found = {d["_id"]: d["text"] for d in prompts().find({"_id": {"$in": missing}}, {"text": 1})}
+        with _lock:
+            _cache.update(found)
+    return {i: _cache[i] for i in ids if i in _cache}
+
+
+def hydrate_prompts(messages: List[dict]) -> List[dict]:
+    """Kembalikan salinan `messages` dengan `prompt_ref` diganti teks prompt (untuk konteks LLM)."""
+    refs = [m["prompt_ref"] for m in messages or [] if m.get("prompt_ref")]
+    if not refs:
+        return list(messages or [])
+    texts = get_texts(refs)
+    out = []
+    for m in messages:
+        if m.get("prompt_ref"):
+            full = {k: v for k, v in m.items() if k != "prompt_ref"}
+            full["content"] = texts.get(m["prompt_ref"], "")
+            out.append(full)
+        else:
+            out.append(m)
+    return out
+
+
+def dehydrate_prompts(messages: List[dict], key: str = "default") -> List[dict]:
+    """Kembalikan salinan `messages` dengan pesan system berteks penuh diganti referensi versi."""
+    out = []
+    for m in messages or []:
+        if m.get("role") == "system" and not m.get("prompt_ref") and isinstance(m.get("content"), str) and m["content"]:
+            slim = {k: v for k, v in m.items() if k != "content"}
+            slim["prompt_ref"] = register(m["content"], key)
+            out.append(slim)
+        else:
+            out.append(m)
+    return out
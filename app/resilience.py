@@ -0,0 +1,232 @@
+# resilience.py
+# -*- coding: utf-8 -*-
+"""
+Lapisan ketahanan untuk panggilan HTTP ke Laravel admin API (dipakai api_client.py).
+
+  - Timeout per percobaan dipisah connect/read dan dibatasi sisa "deadline" total per
+    panggilan (API_DEADLINE_S), jadi satu giliran chat tidak pernah menunggu 25 s x N.
+  - Retry terbatas (API_MAX_RETRIES) dengan backoff eksponensial + full jitter, hanya untuk
+    method idempoten (GET/PUT/DELETE/HEAD) dan hanya untuk error jaringan, 429 dan 502/503/504.
+  - Circuit breaker per endpoint (method + path dengan id dinormalisasi). Setelah
+    BREAKER_FAILURE_THRESHOLD kegagalan beruntun (error jaringan / 5xx), breaker terbuka
+    selama BREAKER_OPEN_S: panggilan langsung ditolak dengan CircuitOpenError tanpa
+    menyentuh jaringan. Setelah itu satu panggilan percobaan (half-open) menentukan apakah
+    breaker menutup lagi. Status 4xx dianggap backend sehat.
+
+State breaker ada di memori tiap worker; ringkasannya tersedia lewat breaker_stats()
+dan /api/metrics. request_async() (dipakai api_client_async) memakai breaker, retry dan
+deadline yang sama; error httpx diterjemahkan ke exception requests supaya pemanggil
+cukup menangani satu jenis error.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+
+API_CONNECT_TIMEOUT_S = float(os.getenv("API_CONNECT_TIMEOUT_S", "3.05"))
+API_READ_TIMEOUT_S = float(os.getenv("API_READ_TIMEOUT_S", "15"))
+API_DEADLINE_S = float(os.getenv("API_DEADLINE_S", "25"))
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "2"))
+API_BACKOFF_BASE_S = float(os.getenv("API_BACKOFF_BASE_S", "0.2"))
+API_BACKOFF_MAX_S = float(os.getenv("API_BACKOFF_MAX_S", "2"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_OPEN_S = float(os.getenv("BREAKER_OPEN_S", "30"))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Breaker endpoint sedang terbuka; panggilan ditolak tanpa menyentuh jaringan."""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.counts = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < BREAKER_OPEN_S:
+                    self.counts["rejected"] += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self.probe_in_flight:
+                    self.counts["rejected"] += 1
+                    return False
+                self.probe_in_flight = True
+            self.counts["calls"] += 1
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.counts["failures"] += 1
+            self.consecutive_failures += 1
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+                if self.state != self.OPEN:
+                    self.counts["opened"] += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Percobaan selesai tanpa hasil (di-cancel / bug pemanggil): probe boleh diulang."""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            snap = {"state": self.state, "consecutive_failures": self.consecutive_failures, **self.counts}
+            if self.state == self.OPEN:
+                snap["retry_in_s"] = round(max(0.0, BREAKER_OPEN_S - (time.monotonic() - self.opened_at)), 1)
+            return snap
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    with _breakers_lock:
+        b = _breakers.get(endpoint)
+        if b is None:
+            b = _breakers[endpoint] = CircuitBreaker(endpoint)
+        return b
+
+
+def breaker_stats() -> Dict[str, Any]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def _backoff(attempt: int, resp: Optional[requests.Response]) -> float:
+    retry_after = (resp.headers.get("Retry-After") if resp is not None else None) or ""
+    if retry_after.strip().isdigit():
+        return min(float(retry_after), API_BACKOFF_MAX_S)
+    return random.uniform(0, min(API_BACKOFF_MAX_S, API_BACKOFF_BASE_S * (2 ** attempt)))
+
+
+def _plan(method: str, endpoint: str, retries: Optional[int], kw: Dict[str, Any]):
+    breaker = get_breaker(endpoint)
+    max_retries = (API_MAX_RETRIES if retries is None else retries) if method in IDEMPOTENT_METHODS else 0
+    read_timeout = kw.pop("timeout", None) or API_READ_TIMEOUT_S
+    if isinstance(read_timeout, tuple):
+        read_timeout = read_timeout[-1]
+    return breaker, max_retries, read_timeout, time.monotonic() + API_DEADLINE_S
+
+
+def request(session, method: str, url: str, endpoint: str,
+            retries: Optional[int] = None, **kw) -> requests.Response:
+    """
+    session.request(method, url, **kw) dengan deadline, retry (method idempoten) dan breaker.
+    `timeout` eksplisit dari pemanggil dipakai sebagai batas read per percobaan.
+    Melempar CircuitOpenError / exception requests jika semua percobaan gagal.
+    """
+    method = method.upper()
+    breaker, max_retries, read_timeout, deadline = _plan(method, endpoint, retries, kw)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker terbuka untuk {endpoint}; backend sedang tidak sehat.")
+        remaining = max(0.1, deadline - time.monotonic())
+        resp: Optional[requests.Response] = None
+        error: Optional[Exception] = None
+        try:
+            resp = session.request(method, url, timeout=(min(API_CONNECT_TIMEOUT_S, remaining),
+                                                         min(read_timeout, remaining)), **kw)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error = e
+            breaker.record_failure()
+        except BaseException:
+            # Error lain (InvalidURL, MissingSchema, kwargs salah, ...) adalah bug pemanggil, bukan
+            # tanda backend sakit: tidak dihitung gagal, cukup lepas probe HALF_OPEN-nya.
+            breaker.release_probe()
+            raise
+        else:
+            if resp.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if resp.status_code not in RETRY_STATUSES:
+                return resp
+        pause = _backoff(attempt, resp)
+        attempt += 1
+        if attempt > max_retries or time.monotonic() + pause >= deadline:
+            if resp is not None:
+                return resp
+            raise error
+        time.sleep(pause)
+
+
+def _as_requests_error(e: Exception) -> Exception:
+    import httpx
+    cls = (requests.exceptions.Timeout if isinstance(e, httpx.TimeoutException)
+           else requests.exceptions.ConnectionError)
+    err = cls(str(e) or e.__class__.__name__)
+    err.__cause__ = e
+    return err
+
+
+async def request_async(client, method: str, url: str, endpoint: str,
+                        retries: Optional[int] = None, **kw):
+    """
+    Versi asyncio dari request() untuk httpx.AsyncClient: breaker, retry & deadline sama.
+    Error transport httpx dilempar ulang sebagai requests.Timeout / requests.ConnectionError.
+    """
+    import httpx
+    method = method.upper()
+    breaker, max_retries, read_timeout, deadline = _plan(method, endpoint, retries, kw)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit breaker terbuka untuk {endpoint}; backend sedang tidak sehat.")
+        remaining = max(0.1, deadline - time.monotonic())
+        timeout = httpx.Timeout(min(read_timeout, remaining), connect=min(API_CONNECT_TIMEOUT_S, remaining))
+        resp = None
+        error: Optional[Exception] = None
+        try:
+            resp = await client.request(method, url, timeout=timeout, **kw)
+        except httpx.UnsupportedProtocol:
+            breaker.release_probe()  # URL tanpa/salah skema: bug pemanggil
+            raise
+        except httpx.TransportError as e:
+            error = _as_requests_error(e)
+            breaker.record_failure()
+        except BaseException:
+            breaker.release_probe()  # bug pemanggil / CancelledError
+            raise
+        else:
+            if resp.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if resp.status_code not in RETRY_STATUSES:
+                return resp
+        pause = _backoff(attempt, resp)
+        attempt += 1
+        if attempt > max_retries or time.monotonic() + pause >= deadline:
+            if resp is not None:
+                return resp
+            raise error
+        await asyncio.sleep(pause)
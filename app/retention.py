@@ -0,0 +1,157 @@
+# retention.py
+# -*- coding: utf-8 -*-
+"""
+Retensi sesi chat: sesi yang tidak aktif lebih dari N hari dipindah ke arsip dingin.
+
+Arsip berupa file JSONL terkompresi di disk lokal (ARCHIVE_DIR/sessions-YYYYMMDD.jsonl.gz).
+Setiap sesi ditulis sebagai satu gzip member terpisah, sehingga satu sesi bisa dibaca
+kembali hanya dengan membaca rentang byte (offset, length) miliknya.
+
+Di Mongo sesi ditinggalkan sebagai tombstone: elemen `sessions` tetap ada (session_id,
+title, created_at) tanpa `messages`, ditambah field `archived` berisi lokasi arsip.
+Saat sesi dibuka lagi, restore_session() memulihkannya secara transparan.
+
+Job archive_inactive() aman diulang/dilanjutkan: kriteria pemilihannya adalah
+"belum diarsip & tidak aktif", jadi sesi yang sudah ditombstone otomatis terlewati.
+Urutan tulis (arsip + fsync dulu, baru tombstone) memastikan tidak ada data hilang bila
+job terputus di tengah jalan; paling buruk satu sesi terarsip dua kali di file. Tombstone
+dipasang dengan syarat rev sesi belum berubah sejak dibaca, jadi pesan yang masuk selama
+pengarsipan tidak ikut hilang.
+"""
+import os
+import gzip
+import fcntl
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+
+import write_behind
+from chat_store import users_chats, chat_sessions, DEFAULT_SESSION_TITLE
+
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "90"))
+# Sesi "Percakapan Baru" yang hanya berisi sapaan diarsip jauh lebih cepat.
+RETENTION_EMPTY_DAYS = int(os.getenv("RETENTION_EMPTY_DAYS", "7"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./data/archive")
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+
+
+def _append_member(record: Dict[str, Any]) -> Dict[str, Any]:
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    fname = f"sessions-{datetime.now(timezone.utc):%Y%m%d}.jsonl.gz"
+    path = os.path.join(ARCHIVE_DIR, fname)
+    member = gzip.compress((json_util.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+    with open(path, "ab") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(member)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    return {"file": fname, "offset": offset, "length": len(member)}
+
+
+def _read_member(ref: Dict[str, Any]) -> Dict[str, Any]:
+    with open(os.path.join(ARCHIVE_DIR, ref["file"]), "rb") as f:
+        f.seek(ref["offset"])
+        raw = f.read(ref["length"])
+    return json_util.loads(gzip.decompress(raw).decode("utf-8"))
+
+
+def read_archived(sess: dict) -> List[dict]:
+    """Pesan sesi tombstone langsung dari arsip, tanpa memulihkannya ke Mongo (dipakai export)."""
+    ref = sess.get("archived")
+    if not ref:
+        return sess.get("messages") or []
+    return _read_member(ref).get("messages") or []
+
+
+def archive_session(name: str, session_id: str) -> bool:
+    """Arsipkan satu sesi. False jika sesi tidak ada / sudah diarsip / masih di WAL write-behind / berubah saat diarsip."""
+    if write_behind.pending_session(name, session_id):
+        return False
+    doc = users_chats().find_one(
+        {"name": name, "sessions": {"$elemMatch": {"session_id": session_id, "archived": {"$exists": False}}}},
+        {"sessions.$": 1},
+    )
+    if not doc or not doc.get("sessions"):
+        return False
+    sess = doc["sessions"][0]
+    ref = _append_member({"name": name, **sess})
+    ref["archived_at"] = datetime.now(timezone.utc)
+    res = users_chats().update_one(
+        # Tombstone hanya jika sesi tidak berubah sejak dibaca (rev sama); giliran chat yang
+        # masuk di antara find_one dan _append_member tidak boleh ikut terhapus.
+        {"name": name, "sessions": {"$elemMatch": {"session_id": session_id, "rev": sess.get("rev"),
+                                                   "archived": {"$exists": False}}}},
+        # Naikkan rev supaya cache sesi di worker lain tidak menulis di atas tombstone.
+        {"$set": {"sessions.$.archived": ref}, "$unset": {"sessions.$.messages": ""},
+         "$inc": {"sessions.$.rev": 1}},
+    )
+    if res.matched_count == 0:
+        # Member arsip yang sudah tertulis dibiarkan yatim (tidak dirujuk tombstone mana pun);
+        # sesi diarsip ulang pada putaran berikutnya bila tetap tidak aktif.
+        return False
+    chat_sessions().update_one({"name": name, "session_id": session_id}, {"$set": {"archived": True}})
+    return True
+
+
+def archive_inactive(days: int = RETENTION_DAYS, empty_days: int = RETENTION_EMPTY_DAYS,
+                     limit: Optional[int] = None, log=print) -> int:
+    """Arsipkan semua sesi yang tidak aktif. Mengembalikan jumlah sesi yang diarsip."""
+    now = datetime.now(timezone.utc)
+    query = {
+        "archived": {"$ne": True},
+        "$or": [
+            {"last_activity_at": {"$lt": now - timedelta(days=days)}},
+            {"last_activity_at": {"$lt": now - timedelta(days=empty_days)},
+             "title": DEFAULT_SESSION_TITLE, "messages_count": {"$lte": 2}},
+        ],
+    }
+    done = 0
+    skipped = set()
+    while limit is None or done < limit:
+        batch_query = dict(query)
+        if skipped:
+            batch_query["session_id"] = {"$nin": list(skipped)}
+        batch = list(chat_sessions().find(batch_query, {"_id": 0, "name": 1, "session_id": 1})
+                     .sort("last_activity_at", 1).limit(ARCHIVE_BATCH_SIZE))
+        if not batch:
+            break
+        for row in batch:
+            if limit is not None and done >= limit:
+                break
+            if archive_session(row["name"], row["session_id"]):
+                done += 1
+            else:
+                skipped.add(row["session_id"])
+        log(f"diarsip: {done}")
+    return done
+
+
+def restore_session(name: str, sess: dict) -> dict:
+    """
+    Pulihkan sesi tombstone dari arsip ke Mongo lalu kembalikan sesi lengkap.
+    Sesi yang tidak diarsip dikembalikan apa adanya.
+    """
+    ref = sess.get("archived")
+    if not ref:
+        return sess
+    record = _read_member(ref)
+    messages = record.get("messages") or []
+    users_chats().update_one(
+        {"name": name, "sessions.session_id": sess["session_id"]},
+        {"$set": {"sessions.$.messages": messages}, "$unset": {"sessions.$.archived": ""},
+         "$inc": {"sessions.$.rev": 1}},
+    )
+    chat_sessions().update_one(
+        {"name": name, "session_id": sess["session_id"]},
+        {"$set": {"archived": False, "last_activity_at": datetime.now(timezone.utc)}},
+    )
+    restored = {k: v for k, v in sess.items() if k != "archived"}
+    restored["messages"] = messages
+    restored["rev"] = (sess.get("rev") or 0) + 1
+    return restored
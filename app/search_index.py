@@ -0,0 +1,176 @@
+# search_index.py
+# -*- coding: utf-8 -*-
+"""
+Pencarian teks penuh di riwayat chat milik satu user.
+
+Setiap pesan user/assistant yang berisi teks disalin ke koleksi `message_search`
+(satu dokumen per pesan: name, session_id, seq, role, text). Koleksi ini punya text index
+gabungan {name, text}, jadi satu pencarian hanya menyentuh entri milik user itu saja,
+berapa pun jumlah sesinya. `seq` = indeks pesan di sesi (sama dengan /api/session/messages),
+sehingga klien bisa langsung melompat ke pesan yang cocok.
+
+Index dirawat saat write (chat_store memanggil index_session setelah menyimpan sesi).
+Karena pesan sesi hanya pernah ditambah di ujung, cukup pesan baru yang diindeks:
+jumlah pesan yang sudah terindeks dicatat di `chat_sessions.search_indexed`. Penanda itu
+ikut dikembalikan oleh write ringkasan sesi di chat_store, jadi jalur chat tidak membacanya lagi.
+Upsert per (name, session_id, seq) membuat proses ini idempoten, jadi aman diulang
+setelah gagal. Entri sesi yang diarsip tetap ada, sehingga sesi lama tetap bisa dicari.
+"""
+import re
+import json
+import base64
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+import clients
+
+SEARCH_PAGE_DEFAULT = 20
+SEARCH_PAGE_MAX = 50
+SNIPPET_RADIUS = 60
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def message_search():
+    return clients.mongo().chatbot_db.message_search
+
+
+def _summaries():
+    return clients.mongo().chatbot_db.chat_sessions
+
+
+def _text_of(m: dict) -> Optional[str]:
+    if m.get("role") not in ("user", "assistant"):
+        return None
+    content = m.get("content")
+    if not isinstance(content, str) or not content.strip():
+        return None
+    return content
+
+
+# ======================================================================
+# PERAWATAN INDEX
+# ======================================================================
+def index_session(name: str, session_id: str, messages: List[dict], start: Optional[int] = None) -> int:
+    """
+    Indeks pesan sesi yang belum terindeks. Mengembalikan jumlah entri yang ditulis.
+    `start` = nilai search_indexed yang sudah diketahui pemanggil (mis. dari write ringkasan
+    sesi); jika None dibaca dari chat_sessions.
+    """
+    total = len(messages or [])
+    if start is None:
+        s = _summaries().find_one({"name": name, "session_id": session_id}, {"_id": 0, "search_indexed": 1})
+        start = (s or {}).get("search_indexed") or 0
+    if start >= total:
+        return 0
+    now = datetime.now(timezone.utc)
+    ops = []
+    for seq in range(start, total):
+        text = _text_of(messages[seq])
+        if text is None:
+            continue
+        ops.append(UpdateOne(
+            {"name": name, "session_id": session_id, "seq": seq},
+            {"$setOnInsert": {"role": messages[seq]["role"], "text": text, "at": now}},
+            upsert=True,
+        ))
+    if ops:
+        message_search().bulk_write(ops, ordered=False)
+    # $max: penanda tidak pernah mundur walau dua worker mengindeks sesi yang sama.
+    _summaries().update_one({"name": name, "session_id": session_id}, {"$max": {"search_indexed": total}})
+    return len(ops)
+
+
+def index_session_safe(name: str, session_id: str, messages: List[dict], start: Optional[int] = None) -> None:
+    """Seperti index_session, tapi gagal indeks tidak menggagalkan penyimpanan chat.
+    Pesan yang terlewat ikut diindeks pada write berikutnya (penanda belum maju)."""
+    try:
+        index_session(name, session_id, messages, start)
+    except Exception as e:
+        print(f"[search] gagal mengindeks sesi {session_id}: {e}")
+
+
+# ======================================================================
+# PENCARIAN
+# ======================================================================
+def _encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        return max(0, int(raw["o"]))
+    except Exception:
+        raise ValueError("Parameter 'cursor' tidak valid.")
+
+
+def _snippet(text: str, terms: List[str]) -> Dict[str, Any]:
+    """Potongan teks di sekitar kemunculan pertama salah satu term, plus posisi highlight."""
+    lower = text.lower()
+    hits = [(lower.find(t), t) for t in terms if t and lower.find(t) >= 0]
+    first = min(hits)[0] if hits else 0
+    lo = max(0, first - SNIPPET_RADIUS)
+    hi = min(len(text), first + SNIPPET_RADIUS * 2)
+    prefix = "…" if lo > 0 else ""
+    body = text[lo:hi].replace("\n", " ")
+    highlights = []
+    body_lower = body.lower()
+    for t in terms:
+        for m in re.finditer(re.escape(t), body_lower):
+            highlights.append([len(prefix) + m.start(), len(prefix) + m.end()])
+    return {
+        "snippet": prefix + body + ("…" if hi < len(text) else ""),
+        "offset": first,
+        "highlights": sorted(highlights),
+    }
+
+
+def search(name: str, q: str, limit: int = SEARCH_PAGE_DEFAULT,
+           cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Cari `q` di pesan milik `name`, urut skor relevansi ($text), lalu terbaru.
+    Mengembalikan (hasil, next_cursor). Sintaks $text berlaku: "frasa persis" dan -kata.
+    """
+    q = (q or "").strip()
+    if not q:
+        raise ValueError("Parameter 'q' wajib diisi.")
+    limit = max(1, min(int(limit or SEARCH_PAGE_DEFAULT), SEARCH_PAGE_MAX))
+    offset = _decode_cursor(cursor) if cursor else 0
+    rows = list(
+        message_search().find(
+            {"name": name, "$text": {"$search": q}},
+            {"_id": 0, "session_id": 1, "seq": 1, "role": 1, "text": 1, "at": 1,
+             "score": {"$meta": "textScore"}},
+        )
+        .sort([("score", {"$meta": "textScore"}), ("at", -1)])
+        .skip(offset)
+        .limit(limit + 1)
+    )
+    next_cursor = _encode_cursor(offset + limit) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    sids = list({r["session_id"] for r in rows})
+    meta = {
+        s["session_id"]: s
+        for s in _summaries().find({"name": name, "session_id": {"$in": sids}},
+                                   {"_id": 0, "session_id": 1, "title": 1, "archived": 1})
+    } if sids else {}
+    # Term yang dinegasikan (-kata) tidak mungkin muncul di hasil, jadi tidak di-highlight.
+    terms = [t.lower() for t in _TERM_RE.findall(re.sub(r"(^|\s)-\S+", " ", q))]
+
+    results = []
+    for r in rows:
+        s = meta.get(r["session_id"]) or {}
+        results.append({
+            "session_id": r["session_id"],
+            "title": s.get("title"),
+            "archived": bool(s.get("archived")),
+            "seq": r["seq"],
+            "role": r["role"],
+            "score": round(r.get("score") or 0.0, 4),
+            **_snippet(r["text"], terms),
+        })
+    return results, next_cursor
@@ -0,0 +1,97 @@
+# session_cache.py
+# -*- coding: utf-8 -*-
+"""
+Cache LRU sesi aktif di memori tiap worker (write-through).
+
+Setiap giliran chat menulis pesan ke Mongo lalu menaruh hasilnya di cache bersama `rev`
+(nomor versi sesi yang naik di setiap write). Giliran berikutnya di worker yang sama
+membaca dari cache tanpa menyentuh Mongo. Perubahan dari worker lain terdeteksi saat
+menulis: update memakai filter `rev` yang diharapkan (compare-and-set); jika tidak cocok,
+chat_store.commit_session_messages() memuat ulang sesi dari Mongo dan menggabungkan
+giliran baru di atasnya.
+
+Batas memori & jumlah entri diatur lewat SESSION_CACHE_MAX_BYTES / SESSION_CACHE_MAX_ENTRIES;
+statistik (hit, miss, eviction, konflik) tersedia lewat stats() dan /api/metrics.
+"""
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE_ENABLED", "true").lower() == "true"
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "2000"))
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+_bytes = 0
+_stats = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0, "conflicts": 0, "invalidations": 0}
+
+
+def _size_of(messages: List[dict]) -> int:
+    return len(json.dumps(messages, ensure_ascii=False, default=str))
+
+
+def get(name: str, session_id: str) -> Optional[Dict[str, Any]]:
+    """Kembalikan {"messages": <salinan list>, "rev": int|None} atau None."""
+    if not SESSION_CACHE_ENABLED:
+        return None
+    with _lock:
+        e = _entries.get((name, session_id))
+        if e is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end((name, session_id))
+        _stats["hits"] += 1
+        return {"messages": list(e["messages"]), "rev": e["rev"]}
+
+
+def put(name: str, session_id: str, messages: List[dict], rev: Optional[int]) -> None:
+    global _bytes
+    if not SESSION_CACHE_ENABLED:
+        return
+    size = _size_of(messages)
+    if size > SESSION_CACHE_MAX_BYTES:
+        invalidate(name, session_id)
+        return
+    key = (name, session_id)
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _bytes -= old["bytes"]
+        _entries[key] = {"messages": list(messages), "rev": rev, "bytes": size}
+        _bytes += size
+        _stats["puts"] += 1
+        while _entries and (len(_entries) > SESSION_CACHE_MAX_ENTRIES or _bytes > SESSION_CACHE_MAX_BYTES):
+            _, ev = _entries.popitem(last=False)
+            _bytes -= ev["bytes"]
+            _stats["evictions"] += 1
+
+
+def invalidate(name: str, session_id: str) -> None:
+    global _bytes
+    with _lock:
+        old = _entries.pop((name, session_id), None)
+        if old is not None:
+            _bytes -= old["bytes"]
+            _stats["invalidations"] += 1
+
+
+def record_conflict() -> None:
+    with _lock:
+        _stats["conflicts"] += 1
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "enabled": SESSION_CACHE_ENABLED,
+            "entries": len(_entries),
+            "bytes": _bytes,
+            "max_entries": SESSION_CACHE_MAX_ENTRIES,
+            "max_bytes": SESSION_CACHE_MAX_BYTES,
+            "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else None,
+        }
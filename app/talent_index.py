@@ -0,0 +1,385 @@
+# talent_index.py
+# -*- coding: utf-8 -*-
+"""
+Index kata kunci (inverted index + skor BM25) atas talent pool, di memori tiap worker.
+
+Pelengkap Chroma (semantik): query persis seperti "Laravel", "ITB", "QA" dicocokkan per
+token atas name, position, summary, skills dan educations. Token tidak di-stem dan tidak
+ada stopword, jadi singkatan pendek tetap bisa dicari.
+
+Alur data:
+  - upsert_talents(): dipanggil dari POST /api/feeder/talents dan impor massal. Talent
+    ditulis ke koleksi Mongo `talent_search` (sumber bersama semua worker) dan langsung
+    diterapkan ke index lokal worker ini.
+  - remove_talents(): dipanggil setelah talent dihapus (tool delete_talent). Dokumen di
+    `talent_search` ditandai `deleted` (tombstone) sehingga ikut tersebar ke worker lain
+    lewat watermark yang sama, lalu dibuang dari index lokal.
+  - Worker lain menarik dokumen yang berubah sejak watermark-nya, paling sering sekali
+    per TALENT_INDEX_SYNC_S (saat search).
+  - Snapshot index (pickle) disimpan di TALENT_INDEX_PATH oleh satu worker (flock) paling
+    sering sekali per TALENT_INDEX_SNAPSHOT_S. Worker baru memuat snapshot lalu hanya
+    menarik selisihnya dari Mongo, tanpa membangun ulang dari nol.
+  - `python manage.py talents` mengisi index dari admin API (bootstrap / rekonsiliasi):
+    talent yang tidak lagi dikembalikan admin API (dihapus di luar chatbot) ikut dibuang.
+
+Search: skor BM25 per term. Posting list pendek dihitung penuh. Untuk term yang sangat umum
+(> TALENT_INDEX_EXHAUSTIVE_MAX dokumen) hanya TALENT_INDEX_EXHAUSTIVE_MAX posting dengan
+impact tertinggi yang dipakai (impact-ordered, early termination): kontribusinya kecil
+karena idf rendah, dan latensi tetap beberapa ms pada 100k talent.
+"""
+import os
+import re
+import sys
+import math
+import time
+import fcntl
+import heapq
+import pickle
+import threading
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+import clients
+
+TALENT_INDEX_PATH = os.getenv("TALENT_INDEX_PATH", "./data/talent_index.pkl")
+TALENT_INDEX_SYNC_S = float(os.getenv("TALENT_INDEX_SYNC_S", "10"))
+TALENT_INDEX_SNAPSHOT_S = float(os.getenv("TALENT_INDEX_SNAPSHOT_S", "300"))
+TALENT_INDEX_EXHAUSTIVE_MAX = int(os.getenv("TALENT_INDEX_EXHAUSTIVE_MAX", "5000"))
+SEARCH_LIMIT_DEFAULT = 10
+SEARCH_LIMIT_MAX = 50
+SNAPSHOT_VERSION = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Bobot field = berapa kali token field itu dihitung (BM25F sederhana).
+FIELD_WEIGHTS = (("name", 2), ("position", 2), ("skills", 2), ("summary", 1), ("educations", 1))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_lock = threading.RLock()
+_state: Dict[str, Any] = {}
+_loaded = False
+_next_sync = 0.0
+_last_snapshot = 0.0
+_dirty_since_snapshot = False
+_stats = {"searches": 0, "syncs": 0, "snapshots": 0, "upserts": 0, "removals": 0}
+
+
+def talent_search():
+    return clients.mongo().chatbot_db.talent_search
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {
+        "version": SNAPSHOT_VERSION,
+        "watermark": None,           # updated_at terbaru yang sudah diterapkan
+        "docs": {},                  # id -> (name, position, tuple(term))
+        "postings": {},              # term -> {id: tf}
+        "doclen": {},                # id -> panjang dokumen (token berbobot)
+        "total_len": 0,
+        "avgdl": 1.0,                # avgdl saat norm dihitung (dibekukan, lihat _maybe_renorm)
+        "norm": {},                  # id -> k1 * (1 - b + b * dl / avgdl)
+        "impacts": {},               # term -> [(impact, id)] urut menurun; cache, dibuang saat term berubah
+    }
+
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text or "")]
+
+
+def _text(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, dict):
+        return " ".join(_text(x) for x in v.values())
+    if isinstance(v, (list, tuple)):
+        return " ".join(_text(x) for x in v)
+    return str(v)
+
+
+def _doc_fields(item: Dict[str, Any]) -> Dict[str, str]:
+    return {f: _text(item.get(f)) for f, _ in FIELD_WEIGHTS}
+
+
+# ======================================================================
+# MUTASI INDEX LOKAL (pemanggil memegang _lock)
+# ======================================================================
+def _remove(st: Dict[str, Any], tid: int) -> None:
+    doc = st["docs"].pop(tid, None)
+    if doc is None:
+        return
+    for term in doc[2]:
+        plist = st["postings"].get(term)
+        if plist is not None:
+            plist.pop(tid, None)
+            if not plist:
+                del st["postings"][term]
+            st["impacts"].pop(term, None)
+    st["total_len"] -= st["doclen"].pop(tid, 0)
+    st["norm"].pop(tid, None)
+
+
+def _apply(st: Dict[str, Any], tid: int, fields: Dict[str, str]) -> None:
+    _remove(st, tid)
+    tf: Dict[str, int] = {}
+    for field, weight in FIELD_WEIGHTS:
+        for term in tokenize(fields.get(field, "")):
+            tf[term] = tf.get(term, 0) + weight
+    dl = sum(tf.values())
+    for term, n in tf.items():
+        # sys.intern: term yang sama di banyak dokumen berbagi satu objek string.
+        st["postings"].setdefault(sys.intern(term), {})[tid] = n
+        st["impacts"].pop(term, None)
+    st["docs"][tid] = (fields.get("name", ""), fields.get("position", ""), tuple(tf))
+    st["doclen"][tid] = dl
+    st["total_len"] += dl
+    st["norm"][tid] = BM25_K1 * (1 - BM25_B + BM25_B * dl / st["avgdl"])
+
+
+def _maybe_renorm(st: Dict[str, Any]) -> None:
+    """Hitung ulang norm jika rata-rata panjang dokumen sudah bergeser > 10%."""
+    n = len(st["docs"])
+    if not n:
+        return
+    avgdl = st["total_len"] / n
+    if abs(avgdl - st["avgdl"]) / st["avgdl"] <= 0.1:
+        return
+    st["avgdl"] = avgdl
+    st["norm"] = {tid: BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl) for tid, dl in st["doclen"].items()}
+    st["impacts"] = {}
+
+
+# ======================================================================
+# SNAPSHOT & SINKRONISASI
+# ======================================================================
+def _load_snapshot() -> Dict[str, Any]:
+    try:
+        with open(TALENT_INDEX_PATH, "rb") as f:
+            st = pickle.load(f)
+        if st.get("version") == SNAPSHOT_VERSION:
+            st["impacts"] = {}
+            return st
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[talent-index] snapshot tidak bisa dibaca, bangun ulang dari Mongo: {e}")
+    return _empty_state()
+
+
+def _write_snapshot() -> None:
+    global _last_snapshot, _dirty_since_snapshot
+    os.makedirs(os.path.dirname(TALENT_INDEX_PATH) or ".", exist_ok=True)
+    fd = os.open(TALENT_INDEX_PATH + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # worker lain sedang menulis snapshot
+        tmp = f"{TALENT_INDEX_PATH}.tmp.{os.getpid()}"
+        with _lock:
+            data = pickle.dumps({**_state, "impacts": {}}, protocol=pickle.HIGHEST_PROTOCOL)
+            _last_snapshot = time.monotonic()
+            _dirty_since_snapshot = False
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, TALENT_INDEX_PATH)
+        _stats["snapshots"] += 1
+    finally:
+        os.close(fd)
+
+
+def _sync(force: bool = False) -> None:
+    """Muat snapshot (sekali per proses) lalu tarik perubahan dari Mongo sejak watermark."""
+    global _loaded, _next_sync, _dirty_since_snapshot
+    with _lock:
+        if not _loaded:
+            _state.clear()
+            _state.update(_load_snapshot())
+            _loaded = True
+            force = True
+        now = time.monotonic()
+        if not force and now < _next_sync:
+            return
+        _next_sync = now + TALENT_INDEX_SYNC_S
+        since = _state["watermark"]
+    # Tumpang tindih 5 detik: write worker lain yang commit sedikit terlambat tidak terlewat
+    # (menerapkan ulang dokumen yang sama aman).
+    q = {"updated_at": {"$gt": since - timedelta(seconds=5)}} if since else {}
+    changed = list(talent_search().find(q).sort("updated_at", 1))
+    if not changed:
+        return
+    with _lock:
+        for d in changed:
+            if d.get("deleted"):
+                _remove(_state, int(d["_id"]))
+            else:
+                _apply(_state, int(d["_id"]), d.get("fields") or {})
+        at = changed[-1]["updated_at"]
+        _state["watermark"] = at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+        _maybe_renorm(_state)
+        _dirty_since_snapshot = True
+        _stats["syncs"] += 1
+
+
+def _maybe_snapshot() -> None:
+    if _dirty_since_snapshot and time.monotonic() - _last_snapshot >= TALENT_INDEX_SNAPSHOT_S:
+        try:
+            _write_snapshot()
+        except OSError as e:
+            print(f"[talent-index] gagal menulis snapshot: {e}")
+
+
+def load() -> None:
+    """Siapkan index di worker ini (dipanggil di background saat post_fork)."""
+    try:
+        _sync(force=True)
+        _maybe_snapshot()
+    except Exception as e:
+        print(f"[talent-index] gagal memuat index: {e}")
+
+
+# ======================================================================
+# API PUBLIK
+# ======================================================================
+def upsert_talents(items: Iterable[Dict[str, Any]]) -> int:
+    """Simpan talent ke talent_search (dibagi semua worker) dan terapkan ke index lokal."""
+    now = datetime.now(timezone.utc)
+    ops, docs = [], []
+    for item in items or []:
+        if not isinstance(item, dict) or item.get("id") is None:
+            continue
+        tid, fields = int(item["id"]), _doc_fields(item)
+        ops.append(UpdateOne({"_id": tid}, {"$set": {"fields": fields, "updated_at": now},
+                                            "$unset": {"deleted": ""}}, upsert=True))
+        docs.append((tid, fields))
+    if not ops:
+        return 0
+    talent_search().bulk_write(ops, ordered=False)
+    global _dirty_since_snapshot
+    with _lock:
+        if _loaded:
+            _dirty_since_snapshot = True
+            for tid, fields in docs:
+                _apply(_state, tid, fields)
+            _maybe_renorm(_state)
+        _stats["upserts"] += len(docs)
+    return len(docs)
+
+
+def upsert_talents_safe(items: Iterable[Dict[str, Any]]) -> None:
+    try:
+        upsert_talents(items)
+    except Exception as e:
+        print(f"[talent-index] gagal menyimpan talent: {e}")
+
+
+def remove_talents(ids: Iterable[Any]) -> int:
+    """Buang talent dari index (semua worker, lewat tombstone di talent_search). Mengembalikan jumlah id."""
+    tids = []
+    for rid in ids or []:
+        try:
+            tids.append(int(rid))
+        except (TypeError, ValueError):
+            continue
+    if not tids:
+        return 0
+    now = datetime.now(timezone.utc)
+    talent_search().bulk_write([UpdateOne({"_id": tid}, {"$set": {"deleted": True, "updated_at": now},
+                                                         "$unset": {"fields": ""}})
+                                for tid in tids], ordered=False)
+    global _dirty_since_snapshot
+    with _lock:
+        if _loaded:
+            _dirty_since_snapshot = True
+            for tid in tids:
+                _remove(_state, tid)
+            _maybe_renorm(_state)
+        _stats["removals"] += len(tids)
+    return len(tids)
+
+
+def remove_talents_safe(ids: Iterable[Any]) -> None:
+    try:
+        remove_talents(ids)
+    except Exception as e:
+        print(f"[talent-index] gagal menghapus talent dari index: {e}")
+
+
+def _impacts(st: Dict[str, Any], term: str) -> List[Tuple[float, int]]:
+    cached = st["impacts"].get(term)
+    if cached is None:
+        norm = st["norm"]
+        cached = sorted(((tf * (BM25_K1 + 1) / (tf + norm[tid]), tid)
+                         for tid, tf in st["postings"][term].items()), reverse=True)
+        st["impacts"][term] = cached
+    return cached
+
+
+def search(query: str, limit: int = SEARCH_LIMIT_DEFAULT) -> Dict[str, Any]:
+    """Cari talent dengan BM25. Mengembalikan {"data": [{id, name, position, score}], "total_matched", "took_ms"}."""
+    started = time.perf_counter()
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        raise ValueError("Query pencarian kosong.")
+    limit = max(1, min(int(limit or SEARCH_LIMIT_DEFAULT), SEARCH_LIMIT_MAX))
+    try:
+        _sync()
+    except Exception as e:
+        print(f"[talent-index] sinkronisasi gagal, pakai index lokal: {e}")
+    with _lock:
+        st = _state
+        n = len(st["docs"])
+        acc: Dict[int, float] = {}
+        for term in terms:
+            plist = st["postings"].get(term)
+            if not plist:
+                continue
+            df = len(plist)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            if df <= TALENT_INDEX_EXHAUSTIVE_MAX:
+                norm = st["norm"]
+                for tid, tf in plist.items():
+                    acc[tid] = acc.get(tid, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm[tid])
+            else:
+                for impact, tid in _impacts(st, term)[:TALENT_INDEX_EXHAUSTIVE_MAX]:
+                    acc[tid] = acc.get(tid, 0.0) + idf * impact
+        top = heapq.nlargest(limit, acc.items(), key=itemgetter(1))
+        data = [{"id": tid, "name": st["docs"][tid][0], "position": st["docs"][tid][1], "score": round(score, 4)}
+                for tid, score in top]
+        _stats["searches"] += 1
+    _maybe_snapshot()
+    return {"data": data, "total_matched": len(acc), "took_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+def rebuild_from_api() -> int:
+    """
+    Isi ulang talent_search dari admin API (butuh token; lihat api_client.ensure_token).
+    Setelah scan penuh selesai, talent yang tidak lagi ada di admin API dibuang dari index.
+    """
+    import api_client
+    total, batch, seen = 0, [], set()
+    for item in api_client.iter_talent(per_page=api_client.API_PAGE_SIZE_MAX):
+        batch.append(item)
+        if item.get("id") is not None:
+            seen.add(int(item["id"]))
+        if len(batch) >= 500:
+            total += upsert_talents(batch)
+            batch = []
+    total += upsert_talents(batch)
+    stale = [d["_id"] for d in talent_search().find({"deleted": {"$ne": True}}, {"_id": 1})
+             if int(d["_id"]) not in seen]
+    for i in range(0, len(stale), 500):
+        remove_talents(stale[i:i + 500])
+    _sync(force=True)
+    _write_snapshot()
+    return total
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, "loaded": _loaded, "docs": len(_state.get("docs") or {}),
+                "terms": len(_state.get("postings") or {}),
+                "watermark": _state["watermark"].isoformat() if _state.get("watermark") else None}
@@ -0,0 +1,46 @@
+# conftest.py
+# -*- coding: utf-8 -*-
+"""
+Fixture bersama untuk test modul di app/. Jalankan dari direktori app/:
+
+    pip install -r requirements.txt -r requirements-dev.txt
+    python -m pytest -q
+
+MongoDB diganti mongomock (satu klien baru per test), jadi test tidak butuh server Mongo.
+"""
+import os
+import sys
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/")
+os.environ.setdefault("REMOTE_BASE_URL", "http://admin-api.test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock
+import pytest
+
+import clients
+import chat_store
+import session_cache
+
+
+@pytest.fixture(autouse=True)
+def mongo(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(clients, "mongo", lambda: client)
+    with session_cache._lock:
+        session_cache._entries.clear()
+        session_cache._bytes = 0
+    return client
+
+
+def _load_session_without_positional_projection(name, session_id):
+    # mongomock belum mendukung projection posisional ("sessions.$"): filter di Python.
+    doc = chat_store.users_chats().find_one({"name": name, "sessions.session_id": session_id}, {"_id": 0})
+    if not doc:
+        return None
+    return next((s for s in doc.get("sessions") or [] if s.get("session_id") == session_id), None)
+
+
+@pytest.fixture(autouse=True)
+def _positional_projection(monkeypatch):
+    monkeypatch.setattr(chat_store, "load_session", _load_session_without_positional_projection)
@@ -0,0 +1,84 @@
+# test_bulk_import.py
+# -*- coding: utf-8 -*-
+import io
+from datetime import timedelta
+
+import pytest
+
+import bulk_import
+
+
+def _job(job_id, status, age_s):
+    bulk_import.import_jobs().insert_one({
+        "_id": job_id, "status": status, "errors": [],
+        "updated_at": bulk_import._now() - timedelta(seconds=age_s),
+    })
+
+
+def test_orphaned_jobs_are_marked_failed_and_get_finished_at():
+    _job("mati", "running", bulk_import.IMPORT_STALE_S + 60)
+    _job("antre", "queued", bulk_import.IMPORT_STALE_S + 60)
+    _job("hidup", "running", 5)
+    _job("selesai", "done", bulk_import.IMPORT_STALE_S + 60)
+
+    assert bulk_import.fail_stale_jobs() == 2
+    jobs = {j["_id"]: j for j in bulk_import.import_jobs().find()}
+    for jid in ("mati", "antre"):
+        assert jobs[jid]["status"] == "failed"
+        assert jobs[jid]["finished_at"] is not None  # ikut TTL finished_at
+    assert jobs["hidup"]["status"] == "running"
+    assert jobs["selesai"]["status"] == "done"
+
+
+def test_job_status_reports_dead_job_as_failed():
+    _job("mati", "running", bulk_import.IMPORT_STALE_S + 60)
+    job = bulk_import.job_status("mati")
+    assert job["status"] == "failed"
+    assert "worker" in job["errors"][-1]["error"]
+
+
+def _rows(data, fmt):
+    return list(bulk_import.iter_rows(io.BytesIO(data), fmt))
+
+
+@pytest.mark.parametrize("filename, declared, expected", [
+    ("talent.csv", None, "csv"),
+    ("talent.ndjson", None, "jsonl"),
+    ("upload.bin", "JSON", "jsonl"),
+])
+def test_detect_format(filename, declared, expected):
+    assert bulk_import.detect_format(filename, declared) == expected
+
+
+def test_detect_format_rejects_unknown():
+    with pytest.raises(ValueError):
+        bulk_import.detect_format("talent.xlsx", None)
+
+
+def test_iter_rows_csv_flags_extra_columns_and_strips_bom():
+    rows = _rows("\ufeffname,position\nAni,QA\nBudi,Dev,lebih\n".encode("utf-8"), "csv")
+    assert rows[0] == (2, {"name": "Ani", "position": "QA"}, None)
+    assert rows[1][0] == 3 and rows[1][1] is None and rows[1][2]
+
+
+def test_iter_rows_jsonl_reports_bad_lines_and_skips_blank():
+    rows = _rows(b'{"name": "PT A"}\n\nbukan json\n[1, 2]\n', "jsonl")
+    assert rows[0] == (1, {"name": "PT A"}, None)
+    assert [(n, err is not None) for n, _, err in rows[1:]] == [(3, True), (4, True)]
+
+
+def test_validate_row_cleans_payload():
+    payload = bulk_import.validate_row("talent", {
+        "id": "9", " name ": " Ani ", "position": "QA", "birthdate": "2000-01-31",
+        "summary": "ok", "skills": "",
+    })
+    assert payload == {"name": "Ani", "position": "QA", "birthdate": "2000-01-31", "summary": "ok"}
+
+
+@pytest.mark.parametrize("row", [
+    {"name": "Ani", "position": "QA", "summary": "ok"},
+    {"name": "Ani", "position": "QA", "birthdate": "31-01-2000", "summary": "ok"},
+])
+def test_validate_row_rejects_missing_or_bad_fields(row):
+    with pytest.raises(ValueError):
+        bulk_import.validate_row("talent", row)
@@ -0,0 +1,52 @@
+# test_chat_store.py
+# -*- coding: utf-8 -*-
+from datetime import datetime, timezone
+
+import pytest
+
+import chat_store
+
+
+def _msg(i):
+    return {"role": "user", "content": f"pesan {i}"}
+
+
+def _contents(name="budi", sid="s1"):
+    return [m["content"] for m in chat_store.load_session(name, sid)["messages"]]
+
+
+@pytest.fixture
+def session():
+    chat_store.get_or_create_chat_doc("budi")
+    chat_store.append_session("budi", "s1", datetime.now(timezone.utc), [_msg(0)], "Judul")
+    return chat_store.load_session("budi", "s1")
+
+
+def test_commit_bumps_rev(session):
+    rev = chat_store.commit_session_messages("budi", "s1", [_msg(0), _msg(1)],
+                                             expected_rev=session.get("rev"), base_len=1)
+    assert rev == (session.get("rev") or 0) + 1
+    assert chat_store.load_session("budi", "s1")["rev"] == rev
+    assert _contents() == ["pesan 0", "pesan 1"]
+
+
+def test_conflict_appends_new_turn_onto_fresh_session(session):
+    # Dua worker membaca rev yang sama; worker A menang, worker B harus di-merge.
+    base = session.get("rev")
+    chat_store.commit_session_messages("budi", "s1", [_msg(0), _msg("A")], expected_rev=base, base_len=1)
+    rev = chat_store.commit_session_messages("budi", "s1", [_msg(0), _msg("B")], expected_rev=base, base_len=1)
+    assert rev == (base or 0) + 2
+    assert _contents() == ["pesan 0", "pesan A", "pesan B"]
+
+
+def test_missing_session_raises_lookup_error():
+    chat_store.get_or_create_chat_doc("budi")
+    with pytest.raises(LookupError):
+        chat_store.commit_session_messages("budi", "tidak-ada", [_msg(0)], expected_rev=3, base_len=0)
+
+
+def test_repeated_conflicts_raise_runtime_error(session, monkeypatch):
+    # Setiap pembacaan ulang melihat rev yang tidak pernah cocok dengan dokumen (worker lain terus menang).
+    monkeypatch.setattr(chat_store, "load_session", lambda name, sid: {"messages": [_msg(0)], "rev": 99})
+    with pytest.raises(RuntimeError):
+        chat_store.commit_session_messages("budi", "s1", [_msg(0), _msg(1)], expected_rev=7, base_len=1)
@@ -0,0 +1,64 @@
+# test_company_index.py
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import api_client
+import company_index
+
+
+@pytest.fixture(autouse=True)
+def fresh_worker(monkeypatch):
+    """Setiap test mulai sebagai worker baru (salinan lokal kosong)."""
+    monkeypatch.setattr(company_index, "_local", {})
+    monkeypatch.setattr(company_index, "_deleted", set())
+    monkeypatch.setattr(company_index, "_watermark", None)
+    monkeypatch.setattr(company_index, "_next_sync", 0.0)
+    monkeypatch.setattr(company_index, "_next_lease_check", 0.0)
+    monkeypatch.setattr(company_index, "COMPANY_INDEX_LOCAL_SYNC_S", 0)
+    submitted = []
+    monkeypatch.setattr(company_index.clients, "executor",
+                        lambda: type("E", (), {"submit": lambda self, fn, *a: submitted.append(a)})())
+    return submitted
+
+
+def _new_worker(monkeypatch):
+    monkeypatch.setattr(company_index, "_local", {})
+    monkeypatch.setattr(company_index, "_deleted", set())
+    monkeypatch.setattr(company_index, "_watermark", None)
+    monkeypatch.setattr(company_index, "_next_sync", 0.0)
+
+
+def test_lease_check_runs_off_request_path_at_most_once_per_interval(fresh_worker, monkeypatch):
+    taken = []
+    monkeypatch.setattr(company_index, "_take_refresh_lease", lambda: taken.append(1) or False)
+    for _ in range(3):
+        company_index.lookup([1], fetch_missing=False)
+    assert taken == []              # tidak ada find_one_and_update di jalur request
+    assert len(fresh_worker) == 1   # satu pengecekan lease di executor per interval
+
+
+def test_full_refresh_tombstones_companies_gone_from_api(monkeypatch):
+    old = datetime.now(timezone.utc) - timedelta(hours=2)
+    company_index.company_index().insert_many([
+        {"_id": 1, "name": "PT Satu", "summary": "", "updated_at": old},
+        {"_id": 2, "name": "PT Dua", "summary": "", "updated_at": old},
+    ])
+    monkeypatch.setattr(api_client, "iter_resource", lambda *a, **kw: iter([{"id": 1, "name": "PT Satu"}]))
+    company_index.refresh_from_api(full=True)
+
+    _new_worker(monkeypatch)
+    fetched = []
+    monkeypatch.setattr(api_client, "get_company_details", lambda ids: fetched.append(ids) or {"data": []})
+    found = company_index.lookup([1, 2])
+    assert list(found) == [1]
+    assert fetched == []            # id yang dihapus tidak diambil ulang dari admin API
+
+
+def test_upsert_after_delete_revives_company(monkeypatch):
+    company_index.upsert_companies([{"id": 3, "name": "PT Tiga"}], source="feeder")
+    company_index.remove_companies([3])
+    company_index.upsert_companies([{"id": 3, "name": "PT Tiga Baru"}], source="feeder")
+    _new_worker(monkeypatch)
+    assert company_index.lookup([3], fetch_missing=False)[3]["name"] == "PT Tiga Baru"
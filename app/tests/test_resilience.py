@@ -0,0 +1,41 @@
+import pytest
+import requests
+
+import resilience
+
+
+class _Session:
+    def __init__(self, exc):
+        self.exc = exc
+
+    def request(self, *a, **kw):
+        raise self.exc
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    return resilience.get_breaker("GET /t")
+
+
+def test_client_bug_tidak_dihitung_gagal(breaker):
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(requests.exceptions.MissingSchema):
+            resilience.request(_Session(requests.exceptions.MissingSchema("x")), "POST", "x", "GET /t")
+    assert breaker.state == breaker.CLOSED
+    assert breaker.counts["failures"] == 0
+
+
+def test_client_bug_melepas_probe_half_open(breaker):
+    breaker.state = breaker.HALF_OPEN
+    with pytest.raises(TypeError):
+        resilience.request(_Session(TypeError("kwarg salah")), "POST", "x", "GET /t")
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_error_jaringan_membuka_breaker(breaker):
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            resilience.request(_Session(requests.exceptions.ConnectionError("down")), "POST", "x", "GET /t")
+    assert breaker.state == breaker.OPEN
@@ -0,0 +1,110 @@
+# test_write_behind.py
+# -*- coding: utf-8 -*-
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+import chat_store
+import write_behind
+
+
+def _msg(i):
+    return {"role": "user", "content": f"pesan {i}"}
+
+
+@pytest.fixture
+def wal(tmp_path, monkeypatch):
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_DIR", str(tmp_path))
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(write_behind, "start", lambda: None)
+    return tmp_path
+
+
+def _turn(name, sid, new):
+    """Seperti /api/chat: baca snapshot WAL (atau Mongo), tambah giliran, enqueue."""
+    sess = write_behind.pending_session(name, sid) or chat_store.load_session(name, sid)
+    msgs = list(sess["messages"])
+    write_behind.enqueue("upsert", name, sid, msgs + new, base_rev=sess.get("rev"), base_len=len(msgs))
+
+
+def _stored(name, sid):
+    return [m["content"] for m in chat_store.load_session(name, sid)["messages"]]
+
+
+def _existing_session(name="budi", sid="s1"):
+    chat_store.get_or_create_chat_doc(name)
+    chat_store.append_session(name, sid, datetime.now(timezone.utc), [_msg(0), _msg(1)], "Judul")
+
+
+def test_stale_turn_is_merged_onto_pending_snapshot(wal):
+    _existing_session()
+    base = chat_store.load_session("budi", "s1")
+    # Dua worker membaca versi yang sama lalu masing-masing menambah satu giliran.
+    write_behind.enqueue("upsert", "budi", "s1", base["messages"] + [_msg("a")], base_rev=base["rev"], base_len=2)
+    write_behind.enqueue("upsert", "budi", "s1", base["messages"] + [_msg("b")], base_rev=base["rev"], base_len=2)
+    assert write_behind.flush_once() == 1
+    assert _stored("budi", "s1") == ["pesan 0", "pesan 1", "pesan a", "pesan b"]
+    assert write_behind.pending_session("budi", "s1") is None
+
+
+def test_turn_enqueued_during_flush_is_not_duplicated(wal, monkeypatch):
+    _existing_session()
+    _turn("budi", "s1", [_msg(2)])
+
+    real_commit = chat_store.commit_session_messages
+    interleaved = []
+
+    def commit_then_new_turn(*args, **kwargs):
+        rev = real_commit(*args, **kwargs)
+        if not interleaved:
+            interleaved.append(True)
+            _turn("budi", "s1", [_msg(3)])  # giliran baru masuk sebelum snapshot dihapus
+        return rev
+
+    monkeypatch.setattr(chat_store, "commit_session_messages", commit_then_new_turn)
+    assert write_behind.flush_once() == 1
+    assert write_behind.pending_session("budi", "s1") is not None
+    assert write_behind.flush_once() == 1
+    assert _stored("budi", "s1") == ["pesan 0", "pesan 1", "pesan 2", "pesan 3"]
+    assert write_behind.pending_session("budi", "s1") is None
+
+
+def test_turn_enqueued_while_new_session_is_flushed(wal, monkeypatch):
+    chat_store.get_or_create_chat_doc("budi")
+    write_behind.enqueue("append", "budi", "s2", [_msg(0), _msg(1)],
+                         created_at=datetime.now(timezone.utc), title="Baru")
+
+    real_apply = chat_store.apply_session_writes
+
+    def apply_then_new_turn(writes):
+        real_apply(writes)
+        _turn("budi", "s2", [_msg(2)])
+
+    monkeypatch.setattr(chat_store, "apply_session_writes", apply_then_new_turn)
+    assert write_behind.flush_once() == 1
+    monkeypatch.setattr(chat_store, "apply_session_writes", real_apply)
+    assert write_behind.flush_once() == 1
+    assert _stored("budi", "s2") == ["pesan 0", "pesan 1", "pesan 2"]
+
+
+def test_turn_from_another_worker_survives_flush(wal):
+    _existing_session()
+    _turn("budi", "s1", [_msg("wal")])
+    # Worker lain (tanpa WAL) menulis langsung ke Mongo sebelum flush.
+    sess = chat_store.load_session("budi", "s1")
+    chat_store.commit_session_messages("budi", "s1", sess["messages"] + [_msg("mongo")],
+                                       expected_rev=sess["rev"], base_len=len(sess["messages"]))
+    assert write_behind.flush_once() == 1
+    assert _stored("budi", "s1") == ["pesan 0", "pesan 1", "pesan mongo", "pesan wal"]
+
+
+def test_lock_files_are_bounded_by_stripes(wal):
+    chat_store.get_or_create_chat_doc("budi")
+    for i in range(300):
+        write_behind.enqueue("append", "budi", f"s{i}", [_msg(i)], created_at=datetime.now(timezone.utc), title="t")
+    while write_behind.flush_once():
+        pass
+    files = os.listdir(wal)
+    assert not [f for f in files if f.endswith(".json")]
+    assert len(files) <= 2 * write_behind.LOCK_STRIPES
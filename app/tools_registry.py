@@ -1,10 +1,18 @@
 #tools_registry.py
+import os
 import json
+import string
 import requests
+import contextvars
 from uuid import uuid4
 from datetime import datetime, timezone
 from typing import Optional
 
+from prompt_registry import system_message
+import clients
+import company_index
+from chat_store import ensure_chat_docs, append_sessions
+
 # ===== Helper injection (tanpa import app.py untuk hindari circular) =====
 _helpers = {
     "get_or_create_name_doc": None,
@@ -20,17 +28,18 @@ def set_helpers(get_or_create_name_doc, append_session, default_system_prompt):
 # ===== Impor fungsi-fungsi API client Anda =====
 from api_client import (
     # talent
-    list_talent, get_talent_detail, create_talent, update_talent, delete_talent,
+    list_talent, get_talent_detail, get_talent_details, create_talent, update_talent, delete_talent,
     # candidates
-    list_candidates, get_candidate_detail, create_candidate, update_candidate, delete_candidate,
+    list_candidates, get_candidate_detail, get_candidate_details, create_candidate, update_candidate, delete_candidate,
     # companies
-    list_companies, get_company_detail, create_company, update_company, delete_company,
+    list_companies, get_company_detail, get_company_details, create_company, update_company, delete_company,
     # company-properties
     list_company_properties, get_company_property_detail, create_company_property, update_company_property, delete_company_property,
     # job-openings
-    list_job_openings, get_job_opening_detail, create_job_opening, update_job_opening, delete_job_opening,
+    list_job_openings, list_job_openings_page, get_job_opening_detail, get_job_opening_details, create_job_opening, update_job_opening, delete_job_opening,
     # PEMBARUAN: Impor fungsi baru
     get_offer_details,
+    GET_MANY_MAX_IDS,
 )
 
 
@@ -82,7 +91,7 @@ def start_chat_with_talent(talent_id: str, talent_name: str, initial_message: st
         new_session_id = str(uuid4())
         created_at = datetime.now(timezone.utc)
         messages = [
-            {"role": "system", "content": _helpers["DEFAULT_SYSTEM_PROMPT"], "timestamp": created_at.isoformat()},
+            {**system_message(_helpers["DEFAULT_SYSTEM_PROMPT"]), "timestamp": created_at.isoformat()},
             {"role": "assistant", "content": initial_message, "timestamp": created_at.isoformat()},
         ]
 
@@ -109,7 +118,7 @@ def list_job_openings_enriched(page: int = 1, per_page: int = 10, search: Option
     Selalu mengembalikan struktur { "data": [ ... ], "pagination": ...? } agar konsisten.
     """
     try:
-        raw_openings = list_job_openings(page=page, per_page=per_page, search=search)
+        raw_openings = list_job_openings_page(page=page, per_page=per_page, search=search)
     except Exception as e:
         return {"error": f"Gagal memuat lowongan: {str(e)}"}
 
@@ -123,24 +132,15 @@ def list_job_openings_enriched(page: int = 1, per_page: int = 10, search: Option
     else:
         return {"error": "Format data lowongan tidak dikenali."}
 
-    company_cache = {}
+    # Nama perusahaan dari index lokal (company_index); hanya id yang belum dikenal yang diambil dari API.
+    try:
+        companies = company_index.lookup(job.get('company_id') for job in items if job.get('company_id'))
+    except Exception:
+        companies = {} # Biarkan nama default jika index tidak tersedia
+
     enriched_data = []
     for job in items:
-        company_id = job.get('company_id')
-        company_name = "Perusahaan tidak diketahui"
-        if company_id:
-            if company_id in company_cache:
-                company_name = company_cache[company_id]
-            else:
-                try:
-                    company_details = get_company_detail(company_id=company_id)
-                    if company_details and 'name' in company_details:
-                        company_name = company_details['name']
-                        company_cache[company_id] = company_name
-                except Exception:
-                    pass # Biarkan nama default jika gagal fetch
-        
-        job['company_name'] = company_name
+        job['company_name'] = company_index.company_name(companies, job.get('company_id'))
         enriched_data.append(job)
 
     # Menyesuaikan kembali format output jika ada pagination
@@ -172,6 +172,180 @@ def initiate_contact(talent_id: int, talent_name: str, job_opening_id: int, init
         return {"success": False, "error": f"Terjadi kesalahan tak terduga: {str(e)}"}
 
 
+# Tidak bisa melebihi GET_MANY_MAX_IDS: detail talent diambil dengan satu get_talent_details.
+BULK_OUTREACH_MAX_TALENTS = min(int(os.getenv("BULK_OUTREACH_MAX_TALENTS", "50")),
+                                GET_MANY_MAX_IDS)
+
+class _TemplateFields(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"  # placeholder tak dikenal dibiarkan apa adanya
+
+def _validate_template(template: str) -> None:
+    """Hanya placeholder nama polos ({name}); akses atribut/indeks, konversi & format spec ditolak."""
+    for _, field, spec, conversion in string.Formatter().parse(template):
+        if field is None:
+            continue
+        if not field.isidentifier() or spec or conversion:
+            raise ValueError("placeholder {" + field + (f"!{conversion}" if conversion else "")
+                             + (f":{spec}" if spec else "") + "} tidak didukung; gunakan {nama_field}.")
+
+def _render_message(template: str, fields: dict) -> str:
+    return template.format_map(_TemplateFields(fields))
+
+def bulk_initiate_contact(job_opening_id: int, talent_ids: list, message_template: str,
+                          personalization: Optional[dict] = None):
+    """
+    Versi massal initiate_contact: daftarkan banyak talent sebagai kandidat satu lowongan
+    lalu buat sesi chat masing-masing dengan pesan dari template.
+    Placeholder template: {name}, {first_name}, {position}, {job_title}, {company_name},
+    ditambah field per talent dari `personalization` ({"<talent_id>": {"field": "nilai"}}).
+    Pembuatan kandidat berjalan paralel (clients.executor, dibatasi API_FANOUT_MAX_WORKERS);
+    semua sesi disimpan dengan satu batch write Mongo. Hasil dilaporkan per talent.
+    """
+    try:
+        ids = list(dict.fromkeys(int(t) for t in talent_ids or []))
+    except (TypeError, ValueError):
+        return {"success": False, "error": "talent_ids harus berisi ID angka."}
+    if not ids:
+        return {"success": False, "error": "talent_ids tidak boleh kosong."}
+    if len(ids) > BULK_OUTREACH_MAX_TALENTS:
+        return {"success": False, "error": f"Maksimal {BULK_OUTREACH_MAX_TALENTS} talent per panggilan."}
+    try:
+        _validate_template(message_template or "")
+    except ValueError as e:
+        return {"success": False, "error": f"Template pesan tidak valid: {e}"}
+    personalization = {str(k): v for k, v in (personalization or {}).items() if isinstance(v, dict)}
+
+    try:
+        job = get_job_opening_detail(job_opening_id) or {}
+        talents = get_talent_details(ids)
+    except Exception as e:
+        return {"success": False, "error": f"Gagal memuat lowongan/talent: {str(e)}"}
+    companies = company_index.lookup([job.get("company_id")]) if job.get("company_id") else {}
+    job_fields = {"job_title": job.get("title") or "", "company_name": company_index.company_name(companies, job.get("company_id"))}
+
+    results = {tid: {"talent_id": tid, "status": "failed"} for tid in ids}
+    for tid, err in talents.get("errors", {}).items():
+        results[int(tid)]["error"] = f"Talent tidak ditemukan: {err}"
+    by_id = {int(t["id"]): t for t in talents.get("data", []) if t.get("id") is not None}
+
+    # Langkah 1: daftarkan kandidat secara paralel (token request ikut lewat copy_context).
+    pool = clients.executor()
+    futures = {tid: pool.submit(contextvars.copy_context().run, create_candidate,
+                                talent_id=tid, job_opening_id=job_opening_id, status=1)
+               for tid in by_id}
+    created = []
+    for tid, fut in futures.items():
+        talent = by_id[tid]
+        results[tid]["talent_name"] = talent.get("name")
+        try:
+            res = fut.result() or {}
+        except Exception as e:
+            results[tid]["error"] = f"Gagal membuat kandidat: {str(e).splitlines()[0]}"
+            continue
+        if isinstance(res, dict) and "error" in res:
+            results[tid]["error"] = f"Gagal membuat kandidat: {res['error']}"
+            continue
+        results[tid]["candidate_id"] = ((res.get("data") if isinstance(res.get("data"), dict) else res) or {}).get("id")
+        created.append(tid)
+
+    # Langkah 2: semua sesi chat dalam satu batch.
+    now = datetime.now(timezone.utc)
+    sessions = []
+    for tid in created:
+        talent = by_id[tid]
+        name = talent.get("name") or str(tid)
+        fields = {"name": name, "first_name": name.split()[0] if name.split() else name,
+                  "position": talent.get("position") or "", **job_fields, **personalization.get(str(tid), {})}
+        sessions.append({
+            "name": name, "session_id": str(uuid4()), "created_at": now, "title": "Percakapan Awal",
+            "messages": [
+                {**system_message(_helpers["DEFAULT_SYSTEM_PROMPT"]), "timestamp": now.isoformat()},
+                {"role": "assistant", "content": _render_message(message_template, fields), "timestamp": now.isoformat()},
+            ],
+            "talent_id": tid,
+        })
+    try:
+        if sessions:
+            ensure_chat_docs([x["name"] for x in sessions])
+            append_sessions([{k: v for k, v in x.items() if k != "talent_id"} for x in sessions])
+        for x in sessions:
+            results[x["talent_id"]].update(status="contacted", session_id=x["session_id"])
+    except Exception as e:
+        for x in sessions:
+            results[x["talent_id"]]["error"] = f"Kandidat dibuat, tapi gagal memulai chat: {str(e)}"
+
+    report = [results[tid] for tid in ids]
+    contacted = sum(1 for r in report if r["status"] == "contacted")
+    return {
+        "success": contacted == len(ids),
+        "job_opening_id": job_opening_id,
+        "summary": {"requested": len(ids), "contacted": contacted, "failed": len(ids) - contacted},
+        "results": report,
+    }
+
+
+def search_talent_keywords(query: str, limit: int = 10):
+    """Pencarian kata kunci persis (skill, kampus, singkatan) di index BM25 lokal, tanpa request ke backend."""
+    import talent_index
+    try:
+        return talent_index.search(query, limit)
+    except ValueError as ve:
+        return {"error": str(ve)}
+
+def delete_talent_and_unindex(talent_id: int):
+    """delete_talent lalu buang talent itu dari index kata kunci supaya tidak muncul lagi di pencarian."""
+    import talent_index
+    result = delete_talent(talent_id)
+    talent_index.remove_talents_safe([talent_id])
+    return result
+
+def delete_company_and_unindex(company_id: int):
+    """delete_company lalu tandai perusahaan itu terhapus di company_index (semua worker)."""
+    result = delete_company(company_id)
+    company_index.remove_companies_safe([company_id])
+    return result
+
+def bulk_import_records(resource: str, rows: list):
+    """
+    Impor massal talent / companies dari daftar record (mis. tabel yang ditempel pengguna).
+    Berjalan di background seperti POST /api/import/<resource>; pantau dengan get_import_status.
+    """
+    import io
+    import bulk_import
+    if not isinstance(rows, list) or not rows:
+        return {"success": False, "error": "rows harus berupa daftar record dan tidak boleh kosong."}
+    data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode("utf-8")
+    try:
+        job_id = bulk_import.start_job(resource, "jsonl", io.BytesIO(data))
+    except ValueError as ve:
+        return {"success": False, "error": str(ve)}
+    return {"success": True, "job_id": job_id, "rows": len(rows),
+            "message": "Impor berjalan di background. Cek progres dengan get_import_status."}
+
+def _details_tool(fetch):
+    """
+    Bungkus get_*_details untuk dipanggil model: daftar ID terlalu panjang / tidak valid
+    (ValueError dari api_client.get_many) dikembalikan sebagai {"error"}, bukan exception.
+    """
+    def tool(*args, **kwargs):
+        try:
+            return fetch(*args, **kwargs)
+        except ValueError as ve:
+            return {"error": str(ve)}
+    tool.__name__ = fetch.__name__
+    return tool
+
+def get_import_status(job_id: str):
+    import bulk_import
+    job = bulk_import.job_status(job_id)
+    if job is None:
+        return {"error": "Job impor tidak ditemukan."}
+    # Ringkas untuk model: hanya 20 error terakhir.
+    job["errors"] = job.get("errors", [])[-20:]
+    return job
+
+
 # ========== DEFINISI SEMUA TOOLS (LAMA + BARU) ==========
 tools = [
     {
@@ -191,6 +365,65 @@ tools = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "bulk_initiate_contact",
+            "description": "Versi massal initiate_contact: hubungi banyak talent untuk SATU lowongan dalam satu panggilan (daftarkan sebagai kandidat + mulai sesi chat). Gunakan setelah pengguna menyetujui template pesan. Placeholder template: {name}, {first_name}, {position}, {job_title}, {company_name}, serta field dari personalization.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "job_opening_id": {"type": "integer", "description": "ID lowongan pekerjaan."},
+                    "talent_ids": {"type": "array", "items": {"type": "integer"}, "description": "ID talent yang dihubungi."},
+                    "message_template": {"type": "string", "description": "Template pesan pertama yang sudah disetujui pengguna."},
+                    "personalization": {"type": "object", "description": "Field tambahan per talent: {\"<talent_id>\": {\"field\": \"nilai\"}}.", "additionalProperties": {"type": "object"}}
+                },
+                "required": ["job_opening_id", "talent_ids", "message_template"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_talent_keywords",
+            "description": "Cari talent berdasarkan kata kunci persis (mis. skill 'Laravel', kampus 'ITB', 'QA') di nama, posisi, ringkasan, skill dan pendidikan. Jauh lebih cepat dan tepat daripada list_talent(search=...) untuk kata kunci; hasil diurutkan berdasarkan relevansi (BM25).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Kata kunci, boleh lebih dari satu."},
+                    "limit": {"type": "integer", "default": 10, "description": "Jumlah hasil (maks 50)."}
+                },
+                "required": ["query"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "bulk_import_records",
+            "description": "Impor massal talent atau perusahaan (puluhan sampai ribuan record) dalam satu panggilan, alih-alih create_talent/create_company berulang. Berjalan di background dan mengembalikan job_id.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "resource": {"type": "string", "enum": ["talent", "companies"], "description": "Jenis data yang diimpor."},
+                    "rows": {"type": "array", "items": {"type": "object"}, "description": "Record yang diimpor. Talent wajib: name, position, birthdate (YYYY-MM-DD), summary. Perusahaan wajib: name."}
+                },
+                "required": ["resource", "rows"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_import_status",
+            "description": "Cek progres & error per baris dari job impor massal.",
+            "parameters": {
+                "type": "object",
+                "properties": {"job_id": {"type": "string"}},
+                "required": ["job_id"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -248,6 +481,18 @@ tools = [
         }
       }
     },
+    {
+      "type": "function",
+      "function": {
+        "name": "get_talent_details",
+        "description": "Get several talents by ID in one call. Use this instead of repeated get_talent_detail when comparing or showing multiple talents.",
+        "parameters": {
+          "type": "object",
+          "properties": {"talent_ids": {"type": "array", "items": {"type": "integer"}}},
+          "required": ["talent_ids"]
+        }
+      }
+    },
     {
       "type": "function",
       "function": {
@@ -348,6 +593,18 @@ tools = [
         }
       }
     },
+    {
+      "type": "function",
+      "function": {
+        "name": "get_candidate_details",
+        "description": "Get several candidates by ID in one call. Use this instead of repeated get_candidate_detail.",
+        "parameters": {
+          "type": "object",
+          "properties": {"candidate_ids": {"type": "array", "items": {"type": "integer"}}},
+          "required": ["candidate_ids"]
+        }
+      }
+    },
     {
       "type": "function",
       "function": {
@@ -428,6 +685,18 @@ tools = [
         }
       }
     },
+    {
+      "type": "function",
+      "function": {
+        "name": "get_company_details",
+        "description": "Get several companies by ID in one call. Use this instead of repeated get_company_detail.",
+        "parameters": {
+          "type": "object",
+          "properties": {"company_ids": {"type": "array", "items": {"type": "integer"}}},
+          "required": ["company_ids"]
+        }
+      }
+    },
     {
       "type": "function",
       "function": {
@@ -574,6 +843,18 @@ tools = [
         }
       }
     },
+    {
+      "type": "function",
+      "function": {
+        "name": "get_job_opening_details",
+        "description": "Get several job openings by ID in one call. Use this instead of repeated get_job_opening_detail.",
+        "parameters": {
+          "type": "object",
+          "properties": {"opening_ids": {"type": "array", "items": {"type": "integer"}}},
+          "required": ["opening_ids"]
+        }
+      }
+    },
     {
       "type": "function",
       "function": {
@@ -628,23 +909,30 @@ tools = [
 # ========== MAPPING FUNGSI ==========
 available_functions = {
     "initiate_contact": initiate_contact,
+    "bulk_initiate_contact": bulk_initiate_contact,
+    "search_talent_keywords": search_talent_keywords,
+    "bulk_import_records": bulk_import_records,
+    "get_import_status": get_import_status,
     "get_offer_details": get_offer_details,
     "list_job_openings_enriched": list_job_openings_enriched, 
     "list_talent": list_talent,
     "get_talent_detail": get_talent_detail,
+    "get_talent_details": _details_tool(get_talent_details),
     "create_talent": create_talent,
     "update_talent": update_talent,
-    "delete_talent": delete_talent,
+    "delete_talent": delete_talent_and_unindex,
     "list_candidates": list_candidates,
     "get_candidate_detail": get_candidate_detail,
+    "get_candidate_details": _details_tool(get_candidate_details),
     "create_candidate": create_candidate,
     "update_candidate": update_candidate,
     "delete_candidate": delete_candidate,
     "list_companies": list_companies,
     "get_company_detail": get_company_detail,
+    "get_company_details": _details_tool(get_company_details),
     "create_company": create_company,
     "update_company": update_company,
-    "delete_company": delete_company,
+    "delete_company": delete_company_and_unindex,
     "list_company_properties": list_company_properties,
     "get_company_property_detail": get_company_property_detail,
     "create_company_property": create_company_property,
@@ -652,6 +940,7 @@ available_functions = {
     "delete_company_property": delete_company_property,
     "list_job_openings": list_job_openings,
     "get_job_opening_detail": get_job_opening_detail,
+    "get_job_opening_details": _details_tool(get_job_opening_details),
     "create_job_opening": create_job_opening,
     "update_job_opening": update_job_opening,
     "delete_job_opening": delete_job_opening,
@@ -0,0 +1,224 @@
+# transfer.py
+# -*- coding: utf-8 -*-
+"""
+Export & import sesi chat dalam format NDJSON (satu record JSON per baris).
+
+Urutan record: satu header sesi lalu pesan-pesannya, berurutan menurut `seq`:
+    {"type": "session", "name": ..., "session_id": ..., "title": ..., "created_at": ...,
+     "last_activity_at": ..., "messages_count": N}
+    {"type": "message", "name": ..., "session_id": ..., "seq": 0, "message": {...}}
+    ...
+Tanggal & ObjectId memakai Extended JSON (bson.json_util), sama seperti arsip retensi.
+
+Memori tetap konstan: export membaca daftar sesi dari chat_sessions per batch (keyset _id)
+dan pesan per potongan EXPORT_CHUNK_MESSAGES lewat $slice di server; import hanya menahan
+satu sesi plus satu batch write. Import idempoten (append dengan filter $ne lalu set pesan),
+jadi bisa dilanjutkan dengan `skip` = jumlah sesi yang sudah dilaporkan selesai.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from bson import json_util
+
+import session_cache
+from chat_store import (
+    chat_sessions, get_or_create_chat_doc, load_session, load_session_range,
+    apply_session_writes, DEFAULT_SESSION_TITLE,
+)
+from blob_store import hydrate_messages
+from prompt_registry import hydrate_prompts
+from retention import read_archived
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "200"))
+EXPORT_CHUNK_MESSAGES = int(os.getenv("EXPORT_CHUNK_MESSAGES", "500"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "50"))
+
+
+def _line(record: Dict[str, Any]) -> str:
+    return json_util.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _portable(messages: List[dict]) -> List[dict]:
+    # Isi tool_payloads & teks prompt ikut ditulis supaya file bisa dipakai di environment lain.
+    return hydrate_prompts(hydrate_messages(messages))
+
+
+# ======================================================================
+# EXPORT
+# ======================================================================
+def _session_messages(name: str, session_id: str) -> Iterator[dict]:
+    start = 0
+    while True:
+        rng = load_session_range(name, session_id, start, start + EXPORT_CHUNK_MESSAGES)
+        if rng is None:
+            return
+        if rng["session"].get("archived"):
+            # Tombstone: pesan dibaca dari file arsip tanpa memulihkan sesi.
+            yield from read_archived(load_session(name, session_id) or {})
+            return
+        yield from rng["messages"]
+        start += EXPORT_CHUNK_MESSAGES
+        if start >= rng["total"]:
+            return
+
+
+def export_ndjson(name: Optional[str] = None, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, hydrate: bool = True) -> Iterator[str]:
+    """
+    Generator baris NDJSON untuk semua sesi yang cocok. Filter tanggal berlaku pada
+    `last_activity_at` (since inklusif, until eksklusif).
+    """
+    query: Dict[str, Any] = {}
+    if name:
+        query["name"] = name
+    if since or until:
+        query["last_activity_at"] = {
+            **({"$gte": since} if since else {}), **({"$lt": until} if until else {}),
+        }
+    last_id = None
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        batch = list(chat_sessions().find(
+            batch_query,
+            {"name": 1, "session_id": 1, "title": 1, "created_at": 1, "last_activity_at": 1, "messages_count": 1},
+        ).sort("_id", 1).limit(EXPORT_BATCH_SIZE))
+        if not batch:
+            return
+        for s in batch:
+            yield _line({
+                "type": "session", "name": s["name"], "session_id": s["session_id"],
+                "title": s.get("title") or DEFAULT_SESSION_TITLE,
+                "created_at": s.get("created_at"), "last_activity_at": s.get("last_activity_at"),
+                "messages_count": s.get("messages_count", 0),
+            })
+            chunk: List[dict] = []
+            seq = 0
+            for m in _session_messages(s["name"], s["session_id"]):
+                chunk.append(m)
+                if len(chunk) >= EXPORT_CHUNK_MESSAGES:
+                    for msg in (_portable(chunk) if hydrate else chunk):
+                        yield _line({"type": "message", "name": s["name"], "session_id": s["session_id"],
+                                     "seq": seq, "message": msg})
+                        seq += 1
+                    chunk = []
+            for msg in (_portable(chunk) if hydrate else chunk):
+                yield _line({"type": "message", "name": s["name"], "session_id": s["session_id"],
+                             "seq": seq, "message": msg})
+                seq += 1
+        last_id = batch[-1]["_id"]
+
+
+# ======================================================================
+# IMPORT
+# ======================================================================
+def _as_datetime(v: Any) -> Optional[datetime]:
+    if isinstance(v, datetime):
+        return v if v.tzinfo else v.replace(tzinfo=timezone.utc)
+    if isinstance(v, str):
+        try:
+            return _as_datetime(datetime.fromisoformat(v))
+        except ValueError:
+            return None
+    return None
+
+
+def parse_date(v: Optional[str]) -> Optional[datetime]:
+    """'YYYY-MM-DD' atau ISO datetime -> datetime UTC; string kosong -> None."""
+    v = (v or "").strip()
+    if not v:
+        return None
+    dt = _as_datetime(v)
+    if dt is None:
+        raise ValueError(f"Tanggal '{v}' tidak valid (format YYYY-MM-DD atau ISO 8601).")
+    return dt
+
+
+def _session_writes(header: Dict[str, Any], messages: List[dict]) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    created = _as_datetime(header.get("created_at")) or now
+    at = _as_datetime(header.get("last_activity_at")) or created
+    base = {"name": header["name"], "session_id": header["session_id"], "messages": messages, "at": at}
+    # Sama seperti write-behind: append idempoten lalu set pesan, aman diulang saat resume.
+    return [
+        {**base, "op": "append", "created_at": created, "title": header.get("title") or DEFAULT_SESSION_TITLE},
+        {**base, "op": "upsert"},
+    ]
+
+
+def import_ndjson(lines: Iterable, skip: int = 0,
+                  on_batch: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+    """
+    Impor sesi dari baris NDJSON (str atau bytes). `skip` = jumlah sesi pertama yang dilewati
+    (checkpoint dari run sebelumnya). on_batch(checkpoint) dipanggil setiap satu batch tersimpan.
+    Mengembalikan {"sessions", "messages", "skipped", "checkpoint"}.
+    """
+    stats = {"sessions": 0, "messages": 0, "skipped": 0, "checkpoint": skip}
+    known_users = set()
+    pending: List[Dict[str, Any]] = []
+    header: Optional[Dict[str, Any]] = None
+    messages: List[dict] = []
+    next_seq = 0
+    seen = 0
+
+    def _flush_batch():
+        if not pending:
+            return
+        apply_session_writes(pending)
+        for w in pending:
+            session_cache.invalidate(w["name"], w["session_id"])
+        stats["checkpoint"] = seen
+        pending.clear()
+        if on_batch:
+            on_batch(stats["checkpoint"])
+
+    def _close_session():
+        nonlocal header, messages
+        if header is None:
+            return
+        if seen <= skip:
+            stats["skipped"] += 1
+        else:
+            if header["name"] not in known_users:
+                get_or_create_chat_doc(header["name"])
+                known_users.add(header["name"])
+            pending.extend(_session_writes(header, messages))
+            stats["sessions"] += 1
+            stats["messages"] += len(messages)
+            if len(pending) >= IMPORT_BATCH_SIZE * 2:
+                _flush_batch()
+        header, messages = None, []
+
+    for lineno, raw in enumerate(lines, 1):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            rec = json_util.loads(raw)
+        except ValueError:
+            raise ValueError(f"Baris {lineno}: JSON tidak valid.")
+        kind = rec.get("type")
+        if kind == "session":
+            _close_session()
+            if not rec.get("name") or not rec.get("session_id"):
+                raise ValueError(f"Baris {lineno}: record session butuh 'name' dan 'session_id'.")
+            seen += 1
+            header, next_seq = rec, 0
+        elif kind == "message":
+            if header is None or rec.get("session_id") != header["session_id"]:
+                raise ValueError(f"Baris {lineno}: pesan tanpa header sesi yang cocok.")
+            if rec.get("seq") != next_seq:
+                raise ValueError(f"Baris {lineno}: seq {rec.get('seq')} tidak berurutan (harap {next_seq}).")
+            next_seq += 1
+            if seen > skip:
+                messages.append(rec.get("message") or {})
+        else:
+            raise ValueError(f"Baris {lineno}: type '{kind}' tidak dikenal.")
+    _close_session()
+    _flush_batch()
+    stats["checkpoint"] = max(stats["checkpoint"], seen)
+    return stats
@@ -1,6 +1,4 @@
-import chromadb
-from chromadb.types import Database, Tenant, Collection as CollectionModel
-import os
+import clients
 
 def singleton(cls):
     instances = {}
@@ -12,13 +10,7 @@ def singleton(cls):
 
 @singleton
 class Chroma:
-    _client = {}
-    def __init__(self):
-        self._client = chromadb.CloudClient(
-            api_key=os.getenv("CHROMADB_API_KEY"),
-            tenant='39d106f4-0829-4e38-beed-1e8627fe7afb',
-            database='lisa-chat'
-        )
-    
+    # CloudClient sebenarnya dipegang clients.py (dibuat ulang per proses setelah fork),
+    # jadi singleton ini tidak pernah membawa socket milik master gunicorn ke worker.
     def client(self):
-        return self._client
\ No newline at end of file
+        return clients.chroma()
@@ -0,0 +1,158 @@
+# warmup.py
+# -*- coding: utf-8 -*-
+"""
+Pemanasan koneksi upstream per worker (Laravel admin API, OpenAI, MongoDB, Chroma Cloud).
+
+  - warm_all(): dipanggil di post_fork sebelum worker menerima request. Setiap upstream
+    dipanggil WARMUP_CONNECTIONS kali secara paralel dengan request ringan, sehingga pool
+    sudah berisi koneksi yang selesai DNS + TCP + TLS. Request pertama user tidak lagi
+    membayar handshake. Dibatasi WARMUP_TIMEOUT_S; upstream yang lambat / mati dilewati.
+  - start()/stop(): thread keep-alive. Setiap KEEPALIVE_INTERVAL_S, upstream HTTP yang
+    menganggur selama itu dipanggil lagi (paralel WARMUP_CONNECTIONS) supaya koneksi di
+    pool tidak ditutup server / load balancer karena idle. Mongo cukup di-ping: driver
+    sendiri menjaga minimal MONGO_MIN_POOL_SIZE koneksi.
+
+Waktu handshake tiap koneksi baru dicatat terpisah di clients.connect_stats(); hasil warmup
+& keep-alive ada di stats(). Keduanya tampil di /api/metrics.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+import clients
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_CONNECTIONS = max(1, int(os.getenv("WARMUP_CONNECTIONS", "2")))
+WARMUP_TIMEOUT_S = float(os.getenv("WARMUP_TIMEOUT_S", "5"))
+# Path ringan di REMOTE_BASE_URL untuk membuka koneksi (HEAD, tanpa token).
+WARMUP_HTTP_PATH = os.getenv("WARMUP_HTTP_PATH", "/")
+KEEPALIVE_INTERVAL_S = float(os.getenv("KEEPALIVE_INTERVAL_S", "25"))
+
+_lock = threading.Lock()
+_stats: Dict[str, Any] = {"warmup": {}, "keepalive_rounds": 0, "keepalive_pings": 0, "keepalive_errors": 0}
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+# ======================================================================
+# PROBE PER UPSTREAM
+# ======================================================================
+def _laravel() -> None:
+    base = os.getenv("REMOTE_BASE_URL", "").rstrip("/")
+    clients.http_session().head(base + WARMUP_HTTP_PATH, timeout=(WARMUP_TIMEOUT_S, WARMUP_TIMEOUT_S),
+                                allow_redirects=False, verify=clients.VERIFY_SSL)
+
+
+def _openai() -> None:
+    clients.openai().with_options(timeout=WARMUP_TIMEOUT_S, max_retries=0).models.list()
+
+
+def _mongo() -> None:
+    clients.mongo().admin.command("ping")
+
+
+def _chroma() -> None:
+    clients.chroma().heartbeat()
+
+
+def _upstreams() -> Dict[str, Callable[[], None]]:
+    ups: Dict[str, Callable[[], None]] = {"mongo": _mongo}
+    if os.getenv("REMOTE_BASE_URL"):
+        ups["laravel"] = _laravel
+    if os.getenv("OPENAI_API_KEY"):
+        ups["openai"] = _openai
+    if os.getenv("CHROMADB_API_KEY"):
+        ups["chroma"] = _chroma
+    return ups
+
+
+def _probe(fn: Callable[[], None]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+# ======================================================================
+# WARMUP SAAT BOOT WORKER
+# ======================================================================
+def warm_all() -> Dict[str, Any]:
+    """Buka koneksi ke semua upstream secara paralel. Tidak pernah melempar exception."""
+    if not WARMUP_ENABLED:
+        return {}
+    ups = _upstreams()
+    # Chroma dipakai jarang & lewat klien sendiri: satu koneksi cukup.
+    jobs = [(name, fn) for name, fn in ups.items() for _ in range(1 if name == "chroma" else WARMUP_CONNECTIONS)]
+    pool = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="warmup")
+    started = time.perf_counter()
+    futures = {pool.submit(_probe, fn): name for name, fn in jobs}
+    done, _ = wait(futures, timeout=WARMUP_TIMEOUT_S)
+    pool.shutdown(wait=False)  # probe yang belum selesai dibiarkan jalan di background
+
+    result: Dict[str, Any] = {name: {"ok": False, "error": "timeout"} for name in ups}
+    for fut, name in futures.items():
+        if fut not in done:
+            continue
+        try:
+            ms = fut.result()
+        except Exception as e:
+            if not result[name].get("ok"):
+                result[name] = {"ok": False, "error": str(e).split("\n", 1)[0][:200]}
+            continue
+        prev = result[name]
+        result[name] = {"ok": True, "max_ms": round(max(ms, prev.get("max_ms", 0.0)), 1)}
+    result["_total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    with _lock:
+        _stats["warmup"] = result
+    return result
+
+
+# ======================================================================
+# KEEP-ALIVE
+# ======================================================================
+def _keepalive_round(pool: ThreadPoolExecutor) -> None:
+    jobs = []
+    for name, fn in _upstreams().items():
+        idle = clients.idle_seconds(name)
+        # Mongo: ping tiap putaran. Upstream HTTP: hanya jika menganggur selama satu interval.
+        if name != "mongo" and idle is not None and idle < KEEPALIVE_INTERVAL_S:
+            continue
+        n = 1 if name in ("mongo", "chroma") else WARMUP_CONNECTIONS
+        jobs += [pool.submit(_probe, fn) for _ in range(n)]
+    done, _ = wait(jobs, timeout=WARMUP_TIMEOUT_S)
+    errors = sum(1 for f in done if f.exception() is not None) + len(jobs) - len(done)
+    with _lock:
+        _stats["keepalive_rounds"] += 1
+        _stats["keepalive_pings"] += len(jobs)
+        _stats["keepalive_errors"] += errors
+
+
+def _loop() -> None:
+    with ThreadPoolExecutor(max_workers=WARMUP_CONNECTIONS * 2 + 2, thread_name_prefix="keepalive") as pool:
+        while not _stop.wait(KEEPALIVE_INTERVAL_S):
+            try:
+                _keepalive_round(pool)
+            except Exception as e:
+                print(f"[keepalive] putaran gagal: {e}")
+
+
+def start() -> None:
+    """Jalankan thread keep-alive di worker ini (dipanggil dari post_fork)."""
+    global _thread
+    if not WARMUP_ENABLED or KEEPALIVE_INTERVAL_S <= 0 or (_thread is not None and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="upstream-keepalive", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=WARMUP_TIMEOUT_S + 1)
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, "interval_s": KEEPALIVE_INTERVAL_S, "connections": WARMUP_CONNECTIONS}
@@ -0,0 +1,297 @@
+# write_behind.py
+# -*- coding: utf-8 -*-
+"""
+Mode write-behind (opsional) untuk penyimpanan transkrip chat.
+
+Jika WRITE_BEHIND_ENABLED=true, /api/chat tidak lagi menunggu round trip Mongo.
+Hasil satu giliran ditulis dulu ke WAL lokal (WRITE_BEHIND_DIR) dengan fsync, lalu
+respons dikirim. Thread flusher di setiap worker menulis isi WAL ke Mongo secara batch.
+
+Bentuk WAL: satu file snapshot per sesi (`<key>.json`) berisi pesan terbaru sesi itu.
+Karena setiap write menyimpan *seluruh* pesan sesi, snapshot terakhir sudah mewakili
+semua write sebelumnya (coalescing alami) dan urutan per sesi selalu terjaga.
+  - Durable   : tmp file + fsync + os.replace + fsync direktori.
+  - Merge     : snapshot membawa `rev`/`base_len` (versi Mongo tempat ia dibangun). Giliran
+                yang dibangun di atas snapshot lebih lama digabung (pesan lama + giliran
+                baru), bukan menimpa; saat flush, sesi ditulis dengan compare-and-set pada
+                rev (commit_session_messages), jadi giliran worker lain tidak hilang.
+  - Urutan    : flock flush memastikan hanya satu flusher per sesi; flusher selalu
+                membaca snapshot terbaru, jadi Mongo tidak pernah ditimpa data lama.
+                Giliran yang masuk saat snapshot sedang di-flush di-rebase ke versi yang
+                baru ditulis (rev & base_len), jadi tidak ditulis dua kali.
+  - Lock      : file lock dibagi per stripe (LOCK_STRIPES, hash key), bukan per sesi,
+                sehingga jumlah file di WRITE_BEHIND_DIR tetap terbatas.
+  - Read-your-writes: pembaca (semua worker di host yang sama) cek snapshot dulu lewat
+                pending_session() sebelum membaca Mongo.
+  - Recovery  : file yang tertinggal dari worker yang mati otomatis diambil flusher lain.
+"""
+import os
+import json
+import time
+import fcntl
+import hashlib
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_DIR = os.getenv("WRITE_BEHIND_DIR", "./data/wal")
+FLUSH_INTERVAL_MS = int(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "200"))
+FLUSH_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "50"))
+RETRY_MAX_BACKOFF_S = float(os.getenv("WRITE_BEHIND_MAX_BACKOFF_S", "30"))
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_thread_pid: Optional[int] = None
+_start_lock = threading.Lock()
+LOCK_STRIPES = 256
+
+
+def _key(name: str, session_id: str) -> str:
+    return hashlib.sha1(f"{name}\x00{session_id}".encode("utf-8")).hexdigest()
+
+
+def _path(key: str, suffix: str = ".json") -> str:
+    return os.path.join(WRITE_BEHIND_DIR, key + suffix)
+
+
+def _stripe_id(key: str) -> int:
+    return int(key[:8], 16) % LOCK_STRIPES
+
+
+def _stripe(key: str, kind: str) -> str:
+    """File lock bersama untuk semua sesi di stripe yang sama (kind: 'lock' | 'flush')."""
+    return os.path.join(WRITE_BEHIND_DIR, f"{kind}.{_stripe_id(key):03d}.lck")
+
+
+class _FileLock:
+    def __init__(self, path: str, blocking: bool = True):
+        self.path, self.blocking, self.fd = path, blocking, None
+
+    def __enter__(self) -> bool:
+        self.fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | (0 if self.blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self.fd)
+
+
+def _read(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _mtime(fname: str) -> float:
+    try:
+        return os.path.getmtime(os.path.join(WRITE_BEHIND_DIR, fname))
+    except OSError:
+        return 0.0
+
+
+def _write_durable(key: str, entry: Dict[str, Any]) -> None:
+    tmp = _path(key, f".tmp.{os.getpid()}.{threading.get_ident()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _path(key))
+    dfd = os.open(WRITE_BEHIND_DIR, os.O_RDONLY)
+    try:
+        os.fsync(dfd)
+    finally:
+        os.close(dfd)
+
+
+# ======================================================================
+# API PUBLIK
+# ======================================================================
+def enqueue(op: str, name: str, session_id: str, messages: List[dict],
+            created_at: Optional[datetime] = None, title: Optional[str] = None,
+            base_rev: Optional[int] = None, base_len: int = 0) -> None:
+    """
+    Simpan write sesi secara durable ke WAL lalu bangunkan flusher. op: 'append' | 'upsert'.
+    `base_rev`/`base_len` = rev & jumlah pesan sesi saat dibaca (dari Mongo, cache, atau
+    snapshot WAL); messages[base_len:] adalah giliran baru.
+    """
+    os.makedirs(WRITE_BEHIND_DIR, exist_ok=True)
+    key = _key(name, session_id)
+    now = datetime.now().astimezone()
+    with _FileLock(_stripe(key, "lock")):
+        prev = _read(key)
+        entry = {
+            "seq": time.time_ns(),
+            "op": op, "name": name, "session_id": session_id,
+            "messages": messages, "at": now.isoformat(),
+            "rev": base_rev or 0, "base_len": base_len,
+        }
+        if prev and op == "upsert":
+            # Snapshot yang belum di-flush selalu perpanjangan dari base pemanggil (pesan hanya
+            # ditambah): gabungkan giliran baru di atasnya, versi Mongo tetap milik snapshot itu.
+            entry["messages"] = (prev.get("messages") or []) + messages[base_len:]
+            entry["rev"], entry["base_len"] = prev.get("rev") or 0, prev.get("base_len") or 0
+        # Sesi yang belum pernah sampai ke Mongo tetap 'append' walau sudah ada giliran berikutnya.
+        if op == "append" or (prev and prev.get("op") == "append"):
+            entry["op"] = "append"
+            entry["created_at"] = (created_at.isoformat() if created_at else None) or (prev or {}).get("created_at")
+            entry["title"] = title or (prev or {}).get("title")
+        _write_durable(key, entry)
+    start()
+    _wake.set()
+
+
+def pending_session(name: str, session_id: str) -> Optional[Dict[str, Any]]:
+    """Snapshot sesi yang belum di-flush ke Mongo (read-your-writes), atau None."""
+    if not WRITE_BEHIND_ENABLED:
+        return None
+    return _read(_key(name, session_id))
+
+
+def _to_write(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    at = datetime.fromisoformat(entry["at"])
+    base = {"name": entry["name"], "session_id": entry["session_id"], "messages": entry["messages"], "at": at}
+    writes = []
+    if entry["op"] == "append":
+        created = entry.get("created_at")
+        writes.append({**base, "op": "append", "title": entry.get("title"),
+                       "created_at": datetime.fromisoformat(created) if created else at})
+    # Selalu ikuti dengan set pesan: append idempoten bisa no-op jika sesi sudah ada.
+    writes.append({**base, "op": "upsert"})
+    return writes
+
+
+def _commit_upsert(entry: Dict[str, Any]) -> int:
+    """
+    Giliran pada sesi yang sudah ada di Mongo: compare-and-set pada rev, merge jika konflik.
+    Mengembalikan rev baru jika isi Mongo sekarang persis entry["messages"], selain itu 0.
+    """
+    from chat_store import commit_session_messages
+    expected = entry.get("rev") or 0
+    try:
+        rev = commit_session_messages(entry["name"], entry["session_id"], entry["messages"],
+                                      expected_rev=expected, base_len=entry.get("base_len") or 0)
+    except LookupError as e:
+        print(f"[write-behind] snapshot dibuang: {e}")  # sesi sudah dihapus
+        return 0
+    # rev != expected + 1 berarti terjadi merge dengan giliran worker lain.
+    return rev if rev == expected + 1 else 0
+
+
+def _settle(key: str, entry: Dict[str, Any], rev: int) -> None:
+    """
+    Setelah entry tersimpan di Mongo: hapus snapshot-nya, atau jika sementara itu sudah ada
+    giliran baru yang digabung di atasnya, rebase snapshot itu ke versi yang baru ditulis.
+    rev=0: rev Mongo tidak diketahui -> flush berikutnya pasti konflik dan merge dari Mongo.
+    """
+    with _FileLock(_stripe(key, "lock")):
+        cur = _read(key)
+        if not cur:
+            return
+        if cur.get("seq") == entry["seq"]:
+            os.remove(_path(key))
+            return
+        cur.update(op="upsert", rev=rev, base_len=len(entry["messages"]))
+        cur.pop("created_at", None)
+        cur.pop("title", None)
+        _write_durable(key, cur)
+
+
+def flush_once() -> int:
+    """Flush satu batch snapshot ke Mongo. Mengembalikan jumlah sesi yang berhasil di-flush."""
+    from chat_store import apply_session_writes
+    try:
+        names = [f for f in os.listdir(WRITE_BEHIND_DIR) if f.endswith(".json")]
+    except FileNotFoundError:
+        return 0
+    names.sort(key=_mtime)  # yang paling lama menunggu di-flush lebih dulu
+    stripes: Dict[int, Optional[_FileLock]] = {}
+    claimed = []
+    try:
+        for fname in names[:FLUSH_BATCH_SIZE]:
+            key = fname[:-len(".json")]
+            sid = _stripe_id(key)
+            if sid not in stripes:
+                lk = _FileLock(_stripe(key, "flush"), blocking=False)
+                if lk.__enter__():
+                    stripes[sid] = lk
+                else:
+                    lk.__exit__()
+                    stripes[sid] = None
+            if stripes[sid] is None:
+                continue  # stripe ini sedang di-flush worker lain
+            entry = _read(key)
+            if entry:
+                claimed.append((key, entry))
+        if not claimed:
+            return 0
+        # Sesi baru (append idempoten) tetap ditulis sekaligus; giliran pada sesi lama per sesi
+        # dengan compare-and-set supaya tidak menimpa giliran yang di-flush lebih dulu.
+        writes: List[Dict[str, Any]] = []
+        for _, entry in claimed:
+            if entry["op"] == "append":
+                writes.extend(_to_write(entry))
+        if writes:
+            apply_session_writes(writes)
+        for key, entry in claimed:
+            _settle(key, entry, _commit_upsert(entry) if entry["op"] != "append" else 0)
+        return len(claimed)
+    finally:
+        for lk in stripes.values():
+            if lk is not None:
+                lk.__exit__()
+
+
+def _run() -> None:
+    backoff = FLUSH_INTERVAL_MS / 1000.0
+    while not _stop.is_set():
+        _wake.wait(backoff)
+        _wake.clear()
+        try:
+            while flush_once() >= FLUSH_BATCH_SIZE:
+                pass
+            backoff = FLUSH_INTERVAL_MS / 1000.0
+        except Exception as e:
+            backoff = min(max(backoff * 2, 0.5), RETRY_MAX_BACKOFF_S)
+            print(f"[write-behind] flush gagal, coba lagi dalam {backoff:.1f}s: {e}")
+
+
+def start() -> None:
+    """Jalankan thread flusher di proses ini (idempoten, aman setelah fork)."""
+    global _thread, _thread_pid
+    if not WRITE_BEHIND_ENABLED:
+        return
+    with _start_lock:
+        if _thread is not None and _thread_pid == os.getpid() and _thread.is_alive():
+            return
+        os.makedirs(WRITE_BEHIND_DIR, exist_ok=True)
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="write-behind-flusher", daemon=True)
+        _thread_pid = os.getpid()
+        _thread.start()
+
+
+def stop(drain: bool = True, timeout: float = 10.0) -> None:
+    """Hentikan flusher; jika drain=True coba kosongkan WAL lebih dulu (dipakai saat worker_exit)."""
+    if not WRITE_BEHIND_ENABLED:
+        return
+    deadline = time.time() + timeout
+    if drain:
+        while time.time() < deadline:
+            try:
+                if flush_once() == 0:
+                    break
+            except Exception as e:
+                print(f"[write-behind] drain gagal, sisa WAL akan di-flush worker berikutnya: {e}")
+                break
+    _stop.set()
+    _wake.set()